@@ -0,0 +1,100 @@
+"""
+Benchmark of the pending prospects query.
+
+Fills a throwaway database with N prospects (about a third of them pending)
+and times, for each size:
+  - scan: the former query, a full table scan with fetchall()
+  - fetchall: get_pending_prospects() on the indexed table
+  - first batch: time until the first row of iter_pending_prospects()
+  - stream: a full pass over iter_pending_prospects()
+Peak Python memory of the fetchall and stream variants is reported too
+(measured on a separate run).
+
+Usage: python benchmarks/bench_pending_query.py [--sizes 10000 100000 1000000] [--batch-size 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add repo root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.db.database import Database
+
+STATUSES = ['NO_SITE', 'ARCHAIC', 'MODERN', 'UNKNOWN']
+
+SCAN_QUERY = """
+    SELECT * FROM prospects NOT INDEXED
+    WHERE status = 'new'
+    AND website_status IN ('NO_SITE', 'ARCHAIC')
+    AND email IS NOT NULL
+"""
+
+
+def fill(db, size, seed=0):
+    rng = random.Random(seed)
+    chunk = 50000
+    for start in range(0, size, chunk):
+        db.add_prospects({
+            'place_id': f"place_{i}",
+            'name': f"Prospect {i}",
+            'address': f"{i} rue du Commerce, Dakar",
+            'city': 'Dakar',
+            'sector': 'boulangerie',
+            'website_url': f"http://prospect{i}.sn" if rng.random() < 0.5 else None,
+            'website_status': rng.choice(STATUSES),
+            'email': f"contact@prospect{i}.sn" if rng.random() < 0.7 else None,
+        } for i in range(start, min(start + chunk, size)))
+    # Part of the pending rows were already contacted
+    db.conn.execute("UPDATE prospects SET status = 'sent' WHERE id % 10 = 0")
+    db.conn.commit()
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+
+    # Second run for memory: tracing slows allocations down too much to time them
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench(size, batch_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        db.connect()
+        fill(db, size)
+
+        scanned, scan_time, _ = timed(lambda: len(db.conn.execute(SCAN_QUERY).fetchall()))
+        fetched, fetch_time, fetch_peak = timed(lambda: len(db.get_pending_prospects()))
+        _, first_time, _ = timed(lambda: next(db.iter_pending_prospects(batch_size)))
+        streamed, stream_time, stream_peak = timed(lambda: sum(1 for _ in db.iter_pending_prospects(batch_size)))
+        db.close()
+
+    assert scanned == fetched == streamed
+    print(f"{size:>9} rows | {streamed:>7} pending | scan {scan_time * 1000:8.1f} ms"
+          f" | fetchall {fetch_time * 1000:8.1f} ms ({fetch_peak / 2**20:6.1f} MiB)"
+          f" | first batch {first_time * 1000:6.2f} ms"
+          f" | stream {stream_time * 1000:8.1f} ms ({stream_peak / 2**20:5.2f} MiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pending prospects query")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10000, 100000, 1000000], help="Table sizes to test")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per query when streaming")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        bench(size, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
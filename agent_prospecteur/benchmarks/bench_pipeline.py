@@ -0,0 +1,237 @@
+"""
+Offline end-to-end benchmark of the prospecting flow.
+
+Runs the real pipeline (GooglePlacesSearch, SiteChecker, DesignAnalyzer,
+EmailFinder, MessageGenerator, EmailSender, Database) against the local
+stand-ins of benchmarks/stubs.py: Places, Hunter, OpenAI, SendGrid and a farm
+of business websites, with configurable latency, error rates and page size.
+
+Each size runs in a fresh process (so its peak RSS is its own) while the stubs
+answer from this one. For each size it reports the wall time, the throughput
+(prospects per second), p50/p99 latencies per stage and per service, and the
+peak RSS. The vendors' quotas are lifted so that only our own code and
+concurrency settings are measured.
+
+Latency percentiles come from the metrics histograms: they are bucket upper bounds.
+
+Sites are served on 127.x.y.z addresses (one per site), which Linux routes to
+the loopback interface.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 100 1000 10000]
+           [--latency openai=0.5 sites=0.1] [--error-rate hunter=0.02]
+           [--page-kb 30] [--save results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from stubs import SimulatedServices, SERVICES, PAGES_PER_SEARCH, PLACES_PER_PAGE
+
+CENTER = (14.6928, -17.4467) # Dakar
+TILE_RADIUS = 1000
+
+
+def bounds_for(size):
+    """A box holding enough search tiles for `size` places (each tile serves up to 60)."""
+    from agent_prospecteur.search.google_places import METERS_PER_DEGREE
+    tiles = math.ceil(size / (PLACES_PER_PAGE * PAGES_PER_SEARCH)) + 1
+    side = math.ceil(math.sqrt(tiles)) * TILE_RADIUS * math.sqrt(2)
+    lat, lng = CENTER
+    lat_span = side / METERS_PER_DEGREE
+    lng_span = side / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+    return lat, lng, lat + lat_span, lng + lng_span
+
+
+def run_size(size, urls, options):
+    """Benchmark one campaign of `size` prospects. Runs in its own process."""
+    logging.basicConfig(level=getattr(logging, options['log_level']))
+    import openai
+    from agent_prospecteur.config import Config
+    from agent_prospecteur.db.database import Database
+    from agent_prospecteur.search.google_places import GooglePlacesSearch
+    from agent_prospecteur.detector.site_checker import SiteChecker
+    from agent_prospecteur.net.scheduler import FetchScheduler
+    from agent_prospecteur.detector.design_analyzer import DesignAnalyzer
+    from agent_prospecteur.enrich.email_finder import EmailFinder
+    from agent_prospecteur.message.generator import MessageGenerator
+    from agent_prospecteur.sender.email_sender import EmailSender
+    from agent_prospecteur.metrics import registry
+    from agent_prospecteur.pipeline import ProspectPipeline
+
+    Config.ANTIGRAVITY_FLIGHT = False
+    Config.OPENAI_API_KEY = 'bench'
+    openai.api_base = f"{urls['openai']}/v1"
+
+    unlimited = 10 ** 9
+    searcher = GooglePlacesSearch(api_key='bench', rate_limit=unlimited)
+    searcher.base_url = f"{urls['places']}/maps/api/place/nearbysearch/json"
+    searcher.page_token_delay = 0
+    enricher = EmailFinder(api_key='bench', rate_limit=unlimited)
+    enricher.base_url = f"{urls['hunter']}/v2/domain-search"
+    generator = MessageGenerator(tokens_per_minute=unlimited)
+    sender = EmailSender(api_key='bench', api_host=urls['sendgrid'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fingerprints = None
+        if options['fingerprints']:
+            from agent_prospecteur.detector.fingerprint import FingerprintIndex
+            fingerprints = FingerprintIndex(os.path.join(tmp, 'bench.db'))
+        analyzer = DesignAnalyzer(engine=options['analyzer'], fingerprints=fingerprints)
+        db = Database(os.path.join(tmp, 'bench.db'))
+        db.connect()
+        pipeline = ProspectPipeline(
+            db, searcher, SiteChecker(progressive=options['progressive'], scheduler=FetchScheduler() if options['polite'] else None), analyzer, enricher, generator, sender,
+            workers=options['workers'],
+        )
+        registry.reset()
+
+        start = time.perf_counter()
+        processed, sent = pipeline.run([{
+            'keyword': f"bench{size}",
+            'location': None,
+            'radius': None,
+            'sector': 'commerce',
+            'full_coverage': True,
+            'bounds': bounds_for(size),
+            'tile_radius': TILE_RADIUS,
+            'tile_workers': 8,
+        }])
+        elapsed = time.perf_counter() - start
+        stored = db.count_prospects()
+        db.close()
+        analyzer.close()
+        if fingerprints:
+            fingerprints.close()
+
+    metrics = registry.snapshot()
+    return {
+        'size': size,
+        'seconds': round(elapsed, 3),
+        'throughput': round(processed / elapsed, 2) if elapsed else 0,
+        'processed': processed,
+        'stored': stored,
+        'sent': sent,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stages': _latencies(metrics, 'stage_seconds', 'stage'),
+        'apis': _latencies(metrics, 'api_seconds', 'api'),
+        'api_errors': {
+            name: count for name, count in metrics['counters'].items()
+            if name.startswith('api_requests_total') and not name.endswith(('status=200}', 'status=202}', 'status=ok}'))
+        },
+    }
+
+
+def _latencies(snapshot, metric, label):
+    prefix = f"{metric}{{{label}="
+    return {
+        name[len(prefix):-1]: {'count': h['count'], 'p50': h['p50'], 'p99': h['p99']}
+        for name, h in snapshot['histograms'].items() if name.startswith(prefix)
+    }
+
+
+def report(result):
+    print(f"\n{result['size']:>6} prospects | {result['seconds']:8.2f} s | {result['throughput']:8.2f} prospects/s"
+          f" | {result['sent']} sent, {result['stored']} stored | peak RSS {result['peak_rss_mib']:.1f} MiB")
+    for kind in ('stages', 'apis'):
+        for name, h in result[kind].items():
+            print(f"    {kind[:-1]:<5} {name:<12} {h['count']:>7} calls | p50 <= {_seconds(h['p50'])} | p99 <= {_seconds(h['p99'])}")
+    for name, count in result['api_errors'].items():
+        print(f"    error {name}: {count}")
+
+
+def _seconds(value):
+    return "   inf  " if value == float('inf') else f"{value * 1000:6.0f} ms" if value is not None else "    -   "
+
+
+def compare(results, baseline, tolerance):
+    """Returns: list of regressions (throughput down or peak RSS up by more than tolerance)"""
+    before = {r['size']: r for r in baseline}
+    regressions = []
+    for result in results:
+        old = before.get(result['size'])
+        if not old:
+            continue
+        if result['throughput'] < old['throughput'] * (1 - tolerance):
+            regressions.append(f"{result['size']} prospects: throughput {old['throughput']} -> {result['throughput']} prospects/s")
+        if result['peak_rss_mib'] > old['peak_rss_mib'] * (1 + tolerance):
+            regressions.append(f"{result['size']} prospects: peak RSS {old['peak_rss_mib']} -> {result['peak_rss_mib']} MiB")
+    return regressions
+
+
+def per_service(values, parser):
+    """Parse SERVICE=VALUE arguments into a dict."""
+    settings = {}
+    for value in values or []:
+        name, _, number = value.partition('=')
+        if name not in SERVICES:
+            parser.error(f"Unknown service '{name}' (one of {', '.join(SERVICES)})")
+        settings[name] = float(number)
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the whole prospecting flow against local stub services")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[100, 1000, 10000], help="Prospects per campaign")
+    parser.add_argument("--latency", nargs='+', metavar="SERVICE=SECONDS", help=f"Mean latency per service ({', '.join(SERVICES)})")
+    parser.add_argument("--error-rate", nargs='+', metavar="SERVICE=RATE", help="Share of 503 answers per service (default 0)")
+    parser.add_argument("--page-kb", type=int, default=30, help="Size of the websites' pages in KiB")
+    parser.add_argument("--archaic-ratio", type=float, default=0.5, help="Share of archaic websites")
+    parser.add_argument("--analyzer", choices=["soup", "stream"], default="soup", help="Design analysis engine")
+    parser.add_argument("--polite", action="store_true", help="Schedule site requests with FetchScheduler (FETCH_* settings)")
+    parser.add_argument("--progressive", action="store_true", help="Analyze pages while they download (SiteChecker.check_progressive)")
+    parser.add_argument("--fingerprints", action="store_true", help="Reuse verdicts across template sites (FingerprintIndex)")
+    parser.add_argument("--workers", nargs='+', metavar="STAGE=N", default=[], help="Workers per pipeline stage")
+    parser.add_argument("--log-level", default="ERROR", help="Log level of the pipeline during the runs")
+    parser.add_argument("--save", type=str, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=str, help="Fail if the results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="With --compare, allowed relative regression")
+    args = parser.parse_args()
+
+    options = {
+        'analyzer': args.analyzer,
+        'fingerprints': args.fingerprints,
+        'progressive': args.progressive,
+        'polite': args.polite,
+        'log_level': args.log_level.upper(),
+        'workers': {stage: int(n) for stage, _, n in (w.partition('=') for w in args.workers)},
+    }
+    latency = per_service(args.latency, parser)
+    error_rate = per_service(args.error_rate, parser)
+
+    results = []
+    with SimulatedServices(latency, error_rate, page_bytes=args.page_kb * 1024, archaic_ratio=args.archaic_ratio) as services:
+        urls = {name: services.url(name) for name in SERVICES}
+        for size in args.sizes:
+            services.set_places(size)
+            # A fresh process per size: imports, caches and peak RSS start from zero
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                result = pool.submit(run_size, size, urls, options).result()
+            report(result)
+            results.append(result)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Startup time of main.py, against a budget.
+
+Times `main.py --help` (arguments parsed, nothing else) in fresh interpreters,
+minus the time of a bare `python -c pass`, so that the budget only covers our
+own imports. Also lists the heavy third-party modules the command loaded and
+the slowest imports (python -X importtime).
+
+Exits with status 1 when the median overhead is over budget or a heavy module
+is loaded, so it can gate a release.
+
+Usage: python benchmarks/bench_startup.py [--runs 20] [--budget-ms 50]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+# Modules that must wait until a stage needs them
+HEAVY_MODULES = ('openai', 'bs4', 'requests', 'dotenv', 'antigravity', 'webbrowser', 'asyncio', 'sqlite3')
+
+# Runs main.py --help and prints the heavy modules left in sys.modules
+PROBE = f"""
+import contextlib, io, runpy, sys
+sys.argv = [{MAIN!r}, '--help']
+try:
+    with contextlib.redirect_stdout(io.StringIO()):
+        runpy.run_path({MAIN!r}, run_name='__main__')
+except SystemExit:
+    pass
+print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+"""
+
+
+def wall_times(command, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def slowest_imports(command, limit):
+    """Returns: [(cumulative microseconds, module)] of the slowest imports"""
+    output = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), name.rstrip()))
+    # Only top-level entries: their cumulative time includes the nested ones
+    top = [(us, name.strip()) for us, name in imports if not name.startswith('   ')]
+    return sorted(top, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup time of main.py")
+    parser.add_argument("--runs", type=int, default=20, help="Interpreters started per measure")
+    parser.add_argument("--budget-ms", type=float, default=50, help="Max median overhead over a bare interpreter")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    command = [sys.executable, MAIN, '--help']
+    bare = statistics.median(wall_times([sys.executable, '-c', 'pass'], args.runs))
+    times = wall_times(command, args.runs)
+    median = statistics.median(times)
+    overhead = (median - bare) * 1000
+
+    loaded = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True).stdout.strip()
+
+    print(f"python -c pass     median {bare * 1000:6.1f} ms")
+    print(f"main.py --help     median {median * 1000:6.1f} ms (min {min(times) * 1000:.1f} ms)"
+          f" | overhead {overhead:.1f} ms, budget {args.budget_ms:.0f} ms")
+    print("heavy modules loaded:", loaded or "none")
+    print("slowest imports:")
+    for us, name in slowest_imports(command, args.top):
+        print(f"    {us / 1000:6.1f} ms  {name}")
+
+    if overhead > args.budget_ms or loaded:
+        print("OVER BUDGET")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
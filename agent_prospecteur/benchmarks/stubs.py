@@ -0,0 +1,272 @@
+"""
+Local stand-ins for the services the prospecting flow talks to, used by the
+offline benchmarks: Google Places (Nearby Search), Hunter (Domain Search),
+OpenAI (Chat Completions), SendGrid (Mail Send) and a farm of business websites.
+
+Every service answers after a random delay around its configured latency
+(uniform between 0.5x and 1.5x) and fails with a 503 at its configured error rate.
+"""
+import json
+import random
+import threading
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+SERVICES = ('places', 'sites', 'hunter', 'openai', 'sendgrid')
+
+# Default latency of each service (seconds)
+DEFAULT_LATENCY = {
+    'places': 0.05,
+    'sites': 0.05,
+    'hunter': 0.05,
+    'openai': 0.2,
+    'sendgrid': 0.05,
+}
+
+PLACES_PER_PAGE = 20
+PAGES_PER_SEARCH = 3 # Nearby Search serves at most 60 results per query
+
+# Sites are spread over the 127.0.0.0/8 loopback block (all routed to this machine
+# on Linux), one address per site, so each has its own host and email domain
+ADDRESSES_PER_BLOCK = 254 * 256
+
+
+def site_address(index):
+    return f"127.{1 + index // ADDRESSES_PER_BLOCK}.{index // 254 % 256}.{index % 254 + 1}"
+
+
+def site_index(address):
+    _, a, b, c = (int(part) for part in address.split('.'))
+    return (a - 1) * ADDRESSES_PER_BLOCK + b * 254 + c - 1
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 256 # Bursts of connections from the worker pools
+
+    def __init__(self, address, handler, latency=0.0, error_rate=0.0, seed=0):
+        super().__init__(address, handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Count a request. Returns: (delay before answering, whether to fail it)"""
+        with self._lock:
+            self.requests += 1
+            return self.latency * self._random.uniform(0.5, 1.5), self._random.random() < self.error_rate
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, as the pooled client expects
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        delay, fail = self.server.draw()
+        if delay:
+            threading.Event().wait(delay)
+        if fail:
+            self.reply(503, b'{"error": {"message": "Service unavailable (simulated)"}}')
+            return
+        url = urlparse(self.path)
+        self.answer(url.path, {k: v[0] for k, v in parse_qs(url.query).items()}, body)
+
+    def answer(self, path, params, body):
+        raise NotImplementedError
+
+    def reply(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_json(self, data, status=200):
+        self.reply(status, json.dumps(data).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class PlacesHandler(StubHandler):
+    """
+    Nearby Search: each query is worth PAGES_PER_SEARCH pages of places, handed out
+    from one pool per keyword until `server.places` places were served.
+    Every place has a website on the farm.
+    """
+    def answer(self, path, params, body):
+        server = self.server
+        if 'pagetoken' in params:
+            keyword, page = params['pagetoken'].rsplit(':', 1)
+            page = int(page)
+        else:
+            keyword, page = params.get('keyword', ''), 1
+
+        with server._lock:
+            start = server.served.get(keyword, 0)
+            count = max(0, min(PLACES_PER_PAGE, server.places - start))
+            server.served[keyword] = start + count
+
+        if not count:
+            self.reply_json({'status': 'ZERO_RESULTS', 'results': []})
+            return
+        data = {'status': 'OK', 'results': [{
+            'place_id': f"{keyword}-{i}",
+            'name': f"Commerce {i}",
+            'vicinity': f"{i} rue du Commerce, Dakar",
+            'types': ['store'],
+            'website': f"http://{site_address(i)}:{server.site_port}/",
+        } for i in range(start, start + count)]}
+        if page < PAGES_PER_SEARCH:
+            data['next_page_token'] = f"{keyword}:{page + 1}"
+        self.reply_json(data)
+
+
+class SitesHandler(StubHandler):
+    """
+    Business websites, told apart by the address they were reached on.
+    `server.archaic_ratio` of them look archaic (no viewport, old footer, frames),
+    the others modern; every page is padded to about `server.page_bytes`.
+    """
+    def answer(self, path, params, body):
+        index = site_index(self.connection.getsockname()[0])
+        archaic = random.Random(index).random() < self.server.archaic_ratio
+        self.reply(200, self.server.page(index, archaic), 'text/html; charset=utf-8')
+
+
+class HunterHandler(StubHandler):
+    """Domain Search: one email for most domains, none for about one in five."""
+    def answer(self, path, params, body):
+        domain = params.get('domain', '')
+        found = zlib.crc32(domain.encode()) % 5 != 0
+        emails = [{'value': f"contact@{domain}", 'confidence': 90}] if found else []
+        self.reply_json({'data': {'domain': domain, 'emails': emails}, 'meta': {'results': len(emails)}})
+
+
+class OpenAIHandler(StubHandler):
+    """Chat Completions: a fixed email of about 120 words."""
+    CONTENT = "Subject: Votre site web\n\nBonjour,\n\n" + "Nous avons remarqué quelques points à moderniser sur votre site. " * 12
+
+    def answer(self, path, params, body):
+        request = json.loads(body or b'{}')
+        self.reply_json({
+            'id': 'chatcmpl-bench',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': request.get('model', 'gpt-3.5-turbo'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.CONTENT}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 200, 'completion_tokens': 160, 'total_tokens': 360},
+        })
+
+
+class SendGridHandler(StubHandler):
+    """Mail Send: accepts everything, counts the personalizations."""
+    def answer(self, path, params, body):
+        payload = json.loads(body or b'{}')
+        with self.server._lock:
+            self.server.emails += len(payload.get('personalizations', []))
+        self.reply(202, b'')
+
+
+HANDLERS = {
+    'places': PlacesHandler,
+    'sites': SitesHandler,
+    'hunter': HunterHandler,
+    'openai': OpenAIHandler,
+    'sendgrid': SendGridHandler,
+}
+
+
+class SimulatedServices:
+    """
+    Starts every stub on a free port.
+
+    Args:
+        latency (dict): seconds per service (missing ones: DEFAULT_LATENCY)
+        error_rate (dict): share of 503 answers per service (default 0)
+        page_bytes (int): approximate size of the farm's pages
+        archaic_ratio (float): share of archaic sites in the farm
+        places (int): places served per search keyword
+    """
+    def __init__(self, latency=None, error_rate=None, page_bytes=30 * 1024, archaic_ratio=0.5, places=1000, seed=0):
+        latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        error_rate = error_rate or {}
+        self.servers = {}
+        for name in SERVICES:
+            # The farm listens on every address to be reachable on the whole loopback block
+            host = '0.0.0.0' if name == 'sites' else '127.0.0.1'
+            self.servers[name] = StubServer((host, 0), HANDLERS[name], latency[name], error_rate.get(name, 0.0), seed)
+
+        sites = self.servers['sites']
+        sites.archaic_ratio = archaic_ratio
+        sites.page = _page_builder(page_bytes)
+        search = self.servers['places']
+        search.places = places
+        search.served = {}
+        search.site_port = sites.server_address[1]
+        self.servers['sendgrid'].emails = 0
+        self._threads = []
+
+    def start(self):
+        for server in self.servers.values():
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.servers[name].server_address[1]}"
+
+    def set_places(self, count):
+        self.servers['places'].places = count
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _page_builder(page_bytes):
+    cache = {}
+
+    def page(index, archaic):
+        # Two shapes of page, padded once; only the name changes from site to site
+        if archaic not in cache:
+            cache[archaic] = _page(archaic, page_bytes)
+        head, tail = cache[archaic]
+        return head + f"Commerce {index}".encode() + tail
+    return page
+
+
+def _page(archaic, page_bytes):
+    if archaic:
+        head = "<html><head><title>"
+        body = ("</title></head><frameset cols='20%,80%'><frame src='menu.html'><frame src='main.html'></frameset>"
+                "<body><table><tr><td><font face='Arial'>Bienvenue</font></td></tr></table>")
+        row = "<table><tr><td><font size='2'>Nos produits et services, depuis 1998.</font></td></tr></table>\n"
+        footer = "<div id='footer'>&copy; 2009 Tous droits réservés</div></body></html>"
+    else:
+        head = "<!DOCTYPE html><html lang='fr'><head><meta name='viewport' content='width=device-width, initial-scale=1'><title>"
+        body = ("</title><link rel='stylesheet' href='https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css'>"
+                "</head><body><main class='container'><h1>Bienvenue</h1>")
+        row = "<section class='row'><p class='col'>Nos produits et services, faits maison chaque jour.</p></section>\n"
+        footer = "</main><footer>&copy; 2024 Tous droits réservés</footer></body></html>"
+
+    padding = max(0, page_bytes - len(head) - len(body) - len(footer))
+    rows = row * (padding // len(row.encode()) + 1)
+    return head.encode(), (body + rows + footer).encode()
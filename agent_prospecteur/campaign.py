@@ -0,0 +1,159 @@
+"""
+Sharded campaigns: every keyword of a spec searched around every location,
+each (keyword, location) pair being a shard run by a pool of worker processes.
+
+Spec (JSON):
+    {
+        "keywords": ["boulangerie", "plombier"],
+        "locations": [
+            "14.6928,-17.4467",
+            {"name": "Thiès", "location": "14.7910,-16.9359", "radius": 8000},
+            {"name": "Saint-Louis", "bounds": [15.98, -16.53, 16.06, -16.46]}
+        ],
+        "radius": 5000,
+        "type": null,
+        "full_coverage": true,
+        "tile_radius": 1000
+    }
+Settings missing from the spec (or from a location) come from the command line.
+
+Workers share the prospects database in WAL mode. A prospect is claimed by the
+first shard that finds it (CampaignStore), so none is handled twice, and the
+parent aggregates progress, totals and metrics as shards finish.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .config import Config
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Pipeline of the worker process, built once by _init_worker
+_worker = {}
+
+
+def load_spec(path, args):
+    """
+    Read a campaign spec and expand it into shards.
+    Returns: dict {shard id: query}, in spec order (keywords first)
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    if not spec.get('keywords') or not spec.get('locations'):
+        raise ValueError(f"Campaign spec {path} needs 'keywords' and 'locations'")
+
+    shards = {}
+    for keyword in spec['keywords']:
+        for location in spec['locations']:
+            if isinstance(location, str):
+                location = {'location': location}
+            settings = dict(spec, **location)
+            bounds = settings.get('bounds')
+            name = location.get('name') or location.get('location') or ','.join(map(str, bounds))
+            shard = f"{keyword} @ {name}"
+            shards[shard] = {
+                'shard': shard,
+                'location': settings.get('location', args.location),
+                'radius': settings.get('radius', args.radius),
+                'keyword': keyword,
+                'type': settings.get('type', args.domain),
+                'sector': settings.get('sector') or settings.get('type', args.domain) or keyword,
+                # A bounding box is always covered in full
+                'full_coverage': settings.get('full_coverage', args.full_coverage) or bool(bounds),
+                'bounds': tuple(bounds) if bounds else None,
+                'tile_radius': settings.get('tile_radius', args.tile_radius),
+                'tile_workers': settings.get('tile_workers', args.tile_workers),
+            }
+    return shards
+
+
+def run_campaign(args):
+    """
+    Run every shard of the campaign in args.campaign over args.processes worker processes.
+    With args.resume, shards finished by the interrupted campaign are not run again.
+    Returns: (prospects processed, emails sent) over the whole campaign
+    """
+    from .db.campaign import CampaignStore
+
+    shards = load_spec(args.campaign, args)
+    store = CampaignStore(Config.DB_PATH)
+    todo = store.start(shards, resume=args.resume)
+    finished, processed, sent = store.totals()
+    if finished:
+        logger.info(f"Resuming campaign: {finished} shards already done ({processed} prospects, {sent} emails).")
+
+    processes = max(1, min(args.processes or os.cpu_count() or 1, len(todo)))
+    logger.info(f"Campaign: {len(todo)} shards to run ({len(shards)} in total) over {processes} processes.")
+    failed = 0
+    start = time.perf_counter()
+    try:
+        if todo:
+            # Spawned rather than forked: workers start without the parent's threads and connections
+            with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(args,)) as pool:
+                futures = {pool.submit(_run_shard, shards[shard]): shard for shard in todo}
+                for future in as_completed(futures):
+                    shard = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception:
+                        logger.exception(f"Shard '{shard}' failed")
+                        failed += 1
+                        continue
+
+                    registry.merge(result['metrics'])
+                    store.finish(shard, result['processed'], result['sent'])
+                    finished += 1
+                    processed += result['processed']
+                    sent += result['sent']
+                    elapsed = time.perf_counter() - start
+                    logger.info(
+                        f"[{finished}/{len(shards)}] {shard}: {result['processed']} prospects, {result['sent']} emails"
+                        f" in {result['seconds']:.1f}s | total {processed} prospects, {sent} emails"
+                        f" ({processed / elapsed:.1f} prospects/s)"
+                    )
+    finally:
+        store.close()
+
+    if failed:
+        logger.error(f"{failed} shards failed: run the campaign again with --resume to retry them.")
+    return processed, sent
+
+
+def _init_worker(args):
+    """Worker process: its own database connections and pipeline, reused for every shard it runs."""
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL.upper()),
+        format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("prospector.log"),
+            logging.StreamHandler()
+        ]
+    )
+    from .db.database import Database
+    from .db.campaign import CampaignStore
+    from .main import build_pipeline
+
+    db = Database(Config.DB_PATH)
+    db.connect()
+    claims = CampaignStore(Config.DB_PATH)
+    _worker['pipeline'], _ = build_pipeline(args, db, claims=claims)
+
+
+def _run_shard(query):
+    """Run one shard. Returns: its counts, duration and metrics"""
+    pipeline = _worker['pipeline']
+    registry.reset()
+    processed, sent = pipeline.processed_count, pipeline.sent_count
+    start = time.perf_counter()
+    pipeline.run([query])
+    return {
+        'processed': pipeline.processed_count - processed,
+        'sent': pipeline.sent_count - sent,
+        'seconds': time.perf_counter() - start,
+        'metrics': registry.dump(),
+    }
@@ -1,27 +1,116 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Stages of the prospecting flow, in order
+STAGES = ('search', 'check', 'analyze', 'enrich', 'generate', 'send', 'persist')
 
-class Config:
-    # API Keys
-    GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    HUNTER_API_KEY = os.getenv("HUNTER_API_KEY")
-    SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-    
-    # Email Settings
-    SENDGRID_FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL", "prospection@example.com")
-    
-    # App Settings
-    ANTIGRAVITY_FLIGHT = os.getenv("ANTIGRAVITY_FLIGHT", "0") == "1"
-    DB_PATH = os.getenv("DB_PATH", "prospects.db")
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Default number of concurrent workers per stage (overridable from the CLI)
+DEFAULT_WORKERS = {
+    'search': 1,
+    'check': 16,
+    'analyze': 4,
+    'enrich': 4,
+    'generate': 4,
+    'send': 4,
+    'persist': 1,
+}
 
+class Config:
     # Limits
-    MAX_PROSPECTS = 50 
-    
+    MAX_PROSPECTS = 50
+
+    @classmethod
+    def load(cls, dotenv=True):
+        """
+        Read the settings from the environment.
+        With dotenv, the variables of the .env file are loaded first (those
+        already set in the environment win). Importing this module reads the
+        environment only; main() loads the .env file once its arguments are parsed.
+        """
+        if dotenv:
+            from dotenv import load_dotenv
+            load_dotenv()
+
+        # API Keys
+        cls.GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
+        cls.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+        cls.HUNTER_API_KEY = os.getenv("HUNTER_API_KEY")
+        cls.SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+
+        # Email Settings
+        cls.SENDGRID_FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL", "prospection@example.com")
+
+        # App Settings
+        cls.ANTIGRAVITY_FLIGHT = os.getenv("ANTIGRAVITY_FLIGHT", "0") == "1"
+        cls.EASTER_EGGS = os.getenv("EASTER_EGGS", "0") == "1" # import antigravity (opens a web browser)
+        cls.DB_PATH = os.getenv("DB_PATH", "prospects.db")
+        cls.DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL") # SQLite fsync policy (WAL mode): OFF, NORMAL or FULL
+        cls.DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "500")) # Rows fetched per query when streaming pending prospects
+        cls.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+        # Google Places
+        cls.PLACES_RATE_LIMIT = float(os.getenv("PLACES_RATE_LIMIT", "10")) # Requests per second
+        cls.PLACES_CACHE_PATH = os.getenv("PLACES_CACHE_PATH", "places_cache.db")
+        cls.PLACES_CACHE_TTL = int(os.getenv("PLACES_CACHE_TTL", str(24 * 3600))) # Seconds
+        cls.PLACES_CACHE_MAX_ENTRIES = int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "10000"))
+        cls.PLACES_CACHE_PRECISION = int(os.getenv("PLACES_CACHE_PRECISION", "3")) # Coordinate decimals in cache keys (~100 m)
+
+        # Hunter (allows 15 requests/s and 500/min on Domain Search)
+        cls.HUNTER_RATE_LIMIT = float(os.getenv("HUNTER_RATE_LIMIT", "8")) # Requests per second
+        cls.HUNTER_BURST = int(os.getenv("HUNTER_BURST", "15"))
+        cls.HUNTER_MAX_RETRIES = int(os.getenv("HUNTER_MAX_RETRIES", "3")) # On 429 and 5xx answers
+        cls.EMAIL_CACHE_TTL_FOUND = int(os.getenv("EMAIL_CACHE_TTL_FOUND", str(30 * 24 * 3600))) # Seconds
+        cls.EMAIL_CACHE_TTL_EMPTY = int(os.getenv("EMAIL_CACHE_TTL_EMPTY", str(7 * 24 * 3600))) # Domains without email are asked again sooner
+
+        # SendGrid
+        cls.SENDGRID_API_HOST = os.getenv("SENDGRID_API_HOST", "https://api.sendgrid.com")
+        cls.SENDGRID_MAX_CONCURRENCY = int(os.getenv("SENDGRID_MAX_CONCURRENCY", "4")) # Send requests in flight
+        cls.SENDGRID_MAX_RETRIES = int(os.getenv("SENDGRID_MAX_RETRIES", "2")) # On 429 answers and connections that could not be opened (never a request SendGrid may have processed)
+
+        # OpenAI
+        cls.OPENAI_MAX_IN_FLIGHT = int(os.getenv("OPENAI_MAX_IN_FLIGHT", "8")) # Concurrent generations (halved on 429, then raised back)
+        cls.OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "90000")) # TPM limit of the account
+        cls.OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4")) # On rate limits and transient errors
+        cls.OPENAI_REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", "60")) # Seconds before a call is abandoned (then retried)
+
+        # Message templates
+        cls.TEMPLATE_CACHE_MAX_ENTRIES = int(os.getenv("TEMPLATE_CACHE_MAX_ENTRIES", "1000")) # Least recently used templates are evicted beyond this count
+        cls.TEMPLATE_MAX_USES = int(os.getenv("TEMPLATE_MAX_USES", "20")) # Emails written from one template before a new one is generated
+
+        # HTTP
+        cls.HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "100")) # Hosts kept in the pool
+        cls.HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10")) # Connections per host
+        cls.MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", str(2 * 1024 * 1024))) # Body download cap
+        cls.HTTP_ADAPTIVE_TIMEOUTS = os.getenv("HTTP_ADAPTIVE_TIMEOUTS", "1").lower() in ("1", "true", "yes") # Timeouts follow the latencies seen
+        cls.HTTP_TIMEOUT_FACTOR = float(os.getenv("HTTP_TIMEOUT_FACTOR", "3")) # Adaptive timeout: this many times the p99 latency
+        cls.HTTP_MIN_TIMEOUT = float(os.getenv("HTTP_MIN_TIMEOUT", "2")) # Seconds, floor of adaptive timeouts
+        cls.HTTP_TIMEOUT_MIN_SAMPLES = int(os.getenv("HTTP_TIMEOUT_MIN_SAMPLES", "20")) # Calls seen before timeouts adapt
+        cls.HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5")) # Failures in a row that open a host's circuit
+        cls.HTTP_BREAKER_COOLDOWN = float(os.getenv("HTTP_BREAKER_COOLDOWN", "30")) # Seconds before a probe is let through
+        cls.HTTP_BREAKER_MAX_COOLDOWN = float(os.getenv("HTTP_BREAKER_MAX_COOLDOWN", "600")) # Doubled after each failed probe, up to this
+        cls.FETCH_MAX_CONCURRENCY = int(os.getenv("FETCH_MAX_CONCURRENCY", "64")) # With --polite: website requests in flight
+        cls.FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2")) # Requests in flight per host
+        cls.FETCH_PER_IP = int(os.getenv("FETCH_PER_IP", "4")) # Requests in flight per resolved address (shared hosting)
+        cls.FETCH_HOST_INTERVAL = float(os.getenv("FETCH_HOST_INTERVAL", "1")) # Seconds between two requests to a host
+        cls.FETCH_IP_INTERVAL = float(os.getenv("FETCH_IP_INTERVAL", "0.25")) # Seconds between two requests to an address
+        cls.FETCH_RATE = float(os.getenv("FETCH_RATE", "50")) # Website requests per second, whole crawl
+        cls.PROGRESSIVE_HEAD_BYTES = int(os.getenv("PROGRESSIVE_HEAD_BYTES", str(64 * 1024))) # Read before jumping to the end of an ambiguous page
+        cls.PROGRESSIVE_TAIL_BYTES = int(os.getenv("PROGRESSIVE_TAIL_BYTES", str(16 * 1024))) # Read from the end of such a page (footer)
+
+        # Page cache
+        cls.PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "page_cache.db")
+        cls.PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", str(7 * 24 * 3600))) # Seconds before revalidation
+        cls.PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+        # Fingerprint index: pages of the same template reuse the signals of the first one analyzed
+        cls.FINGERPRINT_MAX_DISTANCE = int(os.getenv("FINGERPRINT_MAX_DISTANCE", "3")) # Bits (of 64) two pages of one template may differ by, at most 3
+
+        # Negative cache: seconds before a failed website is probed again
+        cls.NEGATIVE_TTL_NXDOMAIN = int(os.getenv("NEGATIVE_TTL_NXDOMAIN", str(7 * 24 * 3600)))
+        cls.NEGATIVE_TTL_REFUSED = int(os.getenv("NEGATIVE_TTL_REFUSED", str(24 * 3600)))
+        cls.NEGATIVE_TTL_TIMEOUT = int(os.getenv("NEGATIVE_TTL_TIMEOUT", str(6 * 3600)))
+        cls.NEGATIVE_TTL_HTTP_ERROR = int(os.getenv("NEGATIVE_TTL_HTTP_ERROR", str(24 * 3600)))
+        cls.NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "100000")) # Failures closest to expiry are dropped beyond this count
+
     @classmethod
     def validate(cls):
         """Check if critical keys are present (unless in Flight Mode)."""
@@ -36,3 +125,6 @@ class Config:
         
         if missing:
             raise ValueError(f"Missing environment variables: {', '.join(missing)}")
+
+
+Config.load(dotenv=False)
@@ -0,0 +1,204 @@
+import json
+import sqlite3
+import threading
+import time
+from ..config import Config
+
+
+class SqliteCache:
+    """
+    Persistent key/value cache stored in a SQLite table.
+    Values are JSON. Each entry has its own expiry, and the least recently
+    used entries are evicted once the table is over its entry or byte budget
+    (expired ones first). Expired entries are otherwise kept: callers may still
+    revalidate or fall back on them.
+
+    Reads only track recency when there is a budget, and record it in batches
+    of touch_batch rather than writing on every hit. With lru=False reads never
+    write, and the entries closest to expiry are evicted instead.
+
+    The entry count and byte size are kept as running totals, counted again
+    from the table every recount_every writes (other processes may share it).
+    """
+    touch_batch = 64
+    recount_every = 1000
+
+    def __init__(self, db_path, table, ttl=None, max_entries=None, max_bytes=None, lru=True):
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lru = lru
+        self._order = 'accessed_at' if lru else 'expires_at'
+        self._lock = threading.Lock()
+        self._touched = {}
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={Config.DB_SYNCHRONOUS}")
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL, -- NULL: never expires
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{self._order} ON {table} ({self._order})")
+        if self.max_entries or self.max_bytes:
+            # Expired entries are the first to go
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_expires_at ON {table} (expires_at)")
+        self.conn.commit()
+        self._count = self._bytes = self._writes = 0
+        if self.max_entries or self.max_bytes:
+            self._recount()
+
+    def get(self, key, allow_stale=False):
+        """Return the cached value, or None if missing (or expired, unless allow_stale)."""
+        value, fresh = self.get_entry(key)
+        if fresh or allow_stale:
+            return value
+        return None
+
+    def get_entry(self, key):
+        """
+        Look up an entry even when it has expired.
+        Returns: (value, is_fresh), or (None, False) if missing
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, False
+            if self.lru and (self.max_entries or self.max_bytes):
+                self._touched[key] = now
+                if len(self._touched) >= self.touch_batch:
+                    self._flush_touches()
+                    self.conn.commit()
+
+        value, expires_at = row
+        return json.loads(value), expires_at is None or expires_at > now
+
+    def set(self, key, value, ttl=None):
+        """Store a value; ttl (seconds) overrides the cache default."""
+        data = json.dumps(value)
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else now + ttl
+
+        with self._lock:
+            self._forget(key)
+            self.conn.execute(
+                f"INSERT INTO {self.table} (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), expires_at, now)
+            )
+            self._count += 1
+            self._bytes += len(data)
+            self._touched.pop(key, None)
+            self._evict()
+            self.conn.commit()
+
+    def replace(self, key, value):
+        """Update the value of an existing entry, keeping its expiry."""
+        data = json.dumps(value)
+        with self._lock:
+            row = self.conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            self.conn.execute(
+                f"UPDATE {self.table} SET value = ?, size = ?, accessed_at = ? WHERE key = ?",
+                (data, len(data), time.time(), key)
+            )
+            self._bytes += len(data) - row[0]
+            self._touched.pop(key, None)
+            self.conn.commit()
+
+    def touch(self, key, ttl=None):
+        """Restart the expiry of an entry, e.g. once revalidated."""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self.conn.execute(
+                f"UPDATE {self.table} SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (None if ttl is None else now + ttl, now, key)
+            )
+            self._touched.pop(key, None)
+            self.conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._forget(key)
+            self.conn.commit()
+
+    def _forget(self, key):
+        row = self.conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._count -= 1
+            self._bytes -= row[0]
+
+    def _recount(self):
+        self._count, self._bytes = self.conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        self._writes = 0
+
+    def purge_expired(self):
+        """Drop every expired entry."""
+        with self._lock:
+            self._purge_expired()
+            self.conn.commit()
+
+    def _purge_expired(self):
+        now = time.time()
+        count, size = self.conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table} WHERE expires_at <= ?", (now,)
+        ).fetchone()
+        if count:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            self._count -= count
+            self._bytes -= size
+
+    def _flush_touches(self):
+        if self._touched:
+            self.conn.executemany(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        if not (self.max_entries or self.max_bytes):
+            return
+        self._writes += 1
+        if self._writes >= self.recount_every:
+            self._recount()
+        if not self._over_budget():
+            return
+        self._flush_touches()
+        self._purge_expired()
+
+        victims = []
+        excess_entries = self._count - self.max_entries if self.max_entries else 0
+        excess_bytes = self._bytes - self.max_bytes if self.max_bytes else 0
+        for key, size in self.conn.execute(f"SELECT key, size FROM {self.table} ORDER BY {self._order}"):
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            victims.append((key,))
+            excess_entries -= 1
+            excess_bytes -= size
+            self._count -= 1
+            self._bytes -= size
+        self.conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+
+    def _over_budget(self):
+        return bool((self.max_entries and self._count > self.max_entries) or (self.max_bytes and self._bytes > self.max_bytes))
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self.conn.commit()
+            self.conn.close()
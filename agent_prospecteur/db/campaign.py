@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import threading
+from ..config import Config
+
+
+class CampaignStore:
+    """
+    State of a sharded campaign, in the prospects database (WAL mode, so the
+    worker processes share it safely): its shards with their totals once done,
+    and the prospects claimed by a shard. A prospect found by several shards
+    (neighbouring locations, similar keywords) is only handled by the first
+    one to claim it.
+    """
+    def __init__(self, db_path=None):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path or Config.DB_PATH, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={Config.DB_SYNCHRONOUS}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS campaign_shards (
+                id TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                processed INTEGER,
+                sent INTEGER,
+                done_at TIMESTAMP -- NULL until the shard is finished
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS campaign_claims (
+                key TEXT PRIMARY KEY,
+                shard TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def start(self, shards, resume=False):
+        """
+        Record the shards of a new campaign, or with resume, of the interrupted one:
+        finished shards are kept, and the claims of unfinished ones are released
+        so that their prospects can be claimed again.
+        Args:
+            shards (dict): {shard id: query}
+        Returns: ids of the shards left to run, in order
+        """
+        with self._lock, self.conn:
+            if resume:
+                self.conn.execute("""
+                    DELETE FROM campaign_claims WHERE shard NOT IN (SELECT id FROM campaign_shards WHERE done_at IS NOT NULL)
+                """)
+            else:
+                self.conn.execute("DELETE FROM campaign_shards")
+                self.conn.execute("DELETE FROM campaign_claims")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO campaign_shards (id, query) VALUES (?, ?)",
+                ((shard, json.dumps(query)) for shard, query in shards.items())
+            )
+            done = {row[0] for row in self.conn.execute("SELECT id FROM campaign_shards WHERE done_at IS NOT NULL")}
+        return [shard for shard in shards if shard not in done]
+
+    def claim(self, key, shard):
+        """Returns: True if the prospect was free and is now claimed by this shard"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute("INSERT OR IGNORE INTO campaign_claims (key, shard) VALUES (?, ?)", (key, shard))
+            return cursor.rowcount == 1
+
+    def finish(self, shard, processed, sent):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE campaign_shards SET processed = ?, sent = ?, done_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (processed, sent, shard)
+            )
+
+    def totals(self):
+        """Returns: (finished shards, prospects processed, emails sent) of the campaign"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(processed), 0), COALESCE(SUM(sent), 0) FROM campaign_shards WHERE done_at IS NOT NULL"
+            ).fetchone()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
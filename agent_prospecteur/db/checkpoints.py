@@ -0,0 +1,86 @@
+import json
+import sqlite3
+import threading
+from ..config import Config
+
+
+class CheckpointStore:
+    """
+    Progress of the current campaign, in the prospects database: the last
+    stage each prospect went through together with its intermediate results
+    (verdict, email, message...), and the searches already completed.
+    A resumed run picks every prospect up after its last stage.
+    Downloaded pages (ctx['html']) are not saved: they are the bulk of a
+    context and can be fetched again.
+    """
+    def __init__(self, db_path=None):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path or Config.DB_PATH, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={Config.DB_SYNCHRONOUS}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL, -- last stage done, 'done' once finished or dropped
+                context TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS checkpoint_searches (query TEXT PRIMARY KEY)")
+        self.conn.commit()
+
+    def reset(self):
+        """Forget the previous campaign."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM checkpoints")
+            self.conn.execute("DELETE FROM checkpoint_searches")
+
+    def save(self, contexts):
+        """Record the current stage (ctx['stage']) and results of many prospects at once."""
+        # Upsert rather than replace: a row keeps its rowid, which pending() pages on
+        query = """
+            INSERT INTO checkpoints (key, stage, context) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                stage = excluded.stage, context = excluded.context, updated_at = CURRENT_TIMESTAMP
+        """
+        with self._lock, self.conn:
+            self.conn.executemany(query, (
+                (ctx['key'], ctx['stage'], json.dumps({k: v for k, v in ctx.items() if k != 'html'}))
+                for ctx in contexts
+            ))
+
+    def has(self, key):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM checkpoints WHERE key = ?", (key,)).fetchone() is not None
+
+    def pending(self):
+        """Yield the saved contexts of prospects not finished yet."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, context FROM checkpoints WHERE stage != 'done' AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, Config.DB_BATCH_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            for last, context in rows:
+                yield dict(json.loads(context), html=None)
+
+    def search_done(self, query):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT 1 FROM checkpoint_searches WHERE query = ?", (self._query_key(query),)
+            ).fetchone() is not None
+
+    def mark_search_done(self, query):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO checkpoint_searches (query) VALUES (?)", (self._query_key(query),))
+
+    @staticmethod
+    def _query_key(query):
+        return json.dumps(query, sort_keys=True)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
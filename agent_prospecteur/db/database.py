@@ -1,13 +1,30 @@
 import sqlite3
 import datetime
 import logging
-from . import config
+import re
+import unicodedata
+from ..config import Config
+from ..metrics import registry
 
-# Configure logging (mocking config for now since we are in the same package structure)
-# In real run, config is imported from parent or sibling. 
-# We'll assume this file is at agent_prospecteur/db/database.py and config is at agent_prospecteur/config.py
-# So we need to fix import in the actual file content above if running as module.
-# For simplicity in scripts, we'll try relative import or assume path is set.
+# Columns written when a prospect is saved (dedup_key is computed)
+PROSPECT_COLUMNS = ['place_id', 'name', 'address', 'city', 'sector', 'website_url', 'website_status', 'email', 'dedup_key']
+# Outcome of the outreach, also saved by add_prospects
+OUTREACH_COLUMNS = ['status', 'message_content', 'sent_at']
+
+
+def prospect_key(name, city):
+    """Normalized name and city of a prospect: accents, case and punctuation ignored."""
+    text = unicodedata.normalize('NFKD', f"{name or ''}|{city or ''}")
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return '|'.join(' '.join(re.findall(r'[a-z0-9]+', part)) for part in text.split('|', 1))
+
+
+def _values(prospect, columns):
+    return [prospect_key(prospect.get('name'), prospect.get('city')) if c == 'dedup_key' else prospect.get(c) for c in columns]
+
+# Prospects ready to be contacted. Kept identical to the WHERE clause of
+# idx_prospects_pending so that SQLite can use that partial index.
+PENDING_FILTER = "status = 'new' AND website_status IN ('NO_SITE', 'ARCHAIC') AND email IS NOT NULL"
 
 class Database:
     def __init__(self, db_path="prospects.db"):
@@ -16,9 +33,14 @@ class Database:
         self.cursor = None
 
     def connect(self):
-        self.conn = sqlite3.connect(self.db_path)
+        # The pipeline writes from its worker threads; callers serialize access
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
+        # WAL: readers never block the writer, and with synchronous=NORMAL a
+        # commit no longer waits for an fsync (only checkpoints do)
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute(f"PRAGMA synchronous={Config.DB_SYNCHRONOUS}")
         self.create_tables()
 
     def create_tables(self):
@@ -35,42 +57,163 @@ class Database:
                 message_content TEXT,
                 sent_at TIMESTAMP,
                 status TEXT DEFAULT 'new',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                place_id TEXT,
+                last_updated TIMESTAMP,
+                dedup_key TEXT
             )
         """)
+
+        # Databases created before these columns existed
+        existing = {row['name'] for row in self.cursor.execute("PRAGMA table_info(prospects)")}
+        for column, kind in (('place_id', 'TEXT'), ('last_updated', 'TIMESTAMP'), ('dedup_key', 'TEXT')):
+            if column not in existing:
+                self.cursor.execute(f"ALTER TABLE prospects ADD COLUMN {column} {kind}")
+        rows = self.cursor.execute("SELECT id, name, city FROM prospects WHERE dedup_key IS NULL").fetchall()
+        self.cursor.executemany("UPDATE prospects SET dedup_key = ? WHERE id = ?",
+                                [(prospect_key(r['name'], r['city']), r['id']) for r in rows])
+
+        # Dedup keys, also used by the upsert in add_prospects. Older databases
+        # deduplicated on the raw name and city: merge what only differed in spelling
+        self.cursor.execute("DROP INDEX IF EXISTS idx_prospects_name_city")
+        self.cursor.execute("DROP INDEX IF EXISTS idx_prospects_dedup_key")
+        self._merge_duplicates()
+        self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_prospects_place_id ON prospects (place_id) WHERE place_id IS NOT NULL")
+        self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_prospects_dedup ON prospects (dedup_key)")
+
+        # Status filters: the partial index only holds pending rows, ordered by id for keyset paging
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_prospects_status ON prospects (status, website_status, email)")
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_prospects_pending ON prospects (id) WHERE {PENDING_FILTER}")
         self.conn.commit()
 
+    def _merge_duplicates(self):
+        """Keep one row per dedup_key: the first saved, completed with what its duplicates knew."""
+        def contacted(row):
+            return {'new': 0, 'sent': 2}.get(row['status'], 1)
+
+        keys = [r[0] for r in self.cursor.execute(
+            "SELECT dedup_key FROM prospects GROUP BY dedup_key HAVING COUNT(*) > 1"
+        ).fetchall()]
+        for key in keys:
+            rows = self.cursor.execute("SELECT * FROM prospects WHERE dedup_key = ? ORDER BY id", (key,)).fetchall()
+            kept = dict(rows[0])
+            for row in rows[1:]:
+                for column in ('place_id', 'address', 'sector', 'website_url', 'website_status', 'email', 'message_content'):
+                    if kept[column] is None:
+                        kept[column] = row[column]
+                # Contacted under either spelling means contacted
+                if contacted(row) > contacted(kept):
+                    kept.update(status=row['status'], message_content=row['message_content'] or kept['message_content'],
+                                sent_at=row['sent_at'])
+            # Duplicates go first: the kept row may take over their place_id
+            self.cursor.execute("DELETE FROM prospects WHERE dedup_key = ? AND id != ?", (key, kept['id']))
+            columns = ['place_id', 'address', 'sector', 'website_url', 'website_status', 'email', 'status', 'message_content', 'sent_at']
+            self.cursor.execute(
+                f"UPDATE prospects SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                [kept[c] for c in columns] + [kept['id']]
+            )
+
     def add_prospect(self, prospect_data):
         """
         Add a new prospect or update if exists (by name/address or some unique constraint).
         For now, we just insert.
         """
-        # Check duplicates by name and city to be safe
-        self.cursor.execute("SELECT id FROM prospects WHERE name = ? AND city = ?", (prospect_data.get('name'), prospect_data.get('city')))
+        # Check duplicates by place_id, or normalized name and city to be safe
+        self.cursor.execute(
+            "SELECT id FROM prospects WHERE place_id = ? OR dedup_key = ?",
+            (prospect_data.get('place_id'), prospect_key(prospect_data.get('name'), prospect_data.get('city')))
+        )
         existing = self.cursor.fetchone()
         
         if existing:
             return existing['id']
 
-        columns = ['name', 'address', 'city', 'sector', 'website_url', 'website_status', 'email']
-        values = [prospect_data.get(c) for c in columns]
+        columns = PROSPECT_COLUMNS
+        values = _values(prospect_data, columns)
         
         query = f"INSERT INTO prospects ({', '.join(columns)}) VALUES ({', '.join(['?']*len(columns))})"
         self.cursor.execute(query, values)
         self.conn.commit()
         return self.cursor.lastrowid
 
+    def add_prospects(self, prospects):
+        """
+        Save many prospects in a single transaction.
+        A prospect already known (same place_id, or same name and city once
+        normalized, see prospect_key) is updated
+        with the new website/email info instead of being inserted again.
+        Prospects may also carry their outreach outcome (status, message_content, sent_at);
+        a 'new' status never replaces the status of a prospect already contacted.
+        """
+        columns = PROSPECT_COLUMNS + OUTREACH_COLUMNS
+        updates = """
+            website_url = COALESCE(excluded.website_url, website_url),
+            website_status = COALESCE(excluded.website_status, website_status),
+            email = COALESCE(excluded.email, email),
+            status = CASE WHEN excluded.status = 'new' THEN status ELSE excluded.status END,
+            message_content = COALESCE(excluded.message_content, message_content),
+            sent_at = COALESCE(excluded.sent_at, sent_at),
+            last_updated = CURRENT_TIMESTAMP
+        """
+        query = f"""
+            INSERT INTO prospects ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})
+            ON CONFLICT (place_id) WHERE place_id IS NOT NULL DO UPDATE SET {updates}
+            ON CONFLICT (dedup_key) DO UPDATE SET {updates}, place_id = COALESCE(place_id, excluded.place_id)
+        """
+        with registry.timer('db_seconds', op='add_prospects'), self.conn:
+            self.cursor.executemany(query, (
+                _values(p, PROSPECT_COLUMNS) + [p.get('status') or 'new', p.get('message_content'), p.get('sent_at')]
+                for p in prospects
+            ))
+
+    def iter_prospect_keys(self):
+        """Yield (place_id, dedup_key) of every saved prospect, in id order."""
+        last_id = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, place_id, dedup_key FROM prospects WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, Config.DB_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                return
+            for last_id, place_id, dedup_key in rows:
+                yield place_id, dedup_key
+
+    def prospect_exists(self, place_id, dedup_key):
+        """Whether a prospect with this place_id or normalized name and city is saved."""
+        return self.conn.execute(
+            "SELECT 1 FROM prospects WHERE place_id = ? OR dedup_key = ? LIMIT 1", (place_id, dedup_key)
+        ).fetchone() is not None
+
+    def count_prospects(self):
+        return self.conn.execute("SELECT COUNT(*) FROM prospects").fetchone()[0]
+
     def get_pending_prospects(self):
         """Get prospects that are 'new' and fit for sending (Archaic or No Site)."""
-        self.cursor.execute("""
-            SELECT * FROM prospects 
-            WHERE status = 'new' 
-            AND website_status IN ('NO_SITE', 'ARCHAIC')
-            AND email IS NOT NULL
-        """)
-        return self.cursor.fetchall()
+        return list(self.iter_pending_prospects())
+
+    def iter_pending_prospects(self, batch_size=None):
+        """
+        Stream the pending prospects in id order, batch_size rows at a time.
+        Each batch resumes after the last id seen (keyset pagination), so memory
+        stays constant and rows updated while iterating are not skipped or repeated.
+        """
+        batch_size = batch_size or Config.DB_BATCH_SIZE
+        last_id = 0
+        while True:
+            with registry.timer('db_seconds', op='pending_batch'):
+                rows = self.conn.execute(
+                    # Without ANALYZE statistics the planner may prefer idx_prospects_status,
+                    # which would sort every pending row again for each batch
+                    f"SELECT * FROM prospects INDEXED BY idx_prospects_pending WHERE {PENDING_FILTER} AND id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1]['id']
 
-    def update_listing_status(self, prospect_id, status, website_status=None, email=None, message=None):
+    def update_listing_status(self, prospect_id, status, website_status=None, email=None, message=None, commit=True):
         updates = []
         values = []
         
@@ -90,13 +233,36 @@ class Database:
         if not updates:
             return
 
-        updates.append("last_updated = CURRENT_TIMESTAMP") # if we had that column, but let's skip for now
+        updates.append("last_updated = CURRENT_TIMESTAMP")
         
         query = f"UPDATE prospects SET {', '.join(updates)} WHERE id = ?"
         values.append(prospect_id)
         
         self.cursor.execute(query, values)
-        self.conn.commit()
+        if commit:
+            self.conn.commit()
+
+    def update_listing_statuses(self, updates):
+        """
+        Apply many status updates in a single transaction.
+        Args:
+            updates (iterable): dicts with key 'id' and any of status, website_status, email, message, sent_at
+        """
+        query = """
+            UPDATE prospects SET
+                status = COALESCE(?, status),
+                website_status = COALESCE(?, website_status),
+                email = COALESCE(?, email),
+                message_content = COALESCE(?, message_content),
+                sent_at = COALESCE(?, sent_at),
+                last_updated = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """
+        with registry.timer('db_seconds', op='update_statuses'), self.conn:
+            self.cursor.executemany(query, (
+                (u.get('status'), u.get('website_status'), u.get('email'), u.get('message'), u.get('sent_at'), u['id'])
+                for u in updates
+            ))
 
     def close(self):
         if self.conn:
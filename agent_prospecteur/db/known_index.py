@@ -0,0 +1,52 @@
+import hashlib
+import math
+from .database import prospect_key
+
+
+class BloomFilter:
+    """
+    Set membership in a fixed bit array: never a false negative, false
+    positives at about `error_rate` once `capacity` keys are stored.
+    """
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(1, int(capacity))
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class KnownProspectIndex:
+    """
+    In-memory index of the prospects already in the database, keyed on
+    place_id and on normalized name + city, built once at startup.
+    A Bloom filter keeps it to ~2 bytes per prospect; its rare false
+    positives are checked against the database before a prospect is dropped.
+    """
+    def __init__(self, db, error_rate=0.001):
+        self.db = db
+        # Room for both keys of every row
+        self.filter = BloomFilter(max(1000, 2 * db.count_prospects()), error_rate)
+        for place_id, dedup_key in db.iter_prospect_keys():
+            if place_id:
+                self.filter.add(f"id:{place_id}")
+            self.filter.add(f"key:{dedup_key}")
+
+    def is_known(self, place_id, name, city):
+        """Whether the prospect is already saved. Only reads the database when the filter matches."""
+        dedup_key = prospect_key(name, city)
+        if (not place_id or f"id:{place_id}" not in self.filter) and f"key:{dedup_key}" not in self.filter:
+            return False
+        return self.db.prospect_exists(place_id, dedup_key)
@@ -1,9 +1,107 @@
-from bs4 import BeautifulSoup
+import os
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+def classify(score):
+    """Map an archaism score (higher means more archaic) to a website status."""
+    if score >= 3:
+        return 'ARCHAIC'
+    elif score <= 0:
+        return 'MODERN'
+    else:
+        return 'UNKNOWN' # Ambiguous, maybe simple site but not archaic
+
+FRAMEWORK_MARKERS = ('bootstrap', 'tailwind', 'react', 'vue')
+
+def has_framework(html_content):
+    html_str = html_content.lower()
+    return any(marker in html_str for marker in FRAMEWORK_MARKERS)
+
+def score_signals(signals):
+    """
+    Verdict from the signals of a page, as found by DesignAnalyzer.
+    Args:
+        signals (dict): viewport (bool), copyright_year (int or None), tables (int),
+            flash (bool), frameset (bool), framework (bool)
+    Returns: (status, reasons)
+    """
+    reasons = []
+    score = 0 # Higher means more archaic
+
+    # 1. Check for Viewport Meta Tag (Mobile Responsiveness)
+    if not signals['viewport']:
+        score += 3
+        reasons.append("Missing viewport meta tag (not responsive)")
+
+    # 2. Check for old copyright year
+    latest_year = signals['copyright_year']
+    if latest_year is not None and latest_year < 2020:
+        score += 2
+        reasons.append(f"Copyright year is old: {latest_year}")
+
+    # 3. Check for Tables used for layout (simple heuristic: many nested tables)
+    if signals['tables'] > 5: # Arbitrary threshold for "too many tables"
+        # Check if likely layout tables (no thread/tbody or specific classes)
+        # This is a weak heuristic but okay for now
+        score += 1
+        reasons.append("Possible table-based layout detected")
+
+    # 4. Check for Flash or Frames
+    if signals['flash']:
+        score += 5
+        reasons.append("Flash content detected")
+
+    if signals['frameset']:
+        score += 5
+        reasons.append("Frameset detected")
+
+    # 5. Check for Modern Frameworks (Bonus for Modern)
+    if signals['framework']:
+        score -= 5
+        reasons.append("Modern framework detected")
+
+    # Classification
+    return classify(score), reasons
+
+# Analyzer of each pool process, per (engine, early_exit, fingerprint index path)
+_batch_analyzers = {}
+
+def _analyze_batch(engine, early_exit, fingerprints, batch):
+    """Process pool entry point: analyze a batch of (index, html) pairs."""
+    key = (engine, early_exit, fingerprints)
+    if key not in _batch_analyzers:
+        index = None
+        if fingerprints:
+            from .fingerprint import FingerprintIndex
+            index = FingerprintIndex(fingerprints)
+        _batch_analyzers[key] = DesignAnalyzer(engine=engine, early_exit=early_exit, fingerprints=index)
+    analyzer = _batch_analyzers[key]
+    return [(index, analyzer.analyze(html)) for index, html in batch]
 
 class DesignAnalyzer:
-    def __init__(self):
-        pass
+    def __init__(self, engine='soup', early_exit=False, processes=None, fingerprints=None):
+        """
+        Args:
+            engine (str): 'soup' builds a BeautifulSoup tree, 'stream' scores the page
+                in a single tokenizer pass without building a DOM
+            early_exit (bool): 'stream' only, stop reading once the verdict is settled
+            processes (int): size of a process pool kept for analyze_many (default: one per call)
+            fingerprints (FingerprintIndex): reuse the signals of pages with the same
+                structure (template sites), only re-checking the page-specific ones
+        """
+        self.engine = engine
+        self.early_exit = early_exit
+        self.processes = processes
+        self.fingerprints = fingerprints
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stream = None
+        if engine == 'stream':
+            from .stream_analyzer import StreamingDesignAnalyzer
+            self._stream = StreamingDesignAnalyzer(early_exit=early_exit)
+        elif engine != 'soup':
+            raise ValueError(f"Unknown analyzer engine: {engine}")
 
     def analyze(self, html_content):
         """
@@ -15,54 +113,109 @@ class DesignAnalyzer:
         if not html_content:
             return 'UNKNOWN', ["No content to analyze"]
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-        reasons = []
-        score = 0 # Higher means more archaic
+        fingerprint = None
+        if self.fingerprints is not None:
+            from .fingerprint import page_fingerprint, footer_year
+            fingerprint = page_fingerprint(html_content)
+            signals = self.fingerprints.match(fingerprint)
+            if signals is not None:
+                # Same template as a page analyzed before: only the text differs
+                signals['copyright_year'] = footer_year(html_content)
+                signals['framework'] = has_framework(html_content)
+                return score_signals(signals)
+
+        if self._stream:
+            analysis = self._stream.run(html_content)
+            verdict, signals = analysis.close(), analysis.signals()
+        else:
+            signals = self._soup_signals(html_content)
+            verdict = score_signals(signals)
 
-        # 1. Check for Viewport Meta Tag (Mobile Responsiveness)
-        viewport = soup.find('meta', attrs={'name': 'viewport'})
-        if not viewport:
-            score += 3
-            reasons.append("Missing viewport meta tag (not responsive)")
+        # An early exit leaves signals unknown: only complete analyses are indexed
+        if fingerprint is not None and signals is not None:
+            self.fingerprints.add(fingerprint, signals)
+        return verdict
 
-        # 2. Check for old copyright year
+    def _soup_signals(self, html_content):
+        from bs4 import BeautifulSoup # Loaded on the first page to score, not at startup
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        copyright_year = None
         footer = soup.find('footer') or soup.find('div', class_='footer') or soup.find('div', id='footer')
         if footer:
-            text = footer.get_text()
-            years = re.findall(r'20\d{2}', text)
+            years = re.findall(r'20\d{2}', footer.get_text())
             if years:
-                latest_year = max(int(y) for y in years)
-                if latest_year < 2020:
-                    score += 2
-                    reasons.append(f"Copyright year is old: {latest_year}")
-        
-        # 3. Check for Tables used for layout (simple heuristic: many nested tables)
-        tables = soup.find_all('table')
-        if len(tables) > 5: # Arbitrary threshold for "too many tables"
-            # Check if likely layout tables (no thread/tbody or specific classes)
-            # This is a weak heuristic but okay for now
-            score += 1
-            reasons.append("Possible table-based layout detected")
-
-        # 4. Check for Flash or Frames
-        if soup.find('object') or soup.find('embed'):
-            score += 5
-            reasons.append("Flash content detected")
-        
-        if soup.find('frameset') or soup.find('frame'):
-            score += 5
-            reasons.append("Frameset detected")
-
-        # 5. Check for Modern Frameworks (Bonus for Modern)
-        html_str = html_content.lower()
-        if 'bootstrap' in html_str or 'tailwind' in html_str or 'react' in html_str or 'vue' in html_str:
-            score -= 5
-            reasons.append("Modern framework detected")
-
-        # Classification
-        if score >= 3:
-            return 'ARCHAIC', reasons
-        elif score <= 0:
-            return 'MODERN', reasons
+                copyright_year = max(int(y) for y in years)
+
+        return {
+            'viewport': soup.find('meta', attrs={'name': 'viewport'}) is not None,
+            'copyright_year': copyright_year,
+            'tables': len(soup.find_all('table')),
+            'flash': bool(soup.find('object') or soup.find('embed')),
+            'frameset': bool(soup.find('frameset') or soup.find('frame')),
+            'framework': has_framework(html_content),
+        }
+
+    def analyze_many(self, html_pages, workers=None, chunk_size=8, batch_chars=256 * 1024):
+        """
+        Analyze many pages in a process pool, so parsing does not hold the GIL
+        of the calling process.
+        Small pages are sent in batches (up to chunk_size pages and batch_chars
+        characters) to amortize IPC; a large page goes alone.
+        Yields: (index, (status, reasons)) in completion order, index being the
+        position of the page in html_pages
+        """
+        pool = self._get_pool()
+        owned = pool is None
+        if owned:
+            workers = workers or os.cpu_count() or 1
+            pool = ProcessPoolExecutor(max_workers=workers)
         else:
-            return 'UNKNOWN', reasons # Ambiguous, maybe simple site but not archaic
+            workers = self.processes
+
+        try:
+            pending = set()
+            for batch in self._batches(html_pages, chunk_size, batch_chars):
+                pending.add(pool.submit(_analyze_batch, self.engine, self.early_exit, self.fingerprints and self.fingerprints.path, batch))
+                # Keep a bounded number of batches in flight rather than the whole input
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        finally:
+            if owned:
+                pool.shutdown(cancel_futures=True)
+
+    def _batches(self, html_pages, chunk_size, batch_chars):
+        batch = []
+        size = 0
+        for index, html in enumerate(html_pages):
+            length = len(html or '')
+            if batch and (len(batch) >= chunk_size or size + length > batch_chars):
+                yield batch
+                batch = []
+                size = 0
+            batch.append((index, html))
+            size += length
+        if batch:
+            yield batch
+
+    def _get_pool(self):
+        if not self.processes:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            return self._pool
+
+    def close(self):
+        """Shut down the process pool kept for analyze_many, if any."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
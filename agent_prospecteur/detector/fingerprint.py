@@ -0,0 +1,175 @@
+import html
+import json
+import re
+import sqlite3
+import threading
+from hashlib import blake2b
+from ..config import Config
+from ..metrics import registry
+
+BITS = 64
+BANDS = 4 # Two fingerprints within BANDS - 1 bits share at least one band
+BAND_BITS = BITS // BANDS
+SHINGLE = 3 # Consecutive tags hashed together
+
+_TAG = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9:-]*)([^>]*)>')
+_ATTR_NAME = re.compile(r'([a-zA-Z_:][-a-zA-Z0-9_:.]*)\s*(?:=\s*(?:"[^"]*"|\'[^\']*\'|[^\s"\'>]+))?')
+_VIEWPORT = re.compile(r'\b(?i:name)\s*=\s*["\']?viewport(?:["\'\s/]|$)')
+
+_FOOTER_STARTS = (
+    ('footer', re.compile(r'<footer\b[^>]*>', re.I)),
+    ('div', re.compile(r'<div\b[^>]*\bclass\s*=\s*(["\'])(?:[^"\']*\s)?footer(?:\s[^"\']*)?\1[^>]*>', re.I)),
+    ('div', re.compile(r'<div\b[^>]*\bid\s*=\s*["\']?footer(?:["\'\s/>]|$)[^>]*>', re.I)),
+)
+_HIDDEN_TEXT = re.compile(r'<(script|style|template)\b.*?</\1\s*>|<!--.*?-->', re.I | re.S)
+_ANY_TAG = re.compile(r'<[^>]*>')
+
+
+def page_fingerprint(html_content):
+    """
+    Structural fingerprint of a page, from a regex scan of its tags (no parse).
+    Returns: (simhash, summary): a 64-bit SimHash of the sequence of tags and
+    attribute names, and the structural signals the scan saw, which a match must share
+    """
+    tokens = []
+    viewport = flash = frameset = False
+    tables = 0
+    for closing, tag, attrs in _TAG.findall(html_content):
+        tag = tag.lower()
+        if closing:
+            tokens.append('/' + tag)
+            continue
+        names = sorted({name.lower() for name in _ATTR_NAME.findall(attrs)})
+        tokens.append(' '.join([tag] + names))
+        if tag == 'meta':
+            viewport = viewport or bool(_VIEWPORT.search(attrs))
+        elif tag == 'table':
+            tables += 1
+        elif tag in ('object', 'embed'):
+            flash = True
+        elif tag in ('frameset', 'frame'):
+            frameset = True
+
+    summary = f"viewport={int(viewport)} layout_tables={int(tables > 5)} flash={int(flash)} frameset={int(frameset)}"
+    shingles = {'|'.join(tokens[i:i + SHINGLE]) for i in range(max(1, len(tokens) - SHINGLE + 1))}
+    return simhash(shingles), summary
+
+
+def simhash(features):
+    """64-bit SimHash of a set of strings: bit i is set when most features have it set."""
+    if not features:
+        return 0
+    digests = [format(int.from_bytes(blake2b(f.encode(), digest_size=8).digest(), 'big'), '064b') for f in features]
+    half = len(digests) / 2
+    value = 0
+    # Column counts over the binary strings: each bit is counted in C rather than in a Python loop
+    for column in zip(*digests):
+        value = (value << 1) | (column.count('1') > half)
+    return value
+
+
+def distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def footer_year(html_content):
+    """
+    Latest 20xx year in the footer text, as DesignAnalyzer reads it (first <footer>,
+    else div.footer, else div#footer), found by scanning only that element.
+    Returns: the year, or None
+    """
+    for tag, start in _FOOTER_STARTS:
+        match = start.search(html_content)
+        if match:
+            text = _element_text(html_content, match.end(), tag)
+            years = re.findall(r'20\d{2}', text)
+            return max(int(y) for y in years) if years else None
+    return None
+
+
+def _element_text(html_content, begin, tag):
+    """Visible text from `begin` to the end tag closing the element opened just before it."""
+    depth = 1
+    end = len(html_content)
+    for match in re.finditer(rf'<(/?){tag}\b[^>]*>', html_content[begin:], re.I):
+        depth += -1 if match.group(1) else 1
+        if not depth:
+            end = begin + match.start()
+            break
+    inner = _HIDDEN_TEXT.sub('', html_content[begin:end])
+    return html.unescape(_ANY_TAG.sub('', inner))
+
+
+def _signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+def _bands(value):
+    return [(value >> (i * BAND_BITS)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+class FingerprintIndex:
+    """
+    Signals DesignAnalyzer found on the pages it analyzed in full, indexed by
+    structural fingerprint, in a table of the prospects database.
+    Sites built from the same template share their structure; a page whose
+    fingerprint is within max_distance bits of a known one (and whose scan saw
+    the same structural signals) reuses its signals, and only the
+    page-specific ones (footer year, framework markers) are checked again.
+    """
+    def __init__(self, db_path=None, max_distance=None):
+        self.path = db_path or Config.DB_PATH
+        self.max_distance = Config.FINGERPRINT_MAX_DISTANCE if max_distance is None else max_distance
+        if self.max_distance >= BANDS:
+            raise ValueError(f"max_distance must be below {BANDS}: farther matches can miss every band")
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={Config.DB_SYNCHRONOUS}")
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                simhash INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                {', '.join(f'band{i} INTEGER NOT NULL' for i in range(BANDS))},
+                signals TEXT NOT NULL, -- JSON
+                PRIMARY KEY (simhash, summary)
+            )
+        """)
+        for i in range(BANDS):
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_fingerprints_band{i} ON fingerprints (band{i})")
+        self.conn.commit()
+
+    def match(self, fingerprint):
+        """
+        Find the closest known page with the same structure.
+        Returns: a copy of its signals (dict), or None
+        """
+        value, summary = fingerprint
+        bands = _bands(value)
+        where = ' OR '.join(f"band{i} = ?" for i in range(BANDS))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT simhash, signals FROM fingerprints WHERE summary = ? AND ({where})", [summary] + bands
+            ).fetchall()
+        # Rows sharing a band are candidates; the closest one within max_distance wins
+        best = min(((distance(stored & ((1 << BITS) - 1), value), signals) for stored, signals in rows), default=None)
+        if best is None or best[0] > self.max_distance:
+            registry.cache('fingerprints', 'miss')
+            return None
+        registry.cache('fingerprints', 'hit')
+        return json.loads(best[1])
+
+    def add(self, fingerprint, signals):
+        """Record the signals of a page analyzed in full."""
+        value, summary = fingerprint
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO fingerprints (simhash, summary, {', '.join(f'band{i}' for i in range(BANDS))}, signals)"
+                f" VALUES (?, ?, {', '.join('?' * BANDS)}, ?)",
+                [_signed(value), summary] + _bands(value) + [json.dumps(signals)]
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
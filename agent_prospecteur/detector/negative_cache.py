@@ -0,0 +1,54 @@
+from urllib.parse import urlparse
+from ..config import Config
+from ..db.cache import SqliteCache
+from ..metrics import registry
+
+# Failure classes, each with its own expiry
+NXDOMAIN = 'nxdomain'
+REFUSED = 'refused'
+TIMEOUT = 'timeout'
+HTTP_ERROR = 'http_error'
+
+
+class NegativeCache:
+    """
+    Remembers websites that failed (unknown domain, connection refused, timeout,
+    non-200 answer) so later runs skip them until the failure expires.
+    Kept in a table of the prospects database, of at most max_entries failures:
+    lookups are read-only, and the failures closest to expiry are dropped first.
+    """
+    def __init__(self, db_path=None, ttls=None, max_entries=None):
+        self.ttls = {
+            NXDOMAIN: Config.NEGATIVE_TTL_NXDOMAIN,
+            REFUSED: Config.NEGATIVE_TTL_REFUSED,
+            TIMEOUT: Config.NEGATIVE_TTL_TIMEOUT,
+            HTTP_ERROR: Config.NEGATIVE_TTL_HTTP_ERROR,
+        }
+        self.ttls.update(ttls or {})
+        self.store = SqliteCache(
+            db_path or Config.DB_PATH, 'negative_cache',
+            max_entries=max_entries or Config.NEGATIVE_CACHE_MAX_ENTRIES, lru=False
+        )
+
+    def _keys(self, url):
+        # Network failures concern the whole host, HTTP errors a single URL
+        host = urlparse(url if '//' in url else '//' + url).hostname or url
+        return f"host:{host}", f"url:{url}"
+
+    def get(self, url):
+        """Returns: the failure class recorded for url (or its host) if it has not expired, else None"""
+        for key in self._keys(url):
+            failure = self.store.get(key)
+            if failure:
+                registry.cache('negative', 'hit')
+                return failure
+        registry.cache('negative', 'miss')
+        return None
+
+    def record(self, url, failure):
+        host_key, url_key = self._keys(url)
+        key = url_key if failure == HTTP_ERROR else host_key
+        self.store.set(key, failure, ttl=self.ttls[failure])
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,62 @@
+from ..config import Config
+from ..db.cache import SqliteCache
+from ..metrics import registry
+
+
+class PageCache:
+    """
+    On-disk cache of downloaded website pages, keyed by final URL.
+    Each page keeps its ETag/Last-Modified validators, so a stale copy can be
+    revalidated with a conditional GET, and the verdict DesignAnalyzer gave it.
+    """
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.ttl = Config.PAGE_CACHE_TTL if ttl is None else ttl
+        self.store = SqliteCache(
+            path or Config.PAGE_CACHE_PATH, 'pages',
+            max_bytes=max_bytes or Config.PAGE_CACHE_MAX_BYTES
+        )
+
+    def lookup(self, url):
+        """
+        Find the cached page for a requested URL (followed through its redirect).
+        Returns: (page, is_fresh), page being a dict with keys
+        final_url, html, etag, last_modified, verdict; or (None, False)
+        """
+        final_url = self.store.get(f"alias:{url}", allow_stale=True) or url
+        page, fresh = self.store.get_entry(f"page:{final_url}")
+        registry.cache('pages', 'hit' if fresh else 'stale' if page else 'miss')
+        return page, fresh
+
+    def save(self, url, final_url, html, etag=None, last_modified=None):
+        """Store a freshly downloaded page. Any verdict of the previous version is dropped."""
+        if url != final_url:
+            self.store.set(f"alias:{url}", final_url)
+        self.store.set(f"page:{final_url}", {
+            'final_url': final_url,
+            'html': html,
+            'etag': etag,
+            'last_modified': last_modified,
+            'verdict': None,
+        }, ttl=self.ttl)
+
+    def revalidated(self, page):
+        """The server answered 304 Not Modified: the page is fresh again."""
+        self.store.touch(f"page:{page['final_url']}", ttl=self.ttl)
+
+    def get_verdict(self, final_url):
+        """Returns: (status, reasons) stored for the page, or None"""
+        page = self.store.get(f"page:{final_url}", allow_stale=True)
+        if page and page['verdict']:
+            return tuple(page['verdict'])
+        return None
+
+    def set_verdict(self, final_url, status, reasons):
+        page = self.store.get(f"page:{final_url}", allow_stale=True)
+        if page is None:
+            return
+        page['verdict'] = [status, reasons]
+        # Only a download or a revalidation extends the lifetime of the page
+        self.store.replace(f"page:{final_url}", page)
+
+    def close(self):
+        self.store.close()
@@ -1,35 +1,330 @@
+import codecs
+import contextlib
 import requests
 import re
+import socket
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
+from ..config import Config
+from ..metrics import registry
+from ..net.http_client import get_client, read_body, decode_body
+from ..net.outbound import AdaptiveTimeout
+from .negative_cache import NXDOMAIN, REFUSED, TIMEOUT, HTTP_ERROR
+
+# getaddrinfo errors meaning the name does not exist (as opposed to a resolver hiccup)
+_NXDOMAIN_ERRORS = {socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)}
+
+def failure_class(exc, adaptive=False):
+    """
+    Classify a failed request for the negative cache.
+    Args:
+        adaptive (bool): the body was read under an adaptive timeout, shorter than ours
+    Returns: NXDOMAIN, REFUSED, TIMEOUT or None (not worth remembering)
+    """
+    failure = _network_failure(exc)
+    if failure == TIMEOUT and (adaptive or isinstance(exc, AdaptiveTimeout)):
+        return None # Only slower than its peers: it may well answer within our own timeout
+    return failure
+
+def _network_failure(exc):
+    if isinstance(exc, requests.Timeout):
+        return TIMEOUT
+
+    # requests wraps urllib3 errors which wrap the socket error: walk the chain
+    seen = set()
+    pending = [exc]
+    while pending:
+        err = pending.pop()
+        if err is None or id(err) in seen:
+            continue
+        seen.add(id(err))
+        if isinstance(err, socket.gaierror):
+            return NXDOMAIN if err.errno in _NXDOMAIN_ERRORS else None
+        if isinstance(err, ConnectionRefusedError):
+            return REFUSED
+        if isinstance(err, (socket.timeout, TimeoutError)):
+            return TIMEOUT
+        pending.extend([err.__cause__, err.__context__, getattr(err, 'reason', None)])
+        pending.extend(arg for arg in getattr(err, 'args', ()) if isinstance(arg, BaseException))
+    return None
+
+def _decoder(encoding):
+    """Incremental decoder of a streamed body, with the encoding decode_body would use from the headers (response.encoding)."""
+    try:
+        return codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
 
 class SiteChecker:
-    def __init__(self):
+    def __init__(self, parallel_guess=False, client=None, max_bytes=None, page_cache=None, negative_cache=None,
+                 progressive=False, head_bytes=None, tail_bytes=None, scheduler=None):
+        """
+        Args:
+            scheduler (FetchScheduler): every request to a website waits for its slot
+                (per-host and per-IP caps and spacing, global rate)
+            progressive (bool): check_progressive is used instead of check: pages are
+                analyzed while they download and the download stops once the verdict is settled
+            head_bytes (int): with progressive, bytes read before jumping to the end of a page
+                still ambiguous (if the server serves byte ranges)
+            tail_bytes (int): with progressive, bytes read from the end of such a page
+        """
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.parallel_guess = parallel_guess
+        self.client = client or get_client()
+        self.max_bytes = max_bytes or Config.MAX_PAGE_BYTES
+        self.page_cache = page_cache
+        self.negative_cache = negative_cache
+        self.progressive = progressive
+        self.scheduler = scheduler
+        self.head_bytes = head_bytes or Config.PROGRESSIVE_HEAD_BYTES
+        self.tail_bytes = tail_bytes or Config.PROGRESSIVE_TAIL_BYTES
+        self._stream = None
+        if progressive:
+            from .stream_analyzer import StreamingDesignAnalyzer
+            self._stream = StreamingDesignAnalyzer(early_exit=True)
+
+    def _slot(self, url, priority=0):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(url, priority)
+
+    def _normalize(self, url):
+        if not url.startswith(('http://', 'https://')):
+            url = 'http://' + url
+        return url
+
+    def _known_failure(self, url):
+        return self.negative_cache is not None and self.negative_cache.get(self._normalize(url)) is not None
+
+    def _record_failure(self, url, failure):
+        if self.negative_cache is not None and failure:
+            self.negative_cache.record(self._normalize(url), failure)
 
     def check(self, url):
         """
-        Check if a website is reachable.
+        Check if a website is reachable and download its page.
+        The body is streamed and cut at max_bytes. With a page cache, a fresh
+        copy is served without any request and a stale one is revalidated.
+        With a negative cache, a site that recently failed is not probed again.
         Returns: (is_reachable, final_url, html_content)
         """
         if not url:
             return False, None, None
 
-        if not url.startswith(('http://', 'https://')):
-            url = 'http://' + url
+        url = self._normalize(url)
 
+        cached, fresh, headers = self._cached(url)
+        if cached and fresh:
+            return True, cached['final_url'], cached['html']
+
+        if self._known_failure(url):
+            return False, None, None
+
+        adaptive = False
         try:
-            response = requests.get(url, headers=self.headers, timeout=10, allow_redirects=True)
-            if response.status_code == 200:
-                return True, response.url, response.text
+            target = cached['final_url'] if cached else url
+            with self._slot(target), registry.call('website') as call, \
+                    self.client.get(target, headers=headers, timeout=10, allow_redirects=True, stream=True, endpoint='website') as response:
+                call.status = response.status_code
+                adaptive = response.adaptive_timeout
+                if response.status_code == 304 and cached:
+                    self.page_cache.revalidated(cached)
+                    return True, cached['final_url'], cached['html']
+                if response.status_code != 200:
+                    self._record_failure(url, HTTP_ERROR)
+                    return False, None, None
+
+                body, _ = read_body(response, self.max_bytes)
+                registry.inc('website_bytes_total', len(body))
+                html = decode_body(response, body)
+                if self.page_cache:
+                    self.page_cache.save(
+                        url, response.url, html,
+                        etag=response.headers.get('ETag'),
+                        last_modified=response.headers.get('Last-Modified')
+                    )
+                return True, response.url, html
+        except requests.RequestException as e:
+            self._record_failure(url, failure_class(e, adaptive))
             return False, None, None
+
+    def check_progressive(self, url):
+        """
+        Download and analyze a page at once: chunks are fed to a StreamingAnalysis
+        as they arrive and the connection is closed as soon as the verdict is
+        settled. A page still ambiguous after head_bytes is finished with a ranged
+        read of its last tail_bytes when the server allows it (footer signals),
+        otherwise read on up to max_bytes. With a scheduler, the head and the tail
+        are two requests, each in its own slot.
+        A page from the page cache is returned whole, to be analyzed as usual.
+        Returns: (is_reachable, final_url, html_content, verdict), verdict being
+        (status, reasons) or None when html_content is returned
+        """
+        if not url:
+            return False, None, None, None
+
+        url = self._normalize(url)
+        cached, fresh, headers = self._cached(url)
+        if cached and fresh:
+            return True, cached['final_url'], cached['html'], None
+
+        if self._known_failure(url):
+            return False, None, None, None
+
+        adaptive = False
+        try:
+            target = cached['final_url'] if cached else url
+            with self._slot(target), registry.call('website') as call, \
+                    self.client.get(target, headers=headers, timeout=10, allow_redirects=True, stream=True, endpoint='website') as response:
+                call.status = response.status_code
+                adaptive = response.adaptive_timeout
+                if response.status_code == 304 and cached:
+                    self.page_cache.revalidated(cached)
+                    return True, cached['final_url'], cached['html'], None
+                if response.status_code != 200:
+                    self._record_failure(url, HTTP_ERROR)
+                    return False, None, None, None
+                final_url, encoding = response.url, response.encoding
+                # Leaving the block early closes the connection instead of reading the rest
+                verdict, analysis = self._read_progressive(response)
+            if verdict is None:
+                verdict = self._finish_from_tail(final_url, encoding, analysis)
+            return True, final_url, None, verdict
+        except requests.RequestException as e:
+            self._record_failure(url, failure_class(e, adaptive))
+            return False, None, None, None
+
+    def _read_progressive(self, response, jump=True):
+        """
+        Feed the body to a new analysis until the verdict is settled or the page ends.
+        Returns: (verdict, None), or (None, analysis) for a page still ambiguous after
+        head_bytes that can be finished from its tail
+        """
+        analysis = self._stream.start()
+        decoder = _decoder(response.encoding)
+        size = 0
+        jump = jump and self._can_jump(response)
+        for chunk in response.iter_content(chunk_size=16384):
+            size += len(chunk)
+            analysis.feed(decoder.decode(chunk))
+            if analysis.settled:
+                registry.inc('progressive_verdicts_total', read='head')
+                break
+            if jump and size >= self.head_bytes:
+                registry.inc('website_bytes_total', size)
+                return None, analysis
+            if size >= self.max_bytes:
+                break
+        else:
+            analysis.feed(decoder.decode(b'', final=True))
+            registry.inc('progressive_verdicts_total', read='full')
+        registry.inc('website_bytes_total', size)
+        return analysis.close(), None
+
+    def _finish_from_tail(self, url, encoding, analysis):
+        """
+        Complete the analysis of an ambiguous page with its last tail_bytes. The
+        connection that read the head is closed by now: the ranged request takes
+        a slot of its own, on the host that served the page (after redirects).
+        """
+        tail = self._read_tail(url)
+        if tail is not None:
+            registry.inc('website_bytes_total', len(tail))
+            registry.inc('progressive_verdicts_total', read='head_and_tail')
+            return analysis.close_with_tail(_decoder(encoding).decode(tail, final=True))
+
+        # Byte ranges announced but not served: read the page again, in full
+        try:
+            with self._slot(url), registry.call('website') as call, \
+                    self.client.get(url, headers=self.headers, timeout=10, allow_redirects=True, stream=True, endpoint='website') as response:
+                call.status = response.status_code
+                if response.status_code != 200:
+                    return analysis.result() # What the head already told
+                return self._read_progressive(response, jump=False)[0]
         except requests.RequestException:
-            return False, None, None
+            return analysis.result()
+
+    def _can_jump(self, response):
+        """Whether skipping to the tail saves anything: byte ranges served and a long enough body."""
+        try:
+            length = int(response.headers.get('Content-Length', ''))
+        except ValueError:
+            return False
+        # A compressed body cannot be entered in the middle
+        return (response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+                and response.headers.get('Content-Encoding', 'identity').lower() == 'identity'
+                and length > self.head_bytes + self.tail_bytes)
+
+    def _read_tail(self, url):
+        """Returns: the last tail_bytes of the page, or None if the server did not serve the range"""
+        headers = dict(self.headers, Range=f"bytes=-{self.tail_bytes}")
+        try:
+            with self._slot(url), registry.call('website_tail') as call, \
+                    self.client.get(url, headers=headers, timeout=10, allow_redirects=False, stream=True, endpoint='website') as response:
+                call.status = response.status_code
+                if response.status_code != 206:
+                    return None
+                body, _ = read_body(response, self.tail_bytes)
+                return body
+        except requests.RequestException:
+            return None
+
+    def _cached(self, url):
+        """
+        Look the page up in the page cache.
+        Returns: (cached page or None, is_fresh, request headers, with validators for a stale page)
+        """
+        if not self.page_cache:
+            return None, False, self.headers
+        cached, fresh = self.page_cache.lookup(url)
+        headers = self.headers
+        if cached and not fresh:
+            headers = dict(headers)
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        return cached, fresh, headers
+
+    def is_reachable(self, url):
+        """
+        Cheap check that a website is up, without downloading its page.
+        Sends a HEAD, then a one-byte ranged GET for servers that reject HEAD.
+        Returns: (is_reachable, final_url)
+        """
+        if not url:
+            return False, None
+
+        url = self._normalize(url)
+        if self._known_failure(url):
+            return False, None
 
-    def guess_domain(self, business_name):
+        try:
+            # Guessed domains yield to the sites we know exist
+            with self._slot(url, priority=1), registry.call('website_probe') as call:
+                response = self.client.head(url, headers=self.headers, timeout=10, allow_redirects=True, endpoint='website')
+                call.status = response.status_code
+                if response.status_code == 200:
+                    return True, response.url
+
+                headers = dict(self.headers, Range='bytes=0-0')
+                with self.client.get(url, headers=headers, timeout=10, allow_redirects=True, stream=True, endpoint='website') as response:
+                    call.status = response.status_code
+                    if response.status_code in (200, 206):
+                        return True, response.url
+            self._record_failure(url, HTTP_ERROR)
+            return False, None
+        except requests.RequestException as e:
+            self._record_failure(url, failure_class(e))
+            return False, None
+
+    def guess_domain(self, business_name, parallel=None):
         """
         Guess a domain from business name and check if it exists.
+        With parallel=True (default: the parallel_guess setting), candidates are
+        resolved and probed concurrently instead of one after another.
         Returns: valid_url or None
         """
         # Clean name: remove special chars, spaces to dashes
@@ -42,10 +337,54 @@ class SiteChecker:
             f"{slug}.fr",
             f"{slug}.com"
         ]
+        candidates = [domain for domain in candidates if not self._known_failure(domain)]
+        if not candidates:
+            return None
+
+        if parallel is None:
+            parallel = self.parallel_guess
+        if parallel:
+            return self._guess_parallel(candidates)
 
         for domain in candidates:
-            is_up, url, _ = self.check(domain)
+            is_up, url = self.is_reachable(domain)
             if is_up:
                 return url
         
         return None
+
+    def _guess_parallel(self, candidates):
+        """
+        Resolve all candidates at once, drop the ones that do not exist, then probe
+        the survivors concurrently. The first candidate (in preference order) that
+        answers wins; the remaining probes are abandoned.
+        """
+        executor = ThreadPoolExecutor(max_workers=len(candidates))
+        try:
+            resolved = list(executor.map(self._resolves, candidates))
+            alive = []
+            for domain, ok in zip(candidates, resolved):
+                if ok:
+                    alive.append(domain)
+                else:
+                    self._record_failure(domain, NXDOMAIN)
+
+            probes = [executor.submit(self.is_reachable, domain) for domain in alive]
+            for probe in probes:
+                # Waiting in order keeps the preference among candidates that succeed
+                is_up, url = probe.result()
+                if is_up:
+                    return url
+            return None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _resolves(self, host):
+        """Returns False only when DNS says the name does not exist."""
+        try:
+            socket.getaddrinfo(host, None)
+            return True
+        except socket.gaierror as e:
+            return e.errno not in _NXDOMAIN_ERRORS
+        except (UnicodeError, ValueError):
+            return False
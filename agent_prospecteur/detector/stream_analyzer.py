@@ -0,0 +1,319 @@
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+from .design_analyzer import classify, score_signals, FRAMEWORK_MARKERS
+
+# Tags that never hold content (closed as soon as they open)
+VOID_TAGS = {
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr',
+    'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid',
+    'param', 'source', 'spacer', 'track', 'wbr'
+}
+
+# Text inside these tags is not part of an element's visible text
+HIDDEN_TEXT_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+
+_MARKER_OVERLAP = max(len(m) for m in FRAMEWORK_MARKERS) - 1
+
+# Footer candidates, in the order DesignAnalyzer prefers them
+_FOOTER_TAG, _FOOTER_CLASS, _FOOTER_ID = range(3)
+
+
+class _Tokenizer(HTMLParser):
+    """Forwards html.parser events to a StreamingAnalysis, without building any tree."""
+    def __init__(self, analysis):
+        super().__init__(convert_charrefs=False)
+        self.analysis = analysis
+        self.closed_void_tags = []
+
+    def handle_starttag(self, tag, attrs):
+        self.analysis._start(tag, attrs)
+        if tag in VOID_TAGS:
+            self.analysis._pop(tag)
+            # A later </tag> for a void element is redundant, ignore it once
+            self.closed_void_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.analysis._start(tag, attrs)
+        self.analysis._pop(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_void_tags:
+            self.closed_void_tags.remove(tag)
+        else:
+            self.analysis._pop(tag)
+
+    def handle_data(self, data):
+        self.analysis._text(data)
+
+    def handle_charref(self, name):
+        base, digits = (16, name[1:]) if name[:1] in ('x', 'X') else (10, name)
+        match = re.match(r'[0-9a-fA-F]+' if base == 16 else r'[0-9]+', digits)
+        if not match:
+            self.analysis._text(digits)
+            return
+        try:
+            char = chr(int(match.group(), base))
+        except (ValueError, OverflowError):
+            char = '�'
+        self.analysis._text(char + digits[match.end():])
+
+    def handle_entityref(self, name):
+        self.analysis._text(html5.get(name + ';', '&' + name))
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self.analysis._text(data[len('CDATA['):], cdata=True)
+
+
+class StreamingAnalysis:
+    """
+    Incremental design analysis of one document.
+    Feed it chunks of HTML as they come, then call close() to get the verdict.
+    Every signal of DesignAnalyzer is tracked in a single tokenizer pass.
+    """
+    def __init__(self, early_exit=False):
+        self.early_exit = early_exit
+        self.settled = False
+        self._parser = _Tokenizer(self)
+
+        self._stack = []
+        self._open_counts = {}
+        self._hidden_depth = 0
+        self._marker_tail = ''
+        self._empty = True
+        self._finished = False
+
+        self.viewport = False
+        self.tables = 0
+        self.flash = False
+        self.frameset = False
+        self.framework = False
+        # Per footer candidate: [stack index while open (or None once closed), text chunks]
+        self._footers = [None, None, None]
+
+    def feed(self, chunk):
+        if self.settled or not chunk:
+            return
+        self._empty = False
+
+        if not self.framework:
+            window = (self._marker_tail + chunk).lower()
+            self.framework = any(marker in window for marker in FRAMEWORK_MARKERS)
+            self._marker_tail = window[-_MARKER_OVERLAP:]
+
+        self._parser.feed(chunk)
+        self._check_settled()
+
+    def close(self):
+        """
+        Finish the analysis.
+        Returns: (status, reasons) as DesignAnalyzer.analyze does
+        """
+        if self._empty:
+            return 'UNKNOWN', ["No content to analyze"]
+        if not self.settled:
+            self._parser.close()
+            self._finished = True
+        return self.result()
+
+    def close_with_tail(self, tail_html):
+        """
+        Finish an analysis whose middle part was skipped: the signals read so far
+        are completed with the ones of the end of the page (footer, last tables...).
+        A footer seen in the head still wins over one in the tail.
+        Returns: (status, reasons)
+        """
+        # Start the tail on a tag rather than in the middle of one
+        start = tail_html.find('<')
+        tail = StreamingAnalysis()
+        tail.feed(tail_html[start:] if start >= 0 else '')
+        tail._parser.close()
+        tail._finished = True
+
+        footer_in_head = any(footer is not None for footer in self._footers)
+        return score_signals({
+            'viewport': self.viewport or tail.viewport,
+            'copyright_year': self._copyright_year() if footer_in_head else tail._copyright_year(),
+            'tables': self.tables + tail.tables,
+            'flash': self.flash or tail.flash,
+            'frameset': self.frameset or tail.frameset,
+            'framework': self.framework or tail.framework,
+        })
+
+    def result(self):
+        """
+        Verdict from the signals known so far. Before the end of the page, an
+        absent signal (viewport, footer) is not counted since it may still show up.
+        """
+        score, reasons = self._score()
+        return classify(score), reasons
+
+    def signals(self):
+        """Returns: the signals of the page once read in full (see score_signals), else None"""
+        if not self._finished:
+            return None
+        return {
+            'viewport': self.viewport,
+            'copyright_year': self._copyright_year(),
+            'tables': self.tables,
+            'flash': self.flash,
+            'frameset': self.frameset,
+            'framework': self.framework,
+        }
+
+    def _score(self):
+        reasons = []
+        score = 0
+
+        if not self.viewport and self._finished:
+            score += 3
+            reasons.append("Missing viewport meta tag (not responsive)")
+
+        if self._copyright_known():
+            latest_year = self._copyright_year()
+            if latest_year is not None and latest_year < 2020:
+                score += 2
+                reasons.append(f"Copyright year is old: {latest_year}")
+
+        if self.tables > 5:
+            score += 1
+            reasons.append("Possible table-based layout detected")
+
+        if self.flash:
+            score += 5
+            reasons.append("Flash content detected")
+
+        if self.frameset:
+            score += 5
+            reasons.append("Frameset detected")
+
+        if self.framework:
+            score -= 5
+            reasons.append("Modern framework detected")
+
+        return score, reasons
+
+    # Tokenizer callbacks
+
+    def _start(self, tag, attrs):
+        if self.settled:
+            return
+        self._push(tag)
+
+        if tag == 'meta':
+            if dict(attrs).get('name') == 'viewport':
+                self.viewport = True
+        elif tag == 'table':
+            self.tables += 1
+        elif tag in ('object', 'embed'):
+            self.flash = True
+        elif tag in ('frameset', 'frame'):
+            self.frameset = True
+        elif tag == 'footer':
+            self._open_footer(_FOOTER_TAG)
+        elif tag == 'div':
+            attrs = dict(attrs)
+            classes = re.findall(r'\S+', attrs.get('class') or '')
+            if 'footer' in classes or ' '.join(classes) == 'footer':
+                self._open_footer(_FOOTER_CLASS)
+            if attrs.get('id') == 'footer':
+                self._open_footer(_FOOTER_ID)
+
+    def _open_footer(self, kind):
+        # Only the first element of each kind counts; it sits on top of the stack
+        if self._footers[kind] is None:
+            self._footers[kind] = [len(self._stack) - 1, []]
+
+    def _push(self, tag):
+        self._stack.append(tag)
+        self._open_counts[tag] = self._open_counts.get(tag, 0) + 1
+        if tag in HIDDEN_TEXT_TAGS:
+            self._hidden_depth += 1
+
+    def _pop(self, tag):
+        if self.settled:
+            return
+        # Like the tree builder: close the most recent open tag of that name,
+        # and everything opened after it. Unmatched end tags are ignored.
+        if not self._open_counts.get(tag):
+            return
+        while self._stack:
+            popped = self._stack.pop()
+            self._open_counts[popped] -= 1
+            if popped in HIDDEN_TEXT_TAGS:
+                self._hidden_depth -= 1
+            for footer in self._footers:
+                if footer is not None and footer[0] is not None and footer[0] >= len(self._stack):
+                    footer[0] = None
+            if popped == tag:
+                break
+
+    def _text(self, data, cdata=False):
+        if self.settled or (self._hidden_depth and not cdata):
+            return
+        for footer in self._footers:
+            if footer is not None and footer[0] is not None:
+                footer[1].append(data)
+
+    # Verdict helpers
+
+    def _copyright_known(self):
+        # A <footer> wins over div footers, so the year is final once the first one closed
+        footer = self._footers[_FOOTER_TAG]
+        return self._finished or (footer is not None and footer[0] is None)
+
+    def _copyright_year(self):
+        footer = next((f for f in self._footers if f is not None), None)
+        if footer is None:
+            return None
+        years = re.findall(r'20\d{2}', ''.join(footer[1]))
+        if not years:
+            return None
+        return max(int(y) for y in years)
+
+    def _check_settled(self):
+        """Stop once no signal still to come can change the classification."""
+        if not self.early_exit:
+            return
+
+        score, _ = self._score()
+        low = score - (0 if self.framework else 5)
+        high = score
+        high += 0 if self.viewport else 3
+        high += 0 if self._copyright_known() else 2
+        high += 0 if self.tables > 5 else 1
+        high += 0 if self.flash else 5
+        high += 0 if self.frameset else 5
+
+        if classify(low) == classify(high):
+            self.settled = True
+
+
+class StreamingDesignAnalyzer:
+    """
+    DesignAnalyzer engine that scores a page in one incremental tokenizer pass,
+    with no DOM. With early_exit=True it stops reading as soon as the verdict
+    is settled; the status is unchanged but reasons only list what was seen.
+    """
+    def __init__(self, early_exit=False, chunk_size=16384):
+        self.early_exit = early_exit
+        self.chunk_size = chunk_size
+
+    def start(self):
+        """Begin an incremental analysis to feed chunk by chunk."""
+        return StreamingAnalysis(early_exit=self.early_exit)
+
+    def analyze(self, html_content):
+        if not html_content:
+            return 'UNKNOWN', ["No content to analyze"]
+        return self.run(html_content).close()
+
+    def run(self, html_content):
+        """Feed a whole page. Returns: the StreamingAnalysis, to close()"""
+        analysis = self.start()
+        for i in range(0, len(html_content), self.chunk_size):
+            analysis.feed(html_content[i:i + self.chunk_size])
+            if analysis.settled:
+                break
+        return analysis
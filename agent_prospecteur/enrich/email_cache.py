@@ -0,0 +1,27 @@
+from ..config import Config
+from ..db.cache import SqliteCache
+from ..metrics import registry
+
+
+class EmailCache:
+    """
+    Hunter answers per domain, stored in the prospects DB.
+    A domain without any email is cached for less time than one with an
+    email: its site may publish an address later.
+    """
+    def __init__(self, db_path=None, ttl_found=None, ttl_empty=None):
+        self.ttl_found = Config.EMAIL_CACHE_TTL_FOUND if ttl_found is None else ttl_found
+        self.ttl_empty = Config.EMAIL_CACHE_TTL_EMPTY if ttl_empty is None else ttl_empty
+        self.store = SqliteCache(db_path or Config.DB_PATH, 'email_cache')
+
+    def get(self, domain):
+        """Returns: {'email': str or None} if the domain is known, else None"""
+        cached = self.store.get(f"domain:{domain}")
+        registry.cache('emails', 'miss' if cached is None else 'hit')
+        return cached
+
+    def set(self, domain, email):
+        self.store.set(f"domain:{domain}", {'email': email}, ttl=self.ttl_found if email else self.ttl_empty)
+
+    def close(self):
+        self.store.close()
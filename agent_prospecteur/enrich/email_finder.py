@@ -1,10 +1,27 @@
-import requests
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from ..config import Config
+from ..metrics import registry
+from ..net.http_client import get_client
+from ..net.rate_limit import RateLimiter, retry_after
+
+# Answers worth retrying: rate limited or temporary server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 class EmailFinder:
-    def __init__(self):
-        self.api_key = Config.HUNTER_API_KEY
+    def __init__(self, api_key=None, cache=None, client=None, rate_limit=None, max_retries=None):
+        """
+        Args:
+            cache (EmailCache): reuse earlier Hunter answers instead of spending credits
+        """
+        self.api_key = api_key or Config.HUNTER_API_KEY
         self.base_url = "https://api.hunter.io/v2/domain-search"
+        self.cache = cache
+        self.client = client or get_client()
+        self.rate_limiter = RateLimiter(rate_limit or Config.HUNTER_RATE_LIMIT, Config.HUNTER_BURST)
+        self.max_retries = Config.HUNTER_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = 1 # Seconds before the first retry, doubled on each attempt
 
     def find(self, domain, company_name=None):
         """
@@ -24,25 +41,68 @@ class EmailFinder:
         # Fallback to common patterns if Hunter fails or no key
         return None # Return None to indicate failure to find *verified* email
 
+    def find_many(self, domains, workers=8):
+        """
+        Find emails for many domains concurrently, each domain being looked up once.
+        Requests still go through the shared rate limiter.
+        Returns: dict {domain: email or None}
+        """
+        unique = list(dict.fromkeys(domains))
+        if not unique:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(workers, len(unique))) as pool:
+            return dict(zip(unique, pool.map(self.find, unique)))
+
     def _find_with_hunter(self, domain):
         if not self.api_key:
             return None
-            
+
+        domain = self._normalize(domain)
+        if self.cache:
+            cached = self.cache.get(domain)
+            if cached is not None:
+                return cached['email']
+        
+        try:
+            data = self._request(domain)
+        except Exception as e:
+            print(f"Error calling Hunter API: {e}")
+            return None # Not cached: the domain is asked again next time
+
+        emails = data.get('data', {}).get('emails', [])
+        email = emails[0].get('value') if emails else None
+        if self.cache:
+            self.cache.set(domain, email)
+        return email
+
+    def _request(self, domain):
         params = {
             'domain': domain,
             'api_key': self.api_key,
             'limit': 1
         }
-        
-        try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            emails = data.get('data', {}).get('emails', [])
-            if emails:
-                return emails[0].get('value')
-        except Exception as e:
-            print(f"Error calling Hunter API: {e}")
-            
-        return None
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            with registry.call('hunter') as call:
+                response = self.client.get(self.base_url, params=params, timeout=30, endpoint='hunter')
+                call.status = response.status_code
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+
+            delay = retry_after(response.headers)
+            if delay is None:
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            if response.status_code == 429:
+                # Over quota: hold every lookup, not only this one
+                self.rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _normalize(domain):
+        domain = domain.strip().lower().split(':')[0]
+        return domain[4:] if domain.startswith('www.') else domain
@@ -1,170 +1,237 @@
 import argparse
+import contextlib
 import logging
+import os
 import sys
-import webbrowser
-import time
-
-# Easter Egg: Import Antigravity at start
-try:
-    import antigravity
-    print("🚀 Décollage immédiat !")
-except ImportError:
-    pass
-
-from config import Config
-from db.database import Database
-from search.google_places import GooglePlacesSearch
-from detector.site_checker import SiteChecker
-from detector.design_analyzer import DesignAnalyzer
-from enrich.email_finder import EmailFinder
-from message.generator import MessageGenerator
-from sender.email_sender import EmailSender
-
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, Config.LOG_LEVEL.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("prospector.log"),
-        logging.StreamHandler()
-    ]
-)
+
+# Run as a script: make the package importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Only light modules at startup: the others are imported once the arguments
+# are parsed, and only if this run uses them
+from agent_prospecteur.config import Config, DEFAULT_WORKERS
+
 logger = logging.getLogger(__name__)
 
+
 def main():
     parser = argparse.ArgumentParser(description="Agent Prospecteur IA")
     parser.add_argument("--search", type=str, default="bakery", help="Keyword to search for (e.g. bakery)")
     parser.add_argument("--location", type=str, default="48.8566,2.3522", help="Lat,Long coordinates")
     parser.add_argument("--radius", type=int, default=5000, help="Search radius in meters")
     parser.add_argument("--domain", type=str, help="Specific business domain/type (e.g. restaurant, plumber)")
+    parser.add_argument("--full-coverage", action="store_true", help="Cover the whole area with tiled, paginated searches")
+    parser.add_argument("--bounds", type=str, help="With --full-coverage, box to cover instead of the radius: south,west,north,east")
+    parser.add_argument("--tile-radius", type=int, default=1000, help="With --full-coverage, radius of each tile search in meters")
+    parser.add_argument("--tile-workers", type=int, default=8, help="With --full-coverage, tiles searched concurrently")
+    parser.add_argument("--search-cache", action="store_true", help="Replay identical Places searches from a local cache")
+    parser.add_argument("--refresh-search", action="store_true", help="With --search-cache, call the API anyway and refresh the cache")
     parser.add_argument("--dry-run", action="store_true", help="Run without sending emails")
+    parser.add_argument("--send-pending", action="store_true", help="Only send the prospects saved but not contacted yet (e.g. by a --dry-run run)")
+    for stage, default in DEFAULT_WORKERS.items():
+        parser.add_argument(f"--{stage}-workers", type=int, default=default, help=f"Concurrent workers for the {stage} stage (default {default})")
+    parser.add_argument("--parallel-guess", action="store_true", help="Resolve and probe guessed domains concurrently")
+    parser.add_argument("--page-cache", action="store_true", help="Keep downloaded pages and their verdicts on disk, revalidated on later runs")
+    parser.add_argument("--negative-cache", action="store_true", help="Remember failed websites in the DB and skip them until the failure expires")
+    parser.add_argument("--analyzer", choices=["soup", "stream"], default="soup", help="Design analysis engine (stream: single pass, no DOM)")
+    parser.add_argument("--early-exit", action="store_true", help="With --analyzer stream, stop reading a page once its verdict is settled")
+    parser.add_argument("--polite", action="store_true", help="Schedule website requests with per-host/per-IP caps and spacing and a global rate (FETCH_*)")
+    parser.add_argument("--progressive", action="store_true", help="Analyze pages while they download and stop reading once the verdict is settled")
+    parser.add_argument("--fingerprints", action="store_true", help="Reuse the analysis of pages built from the same template (index in the DB)")
+    parser.add_argument("--analyze-processes", type=int, default=0, help="Analyze pages in a pool of N processes (0: in the pipeline threads)")
+    parser.add_argument("--analyze-batch", type=int, default=8, help="Pages handed to the analysis process pool at once")
+    parser.add_argument("--enrich-batch", type=int, default=16, help="Max prospects whose emails are looked up together")
+    parser.add_argument("--email-cache", action="store_true", help="Remember Hunter answers per domain in the DB instead of asking again")
+    parser.add_argument("--generate-batch", type=int, default=16, help="Max prospects whose emails are generated together")
+    parser.add_argument("--generate-in-flight", type=int, default=None, help="Max concurrent OpenAI calls (default: OPENAI_MAX_IN_FLIGHT)")
+    parser.add_argument("--send-batch", type=int, default=50, help="Max emails handed to SendGrid together")
+    parser.add_argument("--send-concurrency", type=int, default=None, help="Max SendGrid requests in flight (default: SENDGRID_MAX_CONCURRENCY)")
+    parser.add_argument("--template-cache", action="store_true", help="Reuse generated emails as templates for prospects of the same kind")
+    parser.add_argument("--persist-batch", type=int, default=50, help="Max prospects saved to the database in one transaction")
+    parser.add_argument("--include-known", action="store_true", help="Process prospects already in the database again")
+    parser.add_argument("--resume", action="store_true", help="Continue the last campaign where it stopped instead of starting over")
+    parser.add_argument("--metrics-out", type=str, help="Write run metrics to this file during and after the run (.prom/.txt: Prometheus text, else JSON)")
+    parser.add_argument("--metrics-interval", type=float, default=10, help="Seconds between two metrics writes during the run")
+    parser.add_argument("--profile", type=str, nargs="?", const="prospector.prof", help="Profile the run (all threads, by sampling) and save the pstats stats to this file")
+    parser.add_argument("--queue-size", type=int, default=100, help="Max items buffered between two stages")
+    parser.add_argument("--campaign", type=str, help="Run the campaign described in this JSON file (keywords x locations) over several processes")
+    parser.add_argument("--processes", type=int, default=None, help="With --campaign, worker processes (default: one per CPU)")
+    parser.add_argument("--easter-eggs", action="store_true", help="import antigravity at takeoff and after 50 emails sent (opens a web browser)")
     
     args = parser.parse_args()
+    if args.campaign and args.profile:
+        parser.error("--profile profiles one process: it cannot be used with --campaign")
+    if args.campaign and args.send_pending:
+        parser.error("--send-pending sends from the database: it cannot be used with --campaign")
+    Config.load()
+
+    # Configure logging
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL.upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("prospector.log"),
+            logging.StreamHandler()
+        ]
+    )
+
+    easter_eggs = args.easter_eggs or Config.EASTER_EGGS
+    if easter_eggs:
+        # Easter Egg: Import Antigravity at start
+        try:
+            import antigravity
+            print("🚀 Décollage immédiat !")
+        except ImportError:
+            pass
 
     # Flight Mode Check
     if Config.ANTIGRAVITY_FLIGHT:
         logger.info("✈️  MODE FLIGHT ACTIVE: Using mock data, no real API calls.")
 
-    # Initialize Modules
-    db = Database(Config.DB_PATH)
-    db.connect()
-    
-    searcher = GooglePlacesSearch()
-    site_checker = SiteChecker()
-    analyzer = DesignAnalyzer()
-    enricher = EmailFinder()
-    generator = MessageGenerator()
-    sender = EmailSender()
-
-    # 1. Search Prospects
-    logger.info(f"🔎 Searching for '{args.search}' in radius {args.radius}m...")
-    prospects = searcher.search(
-        location=args.location, 
-        radius=args.radius, 
-        keyword=args.search,
-        type=args.domain
-    )
-    
-    logger.info(f"Found {len(prospects)} potential prospects.")
-    
-    processed_count = 0
-    sent_count = 0
-
-    for p in prospects:
-        logger.info(f"\nAnalyzing prospect: {p['name']}")
-        
-        # 2. Check Website
-        website_status = "UNKNOWN"
-        url = p.get('website')
-        
-        if not url:
-            # Try to guess
-            guessed_url = site_checker.guess_domain(p['name'])
-            if guessed_url:
-                logger.info(f"  Url guessed: {guessed_url}")
-                url = guessed_url
-            else:
-                logger.info("  No website found.")
-                website_status = "NO_SITE"
-        
-        reasons = []
-        if url:
-            is_up, final_url, html = site_checker.check(url)
-            if is_up:
-                # 3. Analyze Design
-                website_status, reasons = analyzer.analyze(html)
-                logger.info(f"  Website status: {website_status} ({reasons})")
-            else:
-                logger.info("  Website check failed (down or timeout).")
-                website_status = "NO_SITE" # Treat as no site if down? Or separate status? Let's say NO_SITE for now.
-
-        # Filter: Keep only ARCHAIC or NO_SITE
-        if website_status not in ['ARCHAIC', 'NO_SITE']:
-            logger.info("  Skipping: Website is MODERN or UNKNOWN.")
-            continue
-
-        # 4. Enrich Email
-        logger.info("  Enriching contact info...")
-        email = enricher.find(url.split('//')[-1].split('/')[0] if url else None, p['name'])
-        
-        if not email:
-            logger.warning("  No email found. Skipping auto-send.")
-            # Save to DB for manual review?
-             # For this task, we skip if no email, but we could save it.
-        else:
-            logger.info(f"  Email found: {email}")
-
-        # 5. Generate & Send Message
-        if email:
-            prospect_data = {
-                'name': p['name'],
-                'city': p.get('address', '').split(',')[-1].strip(), # Crude city extraction
-                'sector': args.domain or args.search,
-                'website_status': website_status,
-                'valid_reasons': reasons
-            }
-            
-            message_body = generator.generate(prospect_data)
-            subject = f"Optimisation de votre présence web - {p['name']}"
-            
-            if args.dry_run:
-                logger.info("  [DRY RUN] Would send email:")
-                logger.info(f"  To: {email}")
-                logger.info(f"  Subject: {subject}")
-                # logger.info(f"  Body: {message_body}") # Verbose
-                sent = False # Didn't actually send
+    from agent_prospecteur.metrics import registry
+
+    writer = profiler = None
+    if args.metrics_out:
+        from agent_prospecteur.metrics import MetricsWriter
+        writer = MetricsWriter(registry, args.metrics_out, args.metrics_interval).start()
+
+    if args.campaign:
+        # Shards of the campaign run in worker processes, each with its own pipeline
+        from agent_prospecteur.campaign import run_campaign
+        processed_count, sent_count = run_campaign(args)
+    else:
+        from agent_prospecteur.db.database import Database
+        from agent_prospecteur.db.checkpoints import CheckpointStore
+        db = Database(Config.DB_PATH)
+        db.connect()
+        checkpoints = CheckpointStore(Config.DB_PATH)
+        pipeline, resources = build_pipeline(args, db, checkpoints=checkpoints, resume=args.resume, easter_eggs=easter_eggs)
+
+        if args.profile:
+            from agent_prospecteur.metrics import ThreadProfiler
+            profiler = ThreadProfiler(args.profile)
+        with profiler or contextlib.nullcontext():
+            if args.send_pending:
+                processed_count, sent_count = pipeline.send_pending()
             else:
-                sent = sender.send(email, subject, message_body)
-                if sent:
-                    logger.info("  ✅ Email sent successfully.")
-                    sent_count += 1
-                else:
-                    logger.error("  ❌ Failed to send email.")
-
-        # 6. Persist
-        db.add_prospect({
-            'name': p['name'],
-            'address': p['address'],
-            'city': p.get('address', '').split(',')[-1].strip(),
-            'sector': args.domain or args.search,
-            'website_url': url,
-            'website_status': website_status,
-            'email': email,
-        })
-        
-        processed_count += 1
-        
-        # Easter Egg threshold
-        if sent_count == 50:
-             logger.info("🎉 50 Emails Sent! Triggering celebration...")
-             try:
-                 antigravity.geohash(37.421542, -122.085589, b'dow jones industrial average') # Just calling something from it
-                 webbrowser.open("https://xkcd.com/353/")
-             except:
-                 pass
+                processed_count, sent_count = pipeline.run([query_from_args(args)])
+
+        for resource in resources:
+            resource.close()
+        checkpoints.close()
+        db.close()
+        log_outbound_health()
+
+    if profiler:
+        logger.info(f"Profile saved to {args.profile}\n{profiler.summary()}")
+    if writer:
+        writer.stop()
+        logger.info(f"Metrics written to {args.metrics_out}")
 
     logger.info(f"\nDone. Processed {processed_count} prospects. Sent {sent_count} emails.")
-    db.close()
+
+
+def log_outbound_health():
+    """Log the adaptive timeouts reached and the hosts whose circuit is still open."""
+    from agent_prospecteur.net.http_client import get_client
+    health = get_client().snapshot()
+    for name, endpoint in health['endpoints'].items():
+        timeout = f"{endpoint['timeout']:.1f}s" if endpoint['timeout'] is not None else "default"
+        logger.info(f"HTTP {name}: {endpoint['samples']} recent calls, p50 {endpoint['p50']:.2f}s, p99 {endpoint['p99']:.2f}s, timeout {timeout}")
+    circuits = [host for host, circuit in health['circuits'].items() if circuit['state'] != 'closed']
+    if circuits:
+        logger.info(f"HTTP circuits still open: {', '.join(sorted(circuits))}")
+
+
+def query_from_args(args):
+    """The search query given on the command line."""
+    return {
+        'location': args.location,
+        'radius': args.radius,
+        'keyword': args.search,
+        'type': args.domain,
+        'sector': args.domain or args.search,
+        'full_coverage': args.full_coverage,
+        'bounds': tuple(float(v) for v in args.bounds.split(',')) if args.bounds else None,
+        'tile_radius': args.tile_radius,
+        'tile_workers': args.tile_workers,
+    }
+
+
+def build_pipeline(args, db, checkpoints=None, resume=False, claims=None, easter_eggs=False):
+    """
+    Build the components chosen on the command line and the pipeline joining them.
+    Modules are imported here, and only the ones this run uses.
+    Returns: (pipeline, components to close once it has run)
+    """
+    from agent_prospecteur.search.google_places import GooglePlacesSearch
+    from agent_prospecteur.detector.site_checker import SiteChecker
+    from agent_prospecteur.detector.design_analyzer import DesignAnalyzer
+    from agent_prospecteur.enrich.email_finder import EmailFinder
+    from agent_prospecteur.message.generator import MessageGenerator
+    from agent_prospecteur.sender.email_sender import EmailSender
+    from agent_prospecteur.pipeline import ProspectPipeline
+
+    known = None
+    if not args.include_known:
+        from agent_prospecteur.db.known_index import KnownProspectIndex
+        known = KnownProspectIndex(db)
+
+    places_cache = page_cache = negative_cache = fingerprints = email_cache = template_cache = None
+    if args.search_cache:
+        from agent_prospecteur.search.places_cache import PlacesCache
+        places_cache = PlacesCache()
+    if args.page_cache:
+        from agent_prospecteur.detector.page_cache import PageCache
+        page_cache = PageCache()
+    if args.negative_cache:
+        from agent_prospecteur.detector.negative_cache import NegativeCache
+        negative_cache = NegativeCache(Config.DB_PATH)
+    if args.fingerprints:
+        from agent_prospecteur.detector.fingerprint import FingerprintIndex
+        fingerprints = FingerprintIndex(Config.DB_PATH)
+    if args.email_cache:
+        from agent_prospecteur.enrich.email_cache import EmailCache
+        email_cache = EmailCache(Config.DB_PATH)
+    if args.template_cache:
+        from agent_prospecteur.message.template_cache import TemplateCache
+        template_cache = TemplateCache(Config.DB_PATH)
+
+    scheduler = None
+    if args.polite:
+        from agent_prospecteur.net.scheduler import FetchScheduler
+        scheduler = FetchScheduler()
+
+    # Building the components is cheap: bs4 and openai are only loaded
+    # when a page is analyzed or an email generated
+    searcher = GooglePlacesSearch(cache=places_cache, refresh=args.refresh_search)
+    site_checker = SiteChecker(parallel_guess=args.parallel_guess, page_cache=page_cache, negative_cache=negative_cache,
+                               progressive=args.progressive, scheduler=scheduler)
+    analyzer = DesignAnalyzer(engine=args.analyzer, early_exit=args.early_exit, processes=args.analyze_processes,
+                              fingerprints=fingerprints)
+    enricher = EmailFinder(cache=email_cache)
+    generator = MessageGenerator(cache=template_cache, max_in_flight=args.generate_in_flight)
+    sender = EmailSender(max_concurrency=args.send_concurrency)
+
+    pipeline = ProspectPipeline(
+        db, searcher, site_checker, analyzer, enricher, generator, sender,
+        dry_run=args.dry_run,
+        workers={stage: getattr(args, f"{stage}_workers") for stage in DEFAULT_WORKERS},
+        queue_size=args.queue_size,
+        analyze_batch=args.analyze_batch,
+        enrich_batch=args.enrich_batch,
+        generate_batch=args.generate_batch,
+        send_batch=args.send_batch,
+        persist_batch=args.persist_batch,
+        checkpoints=checkpoints,
+        resume=resume,
+        known=known,
+        claims=claims,
+        easter_eggs=easter_eggs
+    )
+    resources = [analyzer] + [c for c in (places_cache, page_cache, negative_cache, fingerprints, email_cache, template_cache) if c]
+    return pipeline, resources
+
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,41 @@
-import openai
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ..config import Config
+from ..metrics import registry
+from ..net.rate_limit import AdaptiveLimit, RateLimiter, retry_after
+
+logger = logging.getLogger(__name__)
+
+MAX_TOKENS = 300
+# Errors worth another attempt (in openai.error): rate limits and transient server/network failures
+RETRY_ERRORS = ('RateLimitError', 'APIError', 'Timeout', 'TryAgain', 'APIConnectionError', 'ServiceUnavailableError')
+
+# Placeholders of a cached template, filled in for each prospect
+PLACEHOLDERS = ('{{name}}', '{{city}}', '{{year}}')
+_YEAR = re.compile(r'\b\d{4}\b')
 
 class MessageGenerator:
-    def __init__(self):
+    def __init__(self, cache=None, max_in_flight=None, tokens_per_minute=None, max_retries=None):
+        """
+        Args:
+            cache (TemplateCache): reuse a generated email for similar prospects
+            max_in_flight (int): concurrent API calls, lowered while the API answers 429
+            tokens_per_minute (int): token budget of the account
+        """
         self.api_key = Config.OPENAI_API_KEY
-        if self.api_key:
-            openai.api_key = self.api_key
+        self.cache = cache
+        self.in_flight = AdaptiveLimit(max_in_flight or Config.OPENAI_MAX_IN_FLIGHT)
+        tokens_per_minute = tokens_per_minute or Config.OPENAI_TOKENS_PER_MINUTE
+        self.token_limiter = RateLimiter(tokens_per_minute / 60, burst=tokens_per_minute)
+        self.max_retries = Config.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        self.request_timeout = Config.OPENAI_REQUEST_TIMEOUT
+        self.backoff = 1 # Seconds before the first retry, doubled on each attempt
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
 
     def generate(self, prospect):
         """
@@ -13,13 +43,70 @@ class MessageGenerator:
         Args:
             prospect (dict): Contains name, city, sector, valid_reasons (list), website_status
         Returns:
-            str: Generated email content
+            str: Generated email content, or None if it could not be generated
         """
         if Config.ANTIGRAVITY_FLIGHT:
             return f"Subject: Proposal for {prospect['name']}\n\n[MOCK EMAIL CONTENT]\nWe noticed your site is archaic..."
 
         if not self.api_key:
-            return "Error: OpenAI API Key missing."
+            logger.error("OpenAI API Key missing.")
+            return None
+
+        if self.cache is None:
+            try:
+                return self._complete(prospect)
+            except Exception as e:
+                logger.error(f"Error generating message for {prospect['name']}: {e}")
+                return None
+
+        reasons = prospect.get('valid_reasons', [])
+        key = self.cache.key(prospect['sector'], prospect['website_status'], reasons)
+        # Prospects of the same kind wait for one generation instead of each calling the API
+        with self._key_lock(key):
+            template = self.cache.take(key)
+            if template is None:
+                try:
+                    template = self._complete({
+                        'name': '{{name}}',
+                        'city': '{{city}}',
+                        'sector': prospect['sector'],
+                        'website_status': prospect['website_status'],
+                        'valid_reasons': [_YEAR.sub('{{year}}', r) for r in reasons],
+                    }, template=True)
+                except Exception as e:
+                    logger.error(f"Error generating message for {prospect['name']}: {e}")
+                    return None
+                if '{{name}}' in template:
+                    self.cache.add(key, template) # Otherwise the placeholders were not kept
+
+        year = next((m.group() for m in map(_YEAR.search, reasons) if m), '')
+        for placeholder, value in zip(PLACEHOLDERS, (prospect['name'], prospect['city'], year)):
+            template = template.replace(placeholder, value)
+        return template
+
+    def generate_many(self, prospects, workers=None):
+        """
+        Generate emails for many prospects concurrently.
+        Calls in flight are capped by `max_in_flight` (adapted on 429 answers)
+        and by the tokens-per-minute budget, whatever the number of workers.
+        Yields: (index, message) as each one finishes, message being None on failure
+        """
+        if not prospects:
+            return
+        with ThreadPoolExecutor(max_workers=min(workers or self.in_flight.maximum, len(prospects))) as pool:
+            futures = {pool.submit(self.generate, p): i for i, p in enumerate(prospects)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def _key_lock(self, key):
+        with self._key_locks_lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _complete(self, prospect, template=False):
+        # Imported on the first generation: the openai package takes ~0.3 s to load
+        import openai
+        openai.api_key = self.api_key
+        retry_errors = tuple(getattr(openai.error, name) for name in RETRY_ERRORS)
 
         system_prompt = """
         You are an expert sales representative for a modern web agency. 
@@ -28,6 +115,11 @@ class MessageGenerator:
         Avoid marketing jargon, be direct and helpful.
         End with a clear call to action (e.g., a free audit or a call).
         """
+        if template:
+            system_prompt += """
+        Values written like {{name}}, {{city}} or {{year}} are placeholders filled in later:
+        copy them exactly as written, braces included.
+        """
         
         user_prompt = f"""
         Prospect Name: {prospect['name']}
@@ -43,16 +135,45 @@ class MessageGenerator:
         Write the email content (Subject + Body).
         """
 
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=300,
-                temperature=0.7
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"Error generating message: {str(e)}"
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        # Rough count (~4 characters per token) of what the call may use, answer included
+        tokens = (len(system_prompt) + len(user_prompt)) // 4 + MAX_TOKENS
+
+        for attempt in range(self.max_retries + 1):
+            self.token_limiter.acquire(tokens)
+            self.in_flight.acquire()
+            error = None
+            try:
+                with registry.call('openai') as call:
+                    try:
+                        response = openai.ChatCompletion.create(
+                            model="gpt-3.5-turbo",
+                            messages=messages,
+                            max_tokens=MAX_TOKENS,
+                            temperature=0.7,
+                            request_timeout=self.request_timeout # The library default is 600 s
+                        )
+                    except openai.error.OpenAIError as e:
+                        call.status = e.http_status or 'error'
+                        raise
+            except retry_errors as e:
+                error = e
+            finally:
+                self.in_flight.release(throttled=isinstance(error, openai.error.RateLimitError))
+
+            if error is None:
+                return response.choices[0].message.content.strip()
+            if attempt == self.max_retries:
+                raise error
+
+            delay = retry_after(error.headers)
+            if delay is None:
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            if isinstance(error, openai.error.RateLimitError):
+                # Requests or tokens per minute exhausted: every call waits
+                self.token_limiter.pause(delay)
+            else:
+                time.sleep(delay)
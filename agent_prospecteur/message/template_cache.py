@@ -0,0 +1,57 @@
+import json
+import re
+import threading
+from ..config import Config
+from ..db.cache import SqliteCache
+from ..metrics import registry
+
+# Numbers in the reasons (e.g. an old copyright year) do not change the template
+_NUMBER = re.compile(r'\d+')
+
+
+class TemplateCache:
+    """
+    Generated emails stored as templates with placeholders, in the prospects DB.
+    Templates are keyed on the non-personal part of the prompt (sector, website
+    status, reasons) and retired after `max_uses` emails, so that prospects of
+    the same kind do not all receive the very same text.
+    """
+    def __init__(self, db_path=None, max_entries=None, max_uses=None):
+        self.max_uses = Config.TEMPLATE_MAX_USES if max_uses is None else max_uses
+        self.store = SqliteCache(
+            db_path or Config.DB_PATH, 'message_templates',
+            max_entries=max_entries or Config.TEMPLATE_CACHE_MAX_ENTRIES
+        )
+        self._lock = threading.Lock()
+
+    def key(self, sector, website_status, reasons):
+        return json.dumps({
+            "sector": " ".join(str(sector or "").lower().split()),
+            "website_status": website_status,
+            "reasons": sorted(_NUMBER.sub('#', r) for r in reasons),
+        }, sort_keys=True)
+
+    def take(self, key):
+        """
+        Use a template once.
+        Returns: the template, or None if there is none left for this key
+        """
+        with self._lock:
+            entry = self.store.get(key)
+            registry.cache('templates', 'miss' if entry is None else 'hit')
+            if entry is None:
+                return None
+            entry['uses'] += 1
+            if entry['uses'] >= self.max_uses:
+                self.store.delete(key)
+            else:
+                self.store.replace(key, entry)
+            return entry['template']
+
+    def add(self, key, template):
+        """Store a template that was just used once."""
+        if self.max_uses > 1:
+            self.store.set(key, {'template': template, 'uses': 1})
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,308 @@
+import bisect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PREFIX = "prospecteur_"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1) # Last bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None if empty)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and latency histograms shared by the whole run, each
+    identified by a name and labels (e.g. stage="check", api="hunter").
+    Thread-safe; exported as JSON or Prometheus text.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge_add(self, name, delta, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the block in histogram `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def call(self, api):
+        """
+        Count and time one call to an external service (api_requests_total, api_seconds).
+        The block may set `.status` on the yielded object (HTTP status or outcome);
+        an exception counts as status "error".
+        """
+        call = SimpleNamespace(status='ok')
+        start = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            if call.status == 'ok':
+                call.status = 'error'
+            raise
+        finally:
+            self.inc('api_requests_total', api=api, status=str(call.status))
+            self.observe('api_seconds', time.perf_counter() - start, api=api)
+
+    def cache(self, name, result):
+        """Count a cache lookup: result is 'hit', 'stale' or 'miss'."""
+        self.inc('cache_requests_total', cache=name, result=result)
+
+    def get(self, name, **labels):
+        """Current value of a counter or gauge (0 if never set)."""
+        key = self._key(name, labels)
+        with self._lock:
+            return self.counters.get(key, self.gauges.get(key, 0))
+
+    def dump(self):
+        """Raw counters and histograms, for merge() into the registry of another process."""
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {k: (list(h.counts), h.count, h.sum) for k, h in self.histograms.items()},
+            }
+
+    def merge(self, state):
+        """Add the counters and histograms of a dump() (e.g. from a campaign worker)."""
+        with self._lock:
+            for key, value in state['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (counts, count, total) in state['histograms'].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.count += count
+                histogram.sum += total
+
+    def snapshot(self):
+        """
+        Returns: dict with counters, gauges and histograms (count, sum, p50, p99),
+        plus the uptime and the per-stage throughput (items per second).
+        """
+        def label(key):
+            name, labels = key
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+        with self._lock:
+            uptime = time.time() - self.started
+            return {
+                'uptime_seconds': round(uptime, 3),
+                'counters': {label(k): v for k, v in sorted(self.counters.items())},
+                'gauges': {label(k): v for k, v in sorted(self.gauges.items())},
+                'histograms': {label(k): {
+                    'count': h.count,
+                    'sum': round(h.sum, 6),
+                    'p50': h.quantile(0.5),
+                    'p99': h.quantile(0.99),
+                } for k, h in sorted(self.histograms.items())},
+                'throughput': {
+                    dict(labels)['stage']: round(v / uptime, 3) if uptime else 0
+                    for (name, labels), v in sorted(self.counters.items()) if name == 'stage_items_total'
+                },
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        def labels_text(labels, extra=()):
+            items = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+        with self._lock:
+            lines = [f"{PREFIX}uptime_seconds {time.time() - self.started:.3f}"]
+            for kind, metrics in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({n for n, _ in metrics}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    lines += [f"{PREFIX}{name}{labels_text(l)} {v}" for (n, l), v in sorted(metrics.items()) if n == name]
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (n, l), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ('+Inf',), h.counts):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{labels_text(l, [('le', bound)])} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{labels_text(l)} {h.sum:.6f}")
+                    lines.append(f"{PREFIX}{name}_count{labels_text(l)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to path: Prometheus text for .prom/.txt files, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(text)
+        # Readers polling the file never see it half written
+        os.replace(tmp, path)
+
+
+class MetricsWriter:
+    """Writes the registry to a file every `interval` seconds, and once more on stop()."""
+    def __init__(self, registry, path, interval=10):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.registry.write(self.path)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.registry.write(self.path)
+
+
+class ThreadProfiler:
+    """
+    Sampling profile of a block, including the threads it starts (the
+    pipeline's workers): every `interval` seconds a sampler thread records the
+    stack of every other thread. One sampler for the whole process works on
+    every Python version, where a cProfile per thread does not (3.12+ allows
+    a single active profiler).
+    A sample counts for the time elapsed since the previous one, and call
+    counts are sample counts. The stats
+    are saved to `path` (for pstats/snakeviz) and the top entries returned by summary().
+    """
+    def __init__(self, path, interval=0.005):
+        self.path = path
+        self.interval = interval
+        self.stats = None
+        self._samples = Counter()
+        self._own = Counter()
+        self._total = Counter()
+        self._callers = {}
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self._sampler = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._sampler.start()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            # Waits for the GIL may make the actual interval longer
+            now = time.perf_counter()
+            seconds, last = now - last, now
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._sample(frame, seconds)
+
+    def _sample(self, frame, seconds):
+        # Innermost function first, as pstats keys: (file, first line, name)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        self._own[stack[0]] += seconds
+        for func in set(stack): # Once per sample, even when recursive
+            self._samples[func] += 1
+            self._total[func] += seconds
+        for callee, caller in set(zip(stack, stack[1:])):
+            callers = self._callers.setdefault(callee, {})
+            count, total = callers.get(caller, (0, 0))
+            callers[caller] = (count + 1, total + seconds)
+
+    def _pstats(self):
+        """Samples as pstats entries: {function: (calls, primitive calls, own time, total time, callers)}"""
+        return {
+            func: (count, count, self._own[func], self._total[func], {
+                caller: (n, n, 0, seconds) for caller, (n, seconds) in self._callers.get(func, {}).items()
+            }) for func, count in self._samples.items()
+        }
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+        # pstats loads any object with create_stats() and a stats dict, like a cProfile.Profile
+        self.stats = pstats.Stats(SimpleNamespace(create_stats=lambda: None, stats=self._pstats()))
+        self.stats.dump_stats(self.path)
+        return False
+
+    def summary(self, limit=25):
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+# Registry of the process
+registry = MetricsRegistry()
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from ..config import Config
+from .outbound import OutboundPolicy, AdaptiveTimeout
+
+_shared = None
+_shared_pid = None
+_shared_lock = threading.Lock()
+
+
+class HttpClient:
+    """
+    Pooled HTTP client: one requests.Session whose adapters keep connections
+    alive and reuse them per host, instead of a new TCP/TLS handshake per call.
+    Every call goes through an OutboundPolicy: adaptive timeouts and per-host
+    circuit breakers. Only network errors, timeouts and 5xx answers count as
+    failures of the host.
+    """
+    def __init__(self, pool_connections=None, pool_maxsize=None, timeout=10, policy=None):
+        self.timeout = timeout
+        self.policy = policy or OutboundPolicy()
+        self.session = requests.Session()
+
+        # pool_connections: number of hosts kept warm, pool_maxsize: connections per host
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections or Config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or Config.HTTP_POOL_MAXSIZE
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, endpoint='default', **kwargs):
+        """
+        Send a request (requests.Session.request arguments).
+        Args:
+            endpoint (str): what is called ('website', 'hunter'...): hosts of one endpoint
+                share their latencies for adaptive timeouts
+        Raises: CircuitOpenError (a requests.ConnectionError) when the host's circuit is open,
+            AdaptiveTimeout (a requests.Timeout) when a timeout shorter than the caller's was reached
+        Returns: the response, its adaptive_timeout attribute telling whether its timeout
+            (streamed body reads included) is shorter than the caller's
+        """
+        host = urlparse(url).netloc.lower()
+        timeout = kwargs.get('timeout', self.timeout)
+        kwargs['timeout'] = self.policy.before(host, endpoint, timeout)
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self.policy.after(host, endpoint, failed=True)
+            if isinstance(e, requests.Timeout) and kwargs['timeout'] != timeout:
+                raise AdaptiveTimeout(f"{e} (adaptive timeout {kwargs['timeout']:.1f}s)", request=e.request) from e
+            raise
+        except Exception:
+            self.policy.abandon(host)
+            raise
+        self.policy.after(host, endpoint, time.monotonic() - start, failed=response.status_code >= 500)
+        response.adaptive_timeout = kwargs['timeout'] != timeout
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def snapshot(self):
+        """Latencies, timeouts and open circuits of the OutboundPolicy (see OutboundPolicy.snapshot)."""
+        return self.policy.snapshot()
+
+    def close(self):
+        self.session.close()
+
+
+def get_client():
+    """
+    Return the HttpClient shared by the whole process.
+    A forked worker gets its own client rather than the parent's sockets.
+    """
+    global _shared, _shared_pid
+    with _shared_lock:
+        if _shared is None or _shared_pid != os.getpid():
+            _shared = HttpClient()
+            _shared_pid = os.getpid()
+        return _shared
+
+
+def read_body(response, max_bytes, chunk_size=16384):
+    """
+    Read a streamed response body, stopping at max_bytes.
+    Returns: (body_bytes, truncated)
+    """
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        chunks.append(chunk)
+        size += len(chunk)
+        if max_bytes and size >= max_bytes:
+            return b''.join(chunks)[:max_bytes], True
+    return b''.join(chunks), False
+
+
+def decode_body(response, body):
+    """Decode body bytes the same way requests' response.text would."""
+    encoding = response.encoding or requests.compat.chardet.detect(body)['encoding'] or 'utf-8'
+    try:
+        return str(body, encoding, errors='replace')
+    except LookupError:
+        return str(body, 'utf-8', errors='replace')
@@ -0,0 +1,198 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+import requests
+from ..config import Config
+from ..metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """A call refused without being sent: its host failed repeatedly and is cooling down."""
+
+
+class AdaptiveTimeout(requests.Timeout):
+    """A timeout reached under an adaptive timeout, shorter than the caller's own."""
+
+
+class LatencyWindow:
+    """Durations of the last `size` calls, for percentiles."""
+    def __init__(self, size=256):
+        self._recent = deque(maxlen=size)
+        self._sorted = []
+
+    def add(self, seconds):
+        if len(self._recent) == self._recent.maxlen:
+            self._sorted.pop(bisect.bisect_left(self._sorted, self._recent[0]))
+        self._recent.append(seconds)
+        bisect.insort(self._sorted, seconds)
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def quantile(self, q):
+        if not self._sorted:
+            return None
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. Opens after `threshold` failures in a row: calls
+    are refused for `cooldown` seconds, then a single probe is let through
+    (half-open). A failed probe opens it again for twice as long (up to
+    max_cooldown); after a success the host's breaker is simply dropped.
+    """
+    def __init__(self, threshold, cooldown, max_cooldown):
+        self.threshold = threshold
+        self.max_cooldown = max_cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = cooldown
+        self.opened_at = None
+
+    def allow(self, now):
+        """Returns: whether a call may be sent now (the half-open probe, if it is one)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            return True
+        return False # Open, or half-open with its probe in flight
+
+    def failure(self, now):
+        """Returns: True if this failure opened the circuit"""
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+        elif self.state == OPEN or self.failures < self.threshold:
+            return False
+        self.state = OPEN
+        self.opened_at = now
+        return True
+
+
+class OutboundPolicy:
+    """
+    Health of the hosts and APIs we call, shared by every call of an HttpClient.
+
+    Latencies (time to the response headers) are kept per host and per endpoint
+    (an API, or 'website' for all business sites): a call's timeout becomes
+    timeout_factor x their p99, within [min_timeout, the caller's timeout]. The
+    host's own window is used once it has min_samples, else the endpoint's,
+    except for many_hosts endpoints: unrelated sites say nothing about each
+    other, so a site only gets a shorter timeout from its own latencies.
+    Each host has a circuit breaker: failures are network errors, timeouts and
+    5xx answers.
+    """
+    def __init__(self, adaptive=None, min_timeout=None, timeout_factor=None, min_samples=None,
+                 breaker_failures=None, breaker_cooldown=None, breaker_max_cooldown=None,
+                 many_hosts=('website',)):
+        self.adaptive = Config.HTTP_ADAPTIVE_TIMEOUTS if adaptive is None else adaptive
+        self.min_timeout = min_timeout or Config.HTTP_MIN_TIMEOUT
+        self.timeout_factor = timeout_factor or Config.HTTP_TIMEOUT_FACTOR
+        self.min_samples = min_samples or Config.HTTP_TIMEOUT_MIN_SAMPLES
+        self.breaker_failures = breaker_failures or Config.HTTP_BREAKER_FAILURES
+        self.breaker_cooldown = breaker_cooldown or Config.HTTP_BREAKER_COOLDOWN
+        self.breaker_max_cooldown = breaker_max_cooldown or Config.HTTP_BREAKER_MAX_COOLDOWN
+        self.many_hosts = set(many_hosts)
+        self._hosts = {}
+        self._endpoints = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def before(self, host, endpoint, timeout):
+        """
+        Called before sending a request.
+        Returns: the timeout to use
+        Raises: CircuitOpenError if the host's circuit is open
+        """
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is not None and not breaker.allow(time.monotonic()):
+                registry.inc('http_circuit_rejections_total', endpoint=endpoint)
+                raise CircuitOpenError(f"Circuit open for {host} after {breaker.failures} failures")
+            if not self.adaptive or timeout is None or isinstance(timeout, tuple):
+                return timeout
+            adapted = self._timeout(host, endpoint)
+        return timeout if adapted is None else min(timeout, adapted)
+
+    def _timeout(self, host, endpoint):
+        windows = [self._hosts.get(host)]
+        if endpoint not in self.many_hosts:
+            windows.append(self._endpoints.get(endpoint))
+        for window in windows:
+            if window is not None and len(window) >= self.min_samples:
+                return max(self.min_timeout, window.quantile(0.99) * self.timeout_factor)
+        return None
+
+    def after(self, host, endpoint, seconds=None, failed=False):
+        """Record the outcome of a request: its latency if it got an answer, and whether it failed."""
+        with self._lock:
+            if seconds is not None:
+                self._hosts.setdefault(host, LatencyWindow(64)).add(seconds)
+                self._endpoints.setdefault(endpoint, LatencyWindow()).add(seconds)
+                timeout = self._timeout(None, endpoint)
+                if timeout is not None:
+                    registry.set_gauge('http_adaptive_timeout_seconds', timeout, endpoint=endpoint)
+
+            breaker = self._breakers.get(host)
+            if not failed:
+                if breaker is not None:
+                    if breaker.state != CLOSED:
+                        logger.info(f"Circuit closed for {host}")
+                    # Healthy hosts keep no breaker
+                    del self._breakers[host]
+                    self._count_open()
+                return
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(
+                    self.breaker_failures, self.breaker_cooldown, self.breaker_max_cooldown
+                )
+            if breaker.failure(time.monotonic()):
+                registry.inc('http_circuit_opened_total', endpoint=endpoint)
+                self._count_open()
+                logger.warning(f"Circuit open for {host} ({breaker.failures} failures), retried in {breaker.cooldown:.0f}s")
+
+    def abandon(self, host):
+        """
+        Record a call that ended without telling anything about its host
+        (an invalid URL, too many redirects...): if it was the half-open
+        probe, the next call probes again.
+        """
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is not None and breaker.state == HALF_OPEN:
+                breaker.state = OPEN
+
+    def _count_open(self):
+        registry.set_gauge('http_open_circuits', sum(b.state != CLOSED for b in self._breakers.values()))
+
+    def snapshot(self):
+        """
+        Current state, for inspection.
+        Returns: dict with 'endpoints' {name: {samples, p50, p99, timeout}} and
+        'circuits' {host: {state, failures, cooldown}} for hosts that recently failed
+        """
+        with self._lock:
+            return {
+                'endpoints': {
+                    name: {
+                        'samples': len(window),
+                        'p50': window.quantile(0.5),
+                        'p99': window.quantile(0.99),
+                        'timeout': self._timeout(None, name),
+                    } for name, window in self._endpoints.items()
+                },
+                'circuits': {
+                    host: {'state': b.state, 'failures': b.failures, 'cooldown': b.cooldown}
+                    for host, b in self._breakers.items()
+                },
+            }
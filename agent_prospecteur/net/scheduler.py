@@ -0,0 +1,172 @@
+import itertools
+import socket
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from ..config import Config
+from ..metrics import registry
+
+
+class _Request:
+    __slots__ = ('host', 'ip', 'priority', 'seq', 'granted')
+
+    def __init__(self, host, ip, priority, seq):
+        self.host = host
+        self.ip = ip
+        self.priority = priority
+        self.seq = seq
+        self.granted = False
+
+
+class FetchScheduler:
+    """
+    Politeness for crawling many sites at once: a request to a website waits
+    for its slot (see slot()) until
+    - fewer than per_host requests are in flight to its host, and fewer than
+      per_ip to the address it resolves to (shared hosting, builder platforms),
+    - host_interval seconds passed since the last request to its host started,
+      ip_interval since the last one to its address,
+    - fewer than max_concurrency requests are in flight overall, and the global
+      rate (requests per second, token bucket) allows one more.
+
+    Among the requests allowed to start, the lowest priority value goes first,
+    then the host that was served the least, so hosts are interleaved fairly
+    rather than served in arrival order.
+    """
+    def __init__(self, max_concurrency=None, per_host=None, per_ip=None, host_interval=None,
+                 ip_interval=None, rate=None, burst=None, resolve=None):
+        self.max_concurrency = max_concurrency or Config.FETCH_MAX_CONCURRENCY
+        self.per_host = per_host or Config.FETCH_PER_HOST
+        self.per_ip = per_ip or Config.FETCH_PER_IP
+        self.host_interval = Config.FETCH_HOST_INTERVAL if host_interval is None else host_interval
+        self.ip_interval = Config.FETCH_IP_INTERVAL if ip_interval is None else ip_interval
+        self.rate = float(rate or Config.FETCH_RATE)
+        self.burst = float(burst or max(1, self.rate))
+        self._resolve_host = resolve or _resolve
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._host_flight = Counter()
+        self._ip_flight = Counter()
+        self._host_last = {}
+        self._ip_last = {}
+        self._served = Counter()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._ips = {}
+        self._ips_lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url, priority=0):
+        """
+        Hold a slot for the whole request to url (body included).
+        Args:
+            priority (int): lower values go first (e.g. known websites before guessed domains)
+        """
+        host = (urlparse(url if '//' in url else '//' + url).hostname or url).lower()
+        ip = self._ip(host)
+        start = time.monotonic()
+        self._acquire(host, ip, priority)
+        registry.observe('fetch_wait_seconds', time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release(host, ip)
+
+    def _ip(self, host):
+        with self._ips_lock:
+            if host in self._ips:
+                return self._ips[host]
+        ip = self._resolve_host(host)
+        with self._ips_lock:
+            self._ips[host] = ip
+        return ip
+
+    def _acquire(self, host, ip, priority):
+        with self._cond:
+            request = _Request(host, ip, priority, next(self._seq))
+            self._waiting.append(request)
+            while True:
+                delay = self._dispatch()
+                if request.granted:
+                    return
+                self._cond.wait(delay)
+
+    def _release(self, host, ip):
+        with self._cond:
+            self._in_flight -= 1
+            self._host_flight[host] -= 1
+            if ip:
+                self._ip_flight[ip] -= 1
+            registry.set_gauge('fetch_in_flight', self._in_flight)
+            self._dispatch()
+            # Waiters held by a cap now wait on time (spacing, rate) instead
+            self._cond.notify_all()
+
+    def _dispatch(self):
+        """
+        Start every waiting request that may start now, fairest first.
+        Returns: seconds until a waiting request may become allowed by time alone, or None
+        """
+        granted = False
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            best = None
+            delay = None
+            for request in self._waiting:
+                wait = self._wait_for(request, now)
+                if wait is None:
+                    continue # Capped by concurrency: a release will wake us
+                if wait > 0:
+                    delay = wait if delay is None else min(delay, wait)
+                    continue
+                key = (request.priority, self._served[request.host], request.seq)
+                if best is None or key < best[0]:
+                    best = (key, request)
+            if best is None:
+                break
+
+            request = best[1]
+            self._waiting.remove(request)
+            request.granted = granted = True
+            self._tokens -= 1
+            self._in_flight += 1
+            self._host_flight[request.host] += 1
+            self._host_last[request.host] = now
+            self._served[request.host] += 1
+            if request.ip:
+                self._ip_flight[request.ip] += 1
+                self._ip_last[request.ip] = now
+
+        if granted:
+            registry.set_gauge('fetch_in_flight', self._in_flight)
+            self._cond.notify_all()
+        return delay
+
+    def _wait_for(self, request, now):
+        """Returns: 0 if the request may start now, seconds to wait, or None while a concurrency cap holds it"""
+        if (self._in_flight >= self.max_concurrency
+                or self._host_flight[request.host] >= self.per_host
+                or (request.ip and self._ip_flight[request.ip] >= self.per_ip)):
+            return None
+        wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0
+        if request.host in self._host_last:
+            wait = max(wait, self._host_last[request.host] + self.host_interval - now)
+        if request.ip and request.ip in self._ip_last:
+            wait = max(wait, self._ip_last[request.ip] + self.ip_interval - now)
+        return max(0, wait)
+
+
+def _resolve(host):
+    """First address of host, or None if it does not resolve (the request will fail on its own)."""
+    try:
+        return socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)[0][4][0]
+    except (socket.gaierror, UnicodeError, ValueError, IndexError):
+        return None
@@ -0,0 +1,561 @@
+import asyncio
+import datetime
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .config import STAGES, DEFAULT_WORKERS
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Marker pushed through a queue once a stage has no more work for the next one
+_END = object()
+
+
+class Stage:
+    """
+    One step of the pipeline, served by its own pool of workers.
+
+    `func` receives one item and returns the item to hand to the next stage,
+    or None to drop it. With fan_out=True it returns an iterable of items instead;
+    an iterator is consumed lazily, in the thread pool, as the next stage keeps up.
+    With a batch_size, `func` receives a list of the items already waiting
+    (up to batch_size) and returns a list of items (None entries are dropped).
+    """
+    def __init__(self, name, func, workers=1, fan_out=False, batch_size=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.fan_out = fan_out
+        self.batch_size = None if batch_size is None else max(1, int(batch_size))
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages joined by bounded queues.
+    Blocking stage functions run in a thread pool, so each stage overlaps
+    with the others and its throughput scales with its worker count.
+    """
+    def __init__(self, stages, queue_size=100):
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def run(self, items):
+        """
+        Feed items through every stage.
+        Returns: list of the items produced by the last stage
+        """
+        return asyncio.run(self.run_async(items))
+
+    async def run_async(self, items):
+        results = []
+        executor = ThreadPoolExecutor(max_workers=sum(s.workers for s in self.stages))
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+
+        try:
+            tasks = [asyncio.create_task(self._feed(items, queues[0], self.stages[0].workers))]
+            for i, stage in enumerate(self.stages):
+                is_last = i == len(self.stages) - 1
+                outbox = None if is_last else queues[i + 1]
+                next_workers = 0 if is_last else self.stages[i + 1].workers
+                tasks.append(asyncio.create_task(
+                    self._run_stage(stage, queues[i], outbox, next_workers, executor, results)
+                ))
+            await asyncio.gather(*tasks)
+        finally:
+            executor.shutdown(wait=True)
+
+        return results
+
+    async def _feed(self, items, outbox, workers):
+        for item in items:
+            await outbox.put(item)
+        for _ in range(workers):
+            await outbox.put(_END)
+
+    async def _run_stage(self, stage, inbox, outbox, next_workers, executor, results):
+        await asyncio.gather(*(
+            self._worker(stage, inbox, outbox, executor, results) for _ in range(stage.workers)
+        ))
+        # Every worker of this stage is done: release the workers of the next one
+        for _ in range(next_workers):
+            await outbox.put(_END)
+
+    async def _worker(self, stage, inbox, outbox, executor, results):
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item = await inbox.get()
+            if item is _END:
+                return
+
+            if stage.batch_size:
+                # Take whatever is already queued, without waiting for a full batch
+                item = [item]
+                while len(item) < stage.batch_size and not inbox.empty():
+                    extra = inbox.get_nowait()
+                    if extra is _END:
+                        finished = True
+                        break
+                    item.append(extra)
+
+            registry.gauge_add('stage_in_flight', 1, stage=stage.name)
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(executor, stage.func, item)
+            except Exception:
+                logger.exception(f"Stage '{stage.name}' failed, dropping item")
+                registry.inc('stage_errors_total', stage=stage.name)
+                continue
+            finally:
+                registry.gauge_add('stage_in_flight', -1, stage=stage.name)
+                registry.observe('stage_seconds', time.perf_counter() - start, stage=stage.name)
+            registry.inc('stage_items_total', len(item) if stage.batch_size else 1, stage=stage.name)
+
+            if result is None:
+                continue
+
+            if stage.fan_out and iter(result) is result:
+                await self._drain(stage, result, outbox, executor, results)
+                continue
+
+            for out in (result if stage.fan_out or stage.batch_size else (result,)):
+                await self._emit(out, outbox, results)
+
+    async def _drain(self, stage, iterator, outbox, executor, results):
+        # Each next() may block on I/O: pull items from the thread pool
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                out = await loop.run_in_executor(executor, next, iterator, _END)
+            except Exception:
+                logger.exception(f"Stage '{stage.name}' failed while streaming items")
+                return
+            if out is _END:
+                return
+            await self._emit(out, outbox, results)
+
+    async def _emit(self, out, outbox, results):
+        if out is None:
+            return
+        if outbox is None:
+            results.append(out)
+        else:
+            await outbox.put(out)
+
+
+class ProspectPipeline:
+    """
+    The prospecting flow (search, site check, analysis, enrichment,
+    generation, send, persist) wired as a concurrent Pipeline.
+    """
+    def __init__(self, db, searcher, site_checker, analyzer, enricher, generator, sender,
+                 dry_run=False, workers=None, queue_size=100, analyze_batch=8, enrich_batch=16, generate_batch=16, send_batch=50, persist_batch=50,
+                 checkpoints=None, resume=False, known=None, claims=None, easter_eggs=False):
+        """
+        Args:
+            claims (CampaignStore): prospects are claimed for this process as they are found,
+                and dropped if another worker of the campaign got them first
+            easter_eggs (bool): celebrate the 50th email sent (opens a web browser)
+            known (KnownProspectIndex): drop prospects already in the database as soon as they are found
+            checkpoints (CheckpointStore): record the progress of every prospect
+            resume (bool): continue the campaign recorded in checkpoints instead of starting over
+        """
+        self.db = db
+        self.searcher = searcher
+        self.site_checker = site_checker
+        self.analyzer = analyzer
+        self.enricher = enricher
+        self.generator = generator
+        self.sender = sender
+        self.dry_run = dry_run
+        self.workers = dict(DEFAULT_WORKERS, **(workers or {}))
+        self.queue_size = queue_size
+        self.analyze_batch = analyze_batch
+        self.enrich_batch = enrich_batch
+        self.generate_batch = generate_batch
+        self.send_batch = send_batch
+        self.persist_batch = persist_batch
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.known = known
+        self.claims = claims
+        self.easter_eggs = easter_eggs
+        self._page_cache = getattr(site_checker, 'page_cache', None)
+
+        self.processed_count = 0
+        self.sent_count = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+    def build(self):
+        stages = [
+            Stage('search', self.search, self.workers['search'], fan_out=True),
+            Stage('check', self.check_site, self.workers['check']),
+            self._analyze_stage(),
+            Stage('enrich', self.enrich, self.workers['enrich'], batch_size=self.enrich_batch),
+            Stage('generate', self.generate, self.workers['generate'], batch_size=self.generate_batch),
+            Stage('send', self.send, self.workers['send'], batch_size=self.send_batch),
+            # Rows waiting to be saved are written together, in one transaction
+            Stage('persist', self.persist, self.workers['persist'], batch_size=self.persist_batch),
+        ]
+        if self.checkpoints:
+            stages[0].func = self._search_checkpointed
+            for stage in stages[1:]:
+                stage.func = self._checkpointed(stage)
+        return Pipeline(stages, queue_size=self.queue_size)
+
+    def _analyze_stage(self):
+        # With a process pool behind the analyzer, hand it whole batches of pages
+        # so parsing happens in other processes while fetching goes on here
+        if getattr(self.analyzer, 'processes', None):
+            return Stage('analyze', self.analyze_many, self.workers['analyze'], batch_size=self.analyze_batch)
+        return Stage('analyze', self.analyze, self.workers['analyze'])
+
+    def run(self, queries):
+        """
+        Run the whole flow for a list of search queries.
+        Each query is a dict with keys: location, radius, keyword, type, sector
+        """
+        if self.checkpoints:
+            if self.resume:
+                queries = [{'resume': True}] + list(queries)
+            else:
+                self.checkpoints.reset()
+        self.build().run(queries)
+        return self.processed_count, self.sent_count
+
+    def send_pending(self):
+        """
+        Send the prospects saved but never contacted (e.g. by a dry run),
+        streamed from the database send_batch rows at a time, and save the outcomes.
+        Returns: (prospects processed, emails sent)
+        """
+        rows = self.db.iter_pending_prospects(batch_size=self.send_batch)
+        while True:
+            batch = [self._pending_context(row) for row in itertools.islice(rows, self.send_batch)]
+            if not batch:
+                break
+            self.persist(self.send(batch))
+        return self.processed_count, self.sent_count
+
+    def _pending_context(self, row):
+        return {
+            'id': row['id'],
+            'prospect': {'place_id': row['place_id'], 'address': row['address']},
+            'name': row['name'],
+            'city': row['city'],
+            'sector': row['sector'],
+            'url': row['website_url'],
+            'website_status': row['website_status'],
+            'email': row['email'],
+            'message': row['message_content'],
+            'status': row['status'],
+            'sent_at': None,
+        }
+
+    def _search_checkpointed(self, query):
+        if query.get('resume'):
+            # Prospects of the interrupted run re-enter the flow after their last stage
+            count = 0
+            for ctx in self.checkpoints.pending():
+                count += 1
+                yield ctx
+            logger.info(f"Resuming {count} prospects from the last run.")
+            return
+
+        if self.checkpoints.search_done(query):
+            logger.info(f"Search for '{query['keyword']}' already done, skipping.")
+            return
+
+        for ctx in self.search(query):
+            if self.checkpoints.has(ctx['key']):
+                continue # Found before the interruption (or by another query)
+            ctx['stage'] = 'search'
+            self.checkpoints.save([ctx])
+            yield ctx
+        self.checkpoints.mark_search_done(query)
+
+    def _checkpointed(self, stage):
+        """
+        Wrap a stage so that prospects already past it go through unchanged,
+        and the others are checkpointed once it is done with them.
+        """
+        func, batch = stage.func, bool(stage.batch_size)
+        position = STAGES.index(stage.name)
+
+        def run(item):
+            items = item if batch else [item]
+            todo = [ctx for ctx in items if STAGES.index(ctx['stage']) < position]
+            outputs = {}
+            if todo:
+                result = func(todo if batch else todo[0])
+                if not batch:
+                    result = [result]
+                elif result is None:
+                    result = [None] * len(todo)
+                for ctx, out in zip(todo, result):
+                    # Dropped (e.g. modern site) or persisted: nothing left to do for it
+                    ctx['stage'] = 'done' if out is None or stage.name == 'persist' else stage.name
+                    if ctx.get('html') is not None:
+                        # Pages are not checkpointed: a resumed run downloads it again
+                        ctx['stage'] = STAGES[position - 1]
+                    outputs[id(ctx)] = out
+                self.checkpoints.save(todo)
+
+            results = [outputs[id(ctx)] if id(ctx) in outputs else ctx for ctx in items]
+            return results if batch else results[0]
+        return run
+
+    # 1. Search Prospects
+    def search(self, query):
+        contexts = self._search_area(query) if query.get('full_coverage') else self._search_nearby(query)
+        if self.known:
+            contexts = self._drop_known(contexts)
+        return self._claim(contexts, query.get('shard')) if self.claims else contexts
+
+    def _search_nearby(self, query):
+        logger.info(f"🔎 Searching for '{query['keyword']}' in radius {query['radius']}m...")
+        prospects = self.searcher.search(
+            location=query['location'],
+            radius=query['radius'],
+            keyword=query['keyword'],
+            type=query.get('type')
+        )
+        logger.info(f"Found {len(prospects)} potential prospects.")
+        return [self._new_context(p, query) for p in prospects]
+
+    def _search_area(self, query):
+        # Streams prospects to the next stages while the remaining tiles are searched
+        area = f"box {query['bounds']}" if query.get('bounds') else f"radius {query['radius']}m"
+        logger.info(f"🔎 Searching for '{query['keyword']}' over {area} (full coverage)...")
+        count = 0
+        for p in self.searcher.search_area(
+            keyword=query['keyword'],
+            type=query.get('type'),
+            location=query['location'],
+            radius=query['radius'],
+            bounds=query.get('bounds'),
+            tile_radius=query.get('tile_radius', 1000),
+            workers=query.get('tile_workers', 8)
+        ):
+            count += 1
+            yield self._new_context(p, query)
+        logger.info(f"Found {count} potential prospects.")
+
+    def _drop_known(self, contexts):
+        # Known prospects never reach the network stages
+        skipped = 0
+        for ctx in contexts:
+            with self._db_lock:
+                known = self.known.is_known(ctx['prospect'].get('place_id'), ctx['name'], ctx['city'])
+            if known:
+                skipped += 1
+                continue
+            yield ctx
+        if skipped:
+            logger.info(f"Skipped {skipped} prospects already in the database.")
+
+    def _claim(self, contexts, shard):
+        # Shards of a campaign overlap: the first worker to claim a prospect handles it
+        taken = 0
+        for ctx in contexts:
+            if self.claims.claim(ctx['key'], shard):
+                yield ctx
+            else:
+                taken += 1
+        if taken:
+            logger.info(f"Skipped {taken} prospects already claimed by another worker.")
+
+    def _new_context(self, p, query):
+        return {
+            'key': p.get('place_id') or f"{p['name']}|{p.get('address', '')}",
+            'stage': None,
+            'prospect': p,
+            'name': p['name'],
+            'city': p.get('address', '').split(',')[-1].strip(), # Crude city extraction
+            'sector': query.get('sector') or query['keyword'],
+            'url': p.get('website'),
+            'website_status': 'UNKNOWN',
+            'reasons': [],
+            'final_url': None,
+            'html': None,
+            'email': None,
+            'message': None,
+            'status': 'new',
+            'sent_at': None,
+        }
+
+    # 2. Check Website
+    def check_site(self, ctx):
+        name = ctx['name']
+        logger.info(f"[{name}] Analyzing prospect")
+
+        if not ctx['url']:
+            # Try to guess
+            guessed_url = self.site_checker.guess_domain(name)
+            if guessed_url:
+                logger.info(f"[{name}] Url guessed: {guessed_url}")
+                ctx['url'] = guessed_url
+            else:
+                logger.info(f"[{name}] No website found.")
+                ctx['website_status'] = 'NO_SITE'
+                return ctx
+
+        verdict = None
+        if getattr(self.site_checker, 'progressive', False):
+            # The page is scored while it downloads: the analyze stage has nothing left to do
+            is_up, final_url, html, verdict = self.site_checker.check_progressive(ctx['url'])
+        else:
+            is_up, final_url, html = self.site_checker.check(ctx['url'])
+        if is_up and verdict:
+            ctx['final_url'] = final_url
+            self._set_verdict(ctx, verdict)
+        elif is_up:
+            ctx['final_url'] = final_url
+            verdict = self._page_cache.get_verdict(final_url) if self._page_cache else None
+            if verdict:
+                # Same page as last time: reuse its verdict instead of analyzing it again
+                self._set_verdict(ctx, verdict)
+            else:
+                ctx['html'] = html
+        else:
+            logger.info(f"[{name}] Website check failed (down or timeout).")
+            ctx['website_status'] = 'NO_SITE' # Treat a site that is down as no site
+        return ctx
+
+    # 3. Analyze Design
+    def analyze(self, ctx):
+        if ctx['html'] is not None:
+            self._set_verdict(ctx, self.analyzer.analyze(ctx['html']))
+        return self._keep(ctx)
+
+    def analyze_many(self, batch):
+        pages = [ctx for ctx in batch if ctx['html'] is not None]
+        for index, verdict in self.analyzer.analyze_many([ctx['html'] for ctx in pages]):
+            self._set_verdict(pages[index], verdict)
+        return [self._keep(ctx) for ctx in batch]
+
+    def _set_verdict(self, ctx, verdict):
+        if ctx['html'] is not None and self._page_cache:
+            self._page_cache.set_verdict(ctx['final_url'], *verdict)
+        ctx['website_status'], ctx['reasons'] = verdict
+        ctx['html'] = None # Release the page as soon as it is scored
+        logger.info(f"[{ctx['name']}] Website status: {ctx['website_status']} ({ctx['reasons']})")
+
+    def _keep(self, ctx):
+        # Filter: Keep only ARCHAIC or NO_SITE
+        if ctx['website_status'] not in ['ARCHAIC', 'NO_SITE']:
+            logger.info(f"[{ctx['name']}] Skipping: Website is MODERN or UNKNOWN.")
+            return None
+        return ctx
+
+    # 4. Enrich Email
+    def enrich(self, batch):
+        # Domains of the batch are looked up concurrently, each one once
+        domains = [ctx['url'].split('//')[-1].split('/')[0] if ctx['url'] else None for ctx in batch]
+        emails = self.enricher.find_many(domains)
+
+        for ctx, domain in zip(batch, domains):
+            ctx['email'] = emails[domain]
+            if ctx['email']:
+                logger.info(f"[{ctx['name']}] Email found: {ctx['email']}")
+            else:
+                logger.warning(f"[{ctx['name']}] No email found. Skipping auto-send.")
+        return batch
+
+    # 5. Generate Message
+    def generate(self, batch):
+        # Emails of the batch are written concurrently, within the generator's API limits
+        pending = [ctx for ctx in batch if ctx['email']]
+        for index, message in self.generator.generate_many([{
+            'name': ctx['name'],
+            'city': ctx['city'],
+            'sector': ctx['sector'],
+            'website_status': ctx['website_status'],
+            'valid_reasons': ctx['reasons']
+        } for ctx in pending]):
+            pending[index]['message'] = message
+        return batch
+
+    # 6. Send Message
+    def send(self, batch):
+        outgoing = []
+        for ctx in batch:
+            if not ctx['email']:
+                continue
+            if not ctx['message']:
+                logger.error(f"[{ctx['name']}] No message could be generated. Skipping send.")
+                continue
+            outgoing.append(ctx)
+
+        subjects = [f"Optimisation de votre présence web - {ctx['name']}" for ctx in outgoing]
+
+        if self.dry_run:
+            for ctx, subject in zip(outgoing, subjects):
+                logger.info(f"[{ctx['name']}] [DRY RUN] Would send email to {ctx['email']}: {subject}")
+            return batch
+
+        outcomes = self.sender.send_batch([
+            {'to': ctx['email'], 'subject': subject, 'content': ctx['message']}
+            for ctx, subject in zip(outgoing, subjects)
+        ])
+        for ctx, outcome in zip(outgoing, outcomes):
+            if not outcome['sent']:
+                logger.error(f"[{ctx['name']}] ❌ Failed to send email: {outcome['error']}")
+                ctx['status'] = 'failed'
+                continue
+            logger.info(f"[{ctx['name']}] ✅ Email sent successfully.")
+            ctx['status'] = 'sent'
+            ctx['sent_at'] = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self._count_sent()
+        return batch
+
+    def _count_sent(self):
+        with self._lock:
+            self.sent_count += 1
+            sent_count = self.sent_count
+
+        # Easter Egg threshold
+        if sent_count == 50 and self.easter_eggs:
+            logger.info("🎉 50 Emails Sent! Triggering celebration...")
+            try:
+                import webbrowser
+                import antigravity
+                antigravity.geohash(37.421542, -122.085589, b'dow jones industrial average')
+                webbrowser.open("https://xkcd.com/353/")
+            except Exception:
+                pass
+
+    # 7. Persist
+    def persist(self, batch):
+        # Prospects read back from the database (send_pending) only get their outcome saved, by id
+        outcomes = [{
+            'id': ctx['id'],
+            'status': ctx['status'],
+            'sent_at': ctx['sent_at'],
+        } for ctx in batch if ctx.get('id')]
+        rows = [{
+            'place_id': ctx['prospect'].get('place_id'),
+            'name': ctx['name'],
+            'address': ctx['prospect']['address'],
+            'city': ctx['city'],
+            'sector': ctx['sector'],
+            'website_url': ctx['url'],
+            'website_status': ctx['website_status'],
+            'email': ctx['email'],
+            'status': ctx['status'],
+            'message_content': ctx['message'],
+            'sent_at': ctx['sent_at'],
+        } for ctx in batch if not ctx.get('id')]
+        with self._db_lock:
+            if rows:
+                self.db.add_prospects(rows)
+            if outcomes:
+                self.db.update_listing_statuses(outcomes)
+
+        with self._lock:
+            self.processed_count += len(batch)
+        return None
@@ -1,13 +1,33 @@
-import requests
+import itertools
 import json
+import math
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from ..config import Config
+from ..metrics import registry
+from ..net.http_client import get_client
+from ..net.rate_limit import RateLimiter
+
+METERS_PER_DEGREE = 111320
+MAX_NEARBY_RADIUS = 50000 # Nearby Search refuses larger radiuses
 
 class GooglePlacesSearch:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, rate_limit=None, client=None, cache=None, refresh=False):
+        """
+        Args:
+            cache (PlacesCache): replay identical queries from disk instead of the API
+            refresh (bool): ignore cached answers (fresh ones are still stored)
+        """
         self.api_key = api_key or Config.GOOGLE_PLACES_API_KEY
+        self.cache = cache
+        self.refresh = refresh
         self.base_url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+        self.client = client or get_client()
+        self.rate_limiter = RateLimiter(rate_limit or Config.PLACES_RATE_LIMIT)
+        self.page_token_delay = 2 # A next_page_token only becomes valid after a short delay
 
-    def search(self, location="48.8566,2.3522", radius=5000, keyword="bakery", type=None):
+    def search(self, location="48.8566,2.3522", radius=5000, keyword="bakery", type=None, pages=1):
         """
         Search for businesses using Google Places API.
         
@@ -16,6 +36,8 @@ class GooglePlacesSearch:
             radius (int): Search radius in meters
             keyword (str): Keyword to search for (e.g., "bakery", "plumber")
             type (str): Type of place (optional)
+            pages (int): result pages to follow, up to 3 (each next page waits for its token);
+                search_area() follows them all
             
         Returns:
             list: List of dicts with keys: name, address, place_id, types, location, rating
@@ -27,6 +49,108 @@ class GooglePlacesSearch:
         if not self.api_key:
             raise ValueError("GOOGLE_PLACES_API_KEY is missing")
 
+        results = []
+        for data in itertools.islice(self._fetch_pages(self._params(location, radius, keyword, type)), pages):
+            results.extend(self._parse_place(place) for place in data.get("results", []))
+            if len(results) >= Config.MAX_PROSPECTS:
+                break
+
+        return results[:Config.MAX_PROSPECTS]
+
+    def search_area(self, keyword="bakery", type=None, location="48.8566,2.3522", radius=5000,
+                    bounds=None, tile_radius=1000, workers=8, limit=None):
+        """
+        Cover a large area: split it into overlapping tiles searched concurrently
+        (under the request rate limit), following every page of results.
+
+        Args:
+            keyword (str), type (str): as in search()
+            location (str), radius (int): circle to cover, used when bounds is None
+            bounds (tuple): (south, west, north, east) box to cover instead of a circle
+            tile_radius (int): radius in meters of each tile search
+            workers (int): tiles searched at the same time
+            limit (int): stop after this many places (default: no limit)
+
+        Yields:
+            dict: places as they arrive, once per place_id (same keys as search())
+        """
+        if Config.ANTIGRAVITY_FLIGHT:
+            print("🚀 [FLIGHT MODE] Returning mock search results")
+            yield from self._mock_results(keyword)
+            return
+
+        if not self.api_key:
+            raise ValueError("GOOGLE_PLACES_API_KEY is missing")
+
+        tile_radius = min(tile_radius, MAX_NEARBY_RADIUS)
+        tiles = list(self._tiles(location, radius, bounds, tile_radius))
+        found = queue.Queue()
+        done = object()
+
+        def search_tile(center):
+            try:
+                for data in self._fetch_pages(self._params(center, tile_radius, keyword, type)):
+                    for place in data.get("results", []):
+                        found.put(self._parse_place(place))
+            finally:
+                found.put(done)
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(search_tile, center) for center in tiles]
+            seen = set()
+            remaining = len(tiles)
+            while remaining:
+                place = found.get()
+                if place is done:
+                    remaining -= 1
+                    continue
+                if place["place_id"] in seen:
+                    continue
+                seen.add(place["place_id"])
+                yield place
+                if limit and len(seen) >= limit:
+                    return
+
+            for future in futures:
+                future.result() # Surface errors of failed tiles
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _tiles(self, location, radius, bounds, tile_radius):
+        """Centers ("lat,lng") of a grid of circles covering the area."""
+        if bounds:
+            south, west, north, east = bounds
+            center_lat = center_lng = None
+        else:
+            center_lat, center_lng = (float(v) for v in location.split(","))
+            lat_span = radius / METERS_PER_DEGREE
+            lng_span = radius / (METERS_PER_DEGREE * math.cos(math.radians(center_lat)))
+            south, north = center_lat - lat_span, center_lat + lat_span
+            west, east = center_lng - lng_span, center_lng + lng_span
+
+        # Circles on a square grid of side r*sqrt(2) cover the plane, overlapping a bit
+        step = tile_radius * math.sqrt(2)
+        lat_step = step / METERS_PER_DEGREE
+        rows = max(1, math.ceil((north - south) / lat_step))
+        for row in range(rows):
+            lat = south + (row + 0.5) * (north - south) / rows
+            lng_step = step / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+            cols = max(1, math.ceil((east - west) / lng_step))
+            for col in range(cols):
+                lng = west + (col + 0.5) * (east - west) / cols
+                if center_lat is not None and self._distance(center_lat, center_lng, lat, lng) > radius + tile_radius:
+                    continue # Tile entirely outside the circle
+                yield f"{lat:.6f},{lng:.6f}"
+
+    @staticmethod
+    def _distance(lat1, lng1, lat2, lng2):
+        """Approximate distance in meters (equirectangular, fine at city scale)."""
+        x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+        y = math.radians(lat2 - lat1)
+        return math.hypot(x, y) * 6371000
+
+    def _params(self, location, radius, keyword, type):
         params = {
             "location": location,
             "radius": radius,
@@ -36,24 +160,64 @@ class GooglePlacesSearch:
         
         if type:
             params["type"] = type
+        return params
+
+    def _fetch_pages(self, params):
+        """Yield the raw JSON of every result page of a Nearby Search, following next_page_token."""
+        if not self.cache:
+            yield from self._fetch_live(params)
+            return
+
+        cached = None if self.refresh else self.cache.get(params)
+        if cached:
+            yield from cached['pages']
+            if cached['complete']:
+                return
 
-        response = requests.get(self.base_url, params=params)
+        # Missing or partial entry: fetch again, skipping the pages already replayed
+        skip = len(cached['pages']) if cached else 0
+        pages = []
+        for data in self._fetch_live(params):
+            pages.append(data)
+            self.cache.set(params, pages, complete=not data.get("next_page_token"))
+            if len(pages) > skip:
+                yield data
+
+    def _fetch_live(self, params):
+        data = self._request(params)
+        yield data
+
+        while data.get("next_page_token"):
+            token_params = {"pagetoken": data["next_page_token"], "key": self.api_key}
+            for attempt in range(3):
+                time.sleep(self.page_token_delay)
+                data = self._request(token_params)
+                if data.get("status") != "INVALID_REQUEST":
+                    break # INVALID_REQUEST: the token is not valid yet
+            yield data
+
+    def _request(self, params):
+        self.rate_limiter.acquire()
+        with registry.call('places') as call:
+            response = self.client.get(self.base_url, params=params, timeout=30, endpoint='places')
+            call.status = response.status_code
         response.raise_for_status()
-        
         data = response.json()
-        results = []
-        
-        for place in data.get("results", [])[:Config.MAX_PROSPECTS]:
-            results.append({
-                "name": place.get("name"),
-                "address": place.get("vicinity"),
-                "place_id": place.get("place_id"),
-                "types": place.get("types"),
-                "location": place.get("geometry", {}).get("location"),
-                "rating": place.get("rating")
-            })
-            
-        return results
+        if data.get("status") in ("REQUEST_DENIED", "OVER_QUERY_LIMIT"):
+            raise ValueError(f"Places API error: {data.get('status')} {data.get('error_message', '')}")
+        return data
+
+    @staticmethod
+    def _parse_place(place):
+        return {
+            "name": place.get("name"),
+            "address": place.get("vicinity"),
+            "place_id": place.get("place_id"),
+            "types": place.get("types"),
+            "location": place.get("geometry", {}).get("location"),
+            "rating": place.get("rating"),
+            "website": place.get("website") # Only in Place Details answers
+        }
 
     def _mock_results(self, keyword):
         """Return 3 mock results for testing."""
@@ -0,0 +1,41 @@
+import json
+from ..config import Config
+from ..db.cache import SqliteCache
+from ..metrics import registry
+
+
+class PlacesCache:
+    """
+    Persistent cache of Nearby Search answers.
+    Entries hold the raw JSON of every result page, so pagination is replayed
+    without calling the API. Queries are keyed on normalized parameters, with
+    coordinates rounded to `precision` decimals.
+    """
+    def __init__(self, path=None, ttl=None, max_entries=None, precision=None):
+        self.precision = Config.PLACES_CACHE_PRECISION if precision is None else precision
+        self.store = SqliteCache(
+            path or Config.PLACES_CACHE_PATH, 'places',
+            ttl=Config.PLACES_CACHE_TTL if ttl is None else ttl,
+            max_entries=max_entries or Config.PLACES_CACHE_MAX_ENTRIES
+        )
+
+    def key(self, params):
+        lat, lng = (float(v) for v in str(params["location"]).split(","))
+        return json.dumps({
+            "location": [round(lat, self.precision), round(lng, self.precision)],
+            "radius": int(params["radius"]),
+            "keyword": " ".join(str(params.get("keyword") or "").lower().split()),
+            "type": params.get("type") or None,
+        }, sort_keys=True)
+
+    def get(self, params):
+        """Returns: {'pages': [raw page, ...], 'complete': bool} or None"""
+        cached = self.store.get(self.key(params))
+        registry.cache('places', 'hit' if cached else 'miss')
+        return cached
+
+    def set(self, params, pages, complete):
+        self.store.set(self.key(params), {'pages': pages, 'complete': complete})
+
+    def close(self):
+        self.store.close()
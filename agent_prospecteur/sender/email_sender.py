@@ -1,40 +1,149 @@
-import sendgrid
-from sendgrid.helpers.mail import Mail, Email, To, Content
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from urllib3.exceptions import NewConnectionError
 from ..config import Config
+from ..metrics import registry
+from ..net.http_client import get_client
+from ..net.outbound import CircuitOpenError
+from ..net.rate_limit import retry_after
+
+# SendGrid accepts up to 1000 personalizations per request
+MAX_PERSONALIZATIONS = 1000
+# Substitutions of one personalization may total 10000 bytes: longer bodies go out alone
+MAX_SUBSTITUTION_BYTES = 10000
+# Replaced by each recipient's own body
+BODY_TAG = '-body-'
+# Requests refused as a whole, e.g. for one invalid address: nothing was sent, its halves are tried again
+SPLIT_STATUSES = {400, 413}
+SIGNATURE = "\n\nPS: import antigravity"
+
+def _not_sent(exc):
+    """Whether a failed request surely never reached SendGrid, so that sending it again cannot send twice."""
+    for err in (exc, exc.__cause__):
+        if isinstance(err, (requests.ConnectTimeout, CircuitOpenError)):
+            return True
+        if isinstance(err, requests.ConnectionError) and err.args \
+                and isinstance(getattr(err.args[0], 'reason', None), NewConnectionError):
+            return True
+    return False
 
 class EmailSender:
-    def __init__(self):
-        self.api_key = Config.SENDGRID_API_KEY
+    def __init__(self, api_key=None, client=None, api_host=None, max_concurrency=None, max_retries=None):
+        """
+        Args:
+            client (HttpClient): pooled client (default: the one shared by the process)
+            api_host (str): SendGrid API root, e.g. a local stub for offline runs
+            max_concurrency (int): send requests in flight in send_batch
+        """
+        self.api_key = api_key or Config.SENDGRID_API_KEY
         self.from_email = Config.SENDGRID_FROM_EMAIL
-        self.sg = sendgrid.SendGridAPIClient(api_key=self.api_key) if self.api_key else None
+        self.client = client or get_client()
+        self.url = f"{(api_host or Config.SENDGRID_API_HOST).rstrip('/')}/v3/mail/send"
+        self.max_concurrency = max_concurrency or Config.SENDGRID_MAX_CONCURRENCY
+        self.max_retries = Config.SENDGRID_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = 1 # Seconds before the first retry, doubled on each attempt
 
     def send(self, to_email, subject, content):
         """
         Send an email using SendGrid.
         """
+        return self.send_batch([{'to': to_email, 'subject': subject, 'content': content}])[0]['sent']
+
+    def send_batch(self, messages):
+        """
+        Send many emails. Up to MAX_PERSONALIZATIONS messages go out in one request,
+        one personalization each with its own recipient, subject and body (a
+        substitution of the shared content); requests run concurrently.
+        A request is only sent again when rate limited or when it could not
+        reach SendGrid: any other failure fails its messages, never sends twice.
+        A request refused as a whole (one invalid address) is split until only
+        the messages at fault fail.
+        Args:
+            messages (list): dicts with keys to, subject, content
+        Returns:
+            list: one outcome per message, in order: {'email', 'sent' (bool), 'error' (str or None)}
+        """
         if Config.ANTIGRAVITY_FLIGHT:
-            print(f"🚀 [FLIGHT MODE] Sending email to {to_email}")
-            print(f"Subject: {subject}")
-            print(f"Content: {content[:100]}...")
-            return True
+            for m in messages:
+                print(f"🚀 [FLIGHT MODE] Sending email to {m['to']}")
+                print(f"Subject: {m['subject']}")
+                print(f"Content: {m['content'][:100]}...")
+            return [{'email': m['to'], 'sent': True, 'error': None} for m in messages]
 
-        if not self.sg:
+        if not self.api_key:
             print("SendGrid API Key missing. Cannot send.")
-            return False
-
-        # Add signature
-        content += "\n\nPS: import antigravity"
-
-        message = Mail(
-            from_email=self.from_email,
-            to_emails=to_email,
-            subject=subject,
-            html_content=content
-        )
-
-        try:
-            response = self.sg.send(message)
-            return response.status_code in (200, 201, 202)
-        except Exception as e:
-            print(f"Error sending email: {e}")
-            return False
+            return [{'email': m['to'], 'sent': False, 'error': "SendGrid API Key missing"} for m in messages]
+
+        shared, alone = [], []
+        for index, m in enumerate(messages):
+            fits = len(m['content'].encode('utf-8')) + len(BODY_TAG) <= MAX_SUBSTITUTION_BYTES
+            (shared if fits else alone).append(index)
+        batches = [shared[i:i + MAX_PERSONALIZATIONS] for i in range(0, len(shared), MAX_PERSONALIZATIONS)]
+        batches += [[index] for index in alone]
+
+        outcomes = [None] * len(messages)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(batches)))) as pool:
+            errors = pool.map(lambda indexes: self._send([messages[i] for i in indexes]), batches)
+            for indexes, batch_errors in zip(batches, errors):
+                for i, error in zip(indexes, batch_errors):
+                    outcomes[i] = {'email': messages[i]['to'], 'sent': error is None, 'error': error}
+        return outcomes
+
+    def _send(self, messages):
+        """
+        Send messages in one request, or in halves (recursively) if SendGrid refuses it as a whole.
+        Returns: one error message (or None if sent) per message
+        """
+        error, status = self._post(messages)
+        if error and status in SPLIT_STATUSES and len(messages) > 1:
+            middle = len(messages) // 2
+            return self._send(messages[:middle]) + self._send(messages[middle:])
+        return [error] * len(messages)
+
+    def _payload(self, messages):
+        if len(messages) == 1:
+            m = messages[0]
+            personalizations = [{'to': [{'email': m['to']}], 'subject': m['subject']}]
+            content = m['content']
+        else:
+            personalizations = [
+                {'to': [{'email': m['to']}], 'subject': m['subject'], 'substitutions': {BODY_TAG: m['content']}}
+                for m in messages
+            ]
+            content = BODY_TAG
+        return {
+            'personalizations': personalizations,
+            'from': {'email': self.from_email},
+            # Add signature
+            'content': [{'type': 'text/html', 'value': content + SIGNATURE}],
+        }
+
+    def _post(self, messages):
+        """Send one request. Returns: (None on success, else the error message; HTTP status or None)"""
+        payload = self._payload(messages)
+        headers = {'Authorization': f"Bearer {self.api_key}"}
+
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            try:
+                with registry.call('sendgrid') as call:
+                    response = self.client.post(self.url, json=payload, headers=headers, timeout=30, endpoint='sendgrid')
+                    call.status = response.status_code
+            except Exception as e:
+                if not _not_sent(e) or attempt == self.max_retries:
+                    print(f"Error sending email: {e}")
+                    return str(e), None
+            else:
+                # Only a 429 tells for sure that nothing was sent
+                if response.status_code != 429 or attempt == self.max_retries:
+                    break
+                delay = retry_after(response.headers)
+            time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5) if delay is None else delay)
+
+        if response.status_code in (200, 201, 202):
+            return None, response.status_code
+        error = f"HTTP {response.status_code}: {response.text[:200]}"
+        print(f"Error sending email: {error}")
+        return error, response.status_code
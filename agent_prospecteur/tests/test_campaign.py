@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+from argparse import Namespace
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.campaign import load_spec
+from agent_prospecteur.db.campaign import CampaignStore
+from agent_prospecteur.pipeline import ProspectPipeline
+
+ARGS = Namespace(location='48.8566,2.3522', radius=5000, domain=None, full_coverage=False, tile_radius=1000, tile_workers=8)
+
+
+class FakeSearcher:
+    def search(self, **kwargs):
+        # Neighbouring shards find the same places
+        return [{'name': f'P{i}', 'address': '1 rue, Dakar', 'place_id': f'p{i}'} for i in range(4)]
+
+
+class TestCampaignStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'prospects.db')
+        self.store = CampaignStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_a_prospect_is_claimed_once(self):
+        other = CampaignStore(self.path) # Another worker process
+        self.store.start({'a': {}, 'b': {}})
+        self.assertTrue(self.store.claim('p1', 'a'))
+        self.assertFalse(other.claim('p1', 'b'))
+        self.assertTrue(other.claim('p2', 'b'))
+        other.close()
+
+    def test_resume(self):
+        shards = {'a': {}, 'b': {}, 'c': {}}
+        self.assertEqual(self.store.start(shards), ['a', 'b', 'c'])
+        self.store.claim('p1', 'a')
+        self.store.claim('p2', 'b')
+        self.store.finish('a', 10, 4)
+
+        # b was interrupted: it runs again and its prospects can be claimed again
+        self.assertEqual(self.store.start(shards, resume=True), ['b', 'c'])
+        self.assertFalse(self.store.claim('p1', 'b'))
+        self.assertTrue(self.store.claim('p2', 'b'))
+        self.assertEqual(self.store.totals(), (1, 10, 4))
+
+        # A new campaign starts over
+        self.assertEqual(self.store.start(shards), ['a', 'b', 'c'])
+        self.assertEqual(self.store.totals(), (0, 0, 0))
+
+
+class TestCampaign(unittest.TestCase):
+    def test_spec_is_expanded_into_shards(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({
+                'keywords': ['boulangerie', 'plombier'],
+                'locations': ['14.69,-17.44', {'name': 'Thiès', 'location': '14.79,-16.93', 'radius': 8000},
+                              {'name': 'Saint-Louis', 'bounds': [15.98, -16.53, 16.06, -16.46]}],
+                'tile_radius': 500,
+            }, f)
+        try:
+            shards = load_spec(f.name, ARGS)
+        finally:
+            os.unlink(f.name)
+
+        self.assertEqual(len(shards), 6)
+        self.assertEqual(list(shards)[:3], ['boulangerie @ 14.69,-17.44', 'boulangerie @ Thiès', 'boulangerie @ Saint-Louis'])
+        thies = shards['plombier @ Thiès']
+        self.assertEqual((thies['radius'], thies['tile_radius'], thies['sector']), (8000, 500, 'plombier'))
+        self.assertEqual(shards['boulangerie @ 14.69,-17.44']['radius'], 5000)
+        self.assertTrue(shards['boulangerie @ Saint-Louis']['full_coverage'])
+
+    def test_pipeline_skips_prospects_claimed_elsewhere(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CampaignStore(os.path.join(tmp, 'prospects.db'))
+            store.start({'a': {}, 'b': {}})
+            store.claim('p1', 'a')
+            store.claim('p3', 'a')
+
+            pipeline = ProspectPipeline(None, FakeSearcher(), None, None, None, None, None, claims=store)
+            found = list(pipeline.search({'shard': 'b', 'location': '14.7,-17.4', 'radius': 500, 'keyword': 'boulangerie'}))
+            self.assertEqual([ctx['key'] for ctx in found], ['p0', 'p2'])
+            store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
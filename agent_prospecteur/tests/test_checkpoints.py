@@ -0,0 +1,168 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.pipeline import ProspectPipeline
+from agent_prospecteur.db.checkpoints import CheckpointStore
+from agent_prospecteur.db.database import Database
+
+
+class FakeSearcher:
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, **kwargs):
+        self.calls += 1
+        return [{'name': f'P{i}', 'address': '1 rue, Dakar', 'place_id': f'p{i}', 'website': f'http://p{i}.sn'}
+                for i in range(6)]
+
+
+class FakeChecker:
+    def __init__(self):
+        self.checked = []
+
+    def check(self, url):
+        self.checked.append(url)
+        # p5 has a modern site, the others an archaic one
+        return True, url, 'modern' if 'p5' in url else 'archaic'
+
+
+class FakeAnalyzer:
+    processes = None
+
+    def analyze(self, html):
+        return ('MODERN', []) if html == 'modern' else ('ARCHAIC', ['Frameset detected'])
+
+
+class FakeEnricher:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.domains = []
+
+    def find_many(self, domains):
+        if self.fail and any('p3' in d for d in domains):
+            raise RuntimeError("interrupted")
+        self.domains.extend(domains)
+        return {d: f'contact@{d}' for d in domains}
+
+
+class FakeGenerator:
+    def generate_many(self, prospects):
+        for i, p in enumerate(prospects):
+            yield i, f"Bonjour {p['name']}"
+
+
+class FakeSender:
+    def __init__(self):
+        self.sent = []
+
+    def send_batch(self, messages):
+        self.sent.extend(m['to'] for m in messages)
+        return [{'email': m['to'], 'sent': True, 'error': None} for m in messages]
+
+
+class FakeDb:
+    def __init__(self):
+        self.rows = []
+
+    def add_prospects(self, rows):
+        self.rows.extend(rows)
+
+
+class TestResume(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoints = CheckpointStore(os.path.join(self.tmp.name, 'prospects.db'))
+        self.query = {'location': '14.7,-17.4', 'radius': 500, 'keyword': 'boulangerie'}
+
+    def tearDown(self):
+        self.checkpoints.close()
+        self.tmp.cleanup()
+
+    def pipeline(self, enricher, resume=False, analyzer=None, **fakes):
+        return ProspectPipeline(
+            fakes['db'], fakes['searcher'], fakes['checker'], analyzer or FakeAnalyzer(), enricher,
+            FakeGenerator(), fakes['sender'], workers={'enrich': 1}, enrich_batch=1,
+            checkpoints=self.checkpoints, resume=resume
+        )
+
+    def test_resume_skips_finished_steps(self):
+        fakes = {'db': FakeDb(), 'searcher': FakeSearcher(), 'checker': FakeChecker(), 'sender': FakeSender()}
+
+        # First run: enrichment of p3 fails, as if the run had stopped there
+        self.pipeline(FakeEnricher(fail=True), **fakes).run([self.query])
+        self.assertEqual(sorted(r['name'] for r in fakes['db'].rows), ['P0', 'P1', 'P2', 'P4'])
+
+        enricher = FakeEnricher()
+        processed, sent = self.pipeline(enricher, resume=True, **fakes).run([self.query])
+
+        # Only p3 goes on, from enrichment; nothing is searched or checked again
+        self.assertEqual((processed, sent), (1, 1))
+        self.assertEqual(enricher.domains, ['p3.sn'])
+        self.assertEqual(fakes['searcher'].calls, 1)
+        self.assertEqual(len(fakes['checker'].checked), 6)
+        self.assertEqual(sorted(fakes['sender'].sent), [f'contact@p{i}.sn' for i in range(5)])
+        self.assertEqual(fakes['db'].rows[-1]['status'], 'sent')
+
+        # Nothing left to resume
+        self.assertEqual(list(self.checkpoints.pending()), [])
+
+    def test_new_run_starts_over(self):
+        fakes = {'db': FakeDb(), 'searcher': FakeSearcher(), 'checker': FakeChecker(), 'sender': FakeSender()}
+        self.pipeline(FakeEnricher(), **fakes).run([self.query])
+        self.pipeline(FakeEnricher(), **fakes).run([self.query])
+        self.assertEqual(fakes['searcher'].calls, 2)
+        self.assertEqual(len(fakes['db'].rows), 10)
+
+    def test_pages_are_not_checkpointed(self):
+        fakes = {'db': FakeDb(), 'searcher': FakeSearcher(), 'checker': FakeChecker(), 'sender': FakeSender()}
+
+        # Interrupted before any page is analyzed
+        broken = FakeAnalyzer()
+        broken.analyze = lambda html: 1 / 0
+        self.pipeline(FakeEnricher(), analyzer=broken, **fakes).run([self.query])
+        rows = self.checkpoints.conn.execute("SELECT stage, context FROM checkpoints").fetchall()
+        self.assertEqual({stage for stage, _ in rows}, {'search'})
+        self.assertFalse(any('archaic' in context for _, context in rows))
+
+        # Their pages are downloaded again
+        processed, sent = self.pipeline(FakeEnricher(), resume=True, **fakes).run([self.query])
+        self.assertEqual((processed, sent), (5, 5))
+        self.assertEqual(len(fakes['checker'].checked), 12)
+
+
+class TestSendPending(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'prospects.db'))
+        self.db.connect()
+        self.query = {'location': '14.7,-17.4', 'radius': 500, 'keyword': 'boulangerie'}
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def pipeline(self, sender, dry_run=False):
+        return ProspectPipeline(
+            self.db, FakeSearcher(), FakeChecker(), FakeAnalyzer(), FakeEnricher(),
+            FakeGenerator(), sender, dry_run=dry_run, send_batch=2
+        )
+
+    def test_dry_run_emails_are_sent_later(self):
+        self.pipeline(FakeSender(), dry_run=True).run([self.query])
+        self.assertEqual(len(self.db.get_pending_prospects()), 5)
+
+        sender = FakeSender()
+        self.assertEqual(self.pipeline(sender).send_pending(), (5, 5))
+        self.assertEqual(sorted(sender.sent), [f'contact@p{i}.sn' for i in range(5)])
+        self.assertEqual(self.db.get_pending_prospects(), [])
+        statuses = self.db.conn.execute("SELECT status, COUNT(sent_at) FROM prospects GROUP BY status").fetchall()
+        self.assertEqual([tuple(row) for row in statuses], [('sent', 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add repo root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.db.database import Database
+from agent_prospecteur.db.cache import SqliteCache
+
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'prospects.db'))
+        self.db.connect()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def rows(self):
+        return [dict(r) for r in self.db.conn.execute(
+            "SELECT place_id, name, city, website_url, website_status, email FROM prospects ORDER BY id"
+        )]
+
+    def test_wal_mode(self):
+        mode = self.db.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_bulk_upsert(self):
+        self.db.add_prospects([
+            {'place_id': 'p1', 'name': 'Boulangerie', 'city': 'Dakar', 'website_status': 'NO_SITE'},
+            {'place_id': None, 'name': 'Garage', 'city': 'Thiès', 'website_status': 'ARCHAIC'},
+        ])
+        self.db.add_prospects([
+            # Same place_id: updated, and a missing email does not erase a known one
+            {'place_id': 'p1', 'name': 'Boulangerie', 'city': 'Dakar', 'email': 'a@b.sn'},
+            # Same name and city: updated, and the place_id is filled in
+            {'place_id': 'p2', 'name': 'Garage', 'city': 'Thiès', 'website_url': 'http://garage.sn'},
+            {'place_id': 'p3', 'name': 'Pharmacie', 'city': 'Dakar'},
+            # Same name and city once normalized: the same prospect
+            {'place_id': None, 'name': 'GARAGE', 'city': 'thies', 'email': 'g@garage.sn'},
+        ])
+
+        self.assertEqual(self.rows(), [
+            {'place_id': 'p1', 'name': 'Boulangerie', 'city': 'Dakar', 'website_url': None, 'website_status': 'NO_SITE', 'email': 'a@b.sn'},
+            {'place_id': 'p2', 'name': 'Garage', 'city': 'Thiès', 'website_url': 'http://garage.sn', 'website_status': 'ARCHAIC', 'email': 'g@garage.sn'},
+            {'place_id': 'p3', 'name': 'Pharmacie', 'city': 'Dakar', 'website_url': None, 'website_status': None, 'email': None},
+        ])
+
+    def test_outreach_outcome(self):
+        self.db.add_prospects([
+            {'place_id': 'p1', 'name': 'A', 'city': 'Dakar', 'status': 'sent', 'message_content': 'Bonjour', 'sent_at': '2024-01-01 10:00:00'},
+            {'place_id': 'p2', 'name': 'B', 'city': 'Dakar'},
+        ])
+        # A later run that did not contact them keeps what was recorded
+        self.db.add_prospects([{'place_id': 'p1', 'name': 'A', 'city': 'Dakar', 'status': 'new'},
+                               {'place_id': 'p2', 'name': 'B', 'city': 'Dakar', 'status': 'failed'}])
+
+        rows = self.db.conn.execute("SELECT status, message_content, sent_at FROM prospects ORDER BY id").fetchall()
+        self.assertEqual([tuple(r) for r in rows], [('sent', 'Bonjour', '2024-01-01 10:00:00'), ('failed', None, None)])
+
+    def test_add_prospect_dedup(self):
+        first = self.db.add_prospect({'place_id': 'p1', 'name': 'Boulangerie', 'city': 'Dakar'})
+        self.assertEqual(self.db.add_prospect({'place_id': 'p1', 'name': 'Boulangerie Ndiaye', 'city': 'Dakar'}), first)
+        self.assertEqual(self.db.add_prospect({'name': 'Boulangerie', 'city': 'Dakar'}), first)
+
+    def test_batched_status_updates(self):
+        self.db.add_prospects([{'name': f'P{i}', 'city': 'Dakar'} for i in range(3)])
+        ids = [r['id'] for r in self.db.conn.execute("SELECT id FROM prospects ORDER BY id")]
+        self.db.update_listing_statuses([{'id': ids[0], 'status': 'sent'}, {'id': ids[2], 'email': 'x@y.sn'}])
+        self.db.update_listing_status(ids[1], 'failed')
+
+        rows = self.db.conn.execute("SELECT status, email, last_updated FROM prospects ORDER BY id").fetchall()
+        self.assertEqual([(r['status'], r['email']) for r in rows], [('sent', None), ('failed', None), ('new', 'x@y.sn')])
+        self.assertTrue(all(r['last_updated'] for r in rows))
+
+    def test_iter_pending_prospects(self):
+        statuses = ['NO_SITE', 'ARCHAIC', 'MODERN', None]
+        self.db.add_prospects([
+            {'name': f'P{i}', 'city': 'Dakar', 'website_status': statuses[i % 4], 'email': f'p{i}@x.sn' if i % 3 else None}
+            for i in range(40)
+        ])
+        expected = [r['id'] for r in self.db.conn.execute(
+            "SELECT id FROM prospects WHERE status = 'new' AND website_status IN ('NO_SITE', 'ARCHAIC') AND email IS NOT NULL ORDER BY id"
+        )]
+
+        seen = []
+        for row in self.db.iter_pending_prospects(batch_size=3):
+            # Rows leave the pending set while being consumed
+            self.db.update_listing_status(row['id'], 'sent')
+            seen.append(row['id'])
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(self.db.get_pending_prospects(), [])
+
+    def test_migrates_old_schema(self):
+        path = os.path.join(self.tmp.name, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE prospects (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, address TEXT, city TEXT, sector TEXT, website_url TEXT, website_status TEXT, email TEXT, message_content TEXT, sent_at TIMESTAMP, status TEXT DEFAULT 'new', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+        conn.execute("INSERT INTO prospects (name, city) VALUES ('Garage', 'Thiès')")
+        # Saved twice under two spellings, and contacted under the second one
+        conn.execute("INSERT INTO prospects (name, city, email) VALUES ('Café X', 'Paris', 'x@cafe.fr')")
+        conn.execute("INSERT INTO prospects (name, city, website_url, status, sent_at) VALUES ('cafe x', 'paris', 'http://cafe.fr', 'sent', '2024-01-01')")
+        conn.commit()
+        conn.close()
+
+        db = Database(path)
+        db.connect()
+        try:
+            db.add_prospects([{'place_id': 'p1', 'name': 'Garage', 'city': 'Thiès'}])
+            self.assertEqual(db.conn.execute("SELECT COUNT(*), MAX(place_id) FROM prospects").fetchone()[:], (2, 'p1'))
+            cafe = db.conn.execute("SELECT name, email, website_url, status, sent_at FROM prospects WHERE dedup_key = 'cafe x|paris'").fetchall()
+            self.assertEqual([tuple(r) for r in cafe], [('Café X', 'x@cafe.fr', 'http://cafe.fr', 'sent', '2024-01-01')])
+        finally:
+            db.close()
+
+
+class TestSqliteCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_do_not_write_without_budget(self):
+        cache = SqliteCache(self.path, 'entries')
+        try:
+            cache.set('a', 1)
+            changes = cache.conn.total_changes
+            self.assertEqual(cache.get('a'), 1)
+            self.assertEqual(cache.conn.total_changes, changes)
+        finally:
+            cache.close()
+
+    def test_lru_eviction_sees_batched_reads(self):
+        cache = SqliteCache(self.path, 'entries', max_entries=2)
+        try:
+            cache.set('a', 1)
+            cache.set('b', 2)
+            cache.get('a')
+            cache.set('c', 3)
+            self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        finally:
+            cache.close()
+
+    def test_byte_budget_follows_writes(self):
+        cache = SqliteCache(self.path, 'entries', max_bytes=100)
+        try:
+            cache.set('a', 'x' * 30)
+            cache.set('b', 'x' * 30)
+            cache.set('a', 'x' * 10) # Replaced: its old size no longer counts
+            cache.delete('b')
+            cache.set('c', 'x' * 60)
+            self.assertEqual((cache.get('a'), cache.get('c')), ('x' * 10, 'x' * 60))
+            cache.replace('a', 'x' * 40) # Now over budget: the next write evicts the least recently used
+            cache.set('d', 'x')
+            self.assertEqual((cache.get('a'), cache.get('c'), cache.get('d')), ('x' * 40, None, 'x'))
+            self.assertEqual((cache._count, cache._bytes),
+                             cache.conn.execute("SELECT COUNT(*), SUM(size) FROM entries").fetchone())
+        finally:
+            cache.close()
+
+    def test_expired_entries_go_first(self):
+        cache = SqliteCache(self.path, 'entries', max_entries=2)
+        try:
+            cache.set('old', 1, ttl=-1)
+            cache.set('a', 1)
+            cache.get('old', allow_stale=True)
+            cache.set('b', 2)
+            self.assertEqual(cache.get_entry('old'), (None, False))
+            self.assertEqual((cache.get('a'), cache.get('b')), (1, 2))
+        finally:
+            cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
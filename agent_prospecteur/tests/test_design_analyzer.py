@@ -0,0 +1,106 @@
+import unittest
+import sys
+import os
+import random
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.detector.design_analyzer import DesignAnalyzer
+
+PAGES = [
+    "",
+    "<html><head><title>Hello</title></head><body>Bonjour</body></html>",
+    '<html><head><meta name="viewport" content="width=device-width"></head><body></body></html>',
+    '<head><META NAME="viewport"></head>',
+    '<head><meta name="Viewport"></head>',
+    '<head><meta name="viewport"/></head><footer>&copy; 2012 Boulangerie</footer>',
+    "<footer>Copyright 2008 - 2019</footer><footer>2024</footer>",
+    "<div class='main footer'>2011</div><footer>no year</footer>",
+    "<div class='footer'>2011</div><div id='footer'>2015</div>",
+    "<div id='footer'>&#50;&#48;15</div>",
+    "<div class='footer main'>2011</div>",
+    "<div class='footers'>2011</div>",
+    "<body><footer>20<b>1</b>4<script>2030</script><!-- 2031 --></body>2032",
+    "<footer>a<p>2013<p>b</footer>2031",
+    "<div><footer>2013</div>2031",
+    "<footer>2013</div>2014</footer>",
+    "<footer>20<br>19</br>2031</footer>",
+    "<footer/>2012",
+    "<footer><style>p {}</style><template><p>2031</p></template>2016</footer>",
+    "<footer><![CDATA[2017]]></footer>",
+    "<table></table>" * 5,
+    "<table><tr><td><table></table></td></tr></table>" * 3,
+    "<object data='movie.swf'></object>",
+    "<embed src='intro.swf'>",
+    "<frameset><frame src='menu.html'></frameset>",
+    "<FRAME src='a.html'>",
+    '<link href="bootstrap.min.css"><table></table>',
+    "<script src='REACT.production.js'></script><frameset></frameset>",
+    "<p>We love Vue and tailwind</p>",
+]
+
+FRAGMENTS = [
+    "<footer>", "</footer>", "<div class='footer'>", "<div id='footer'>", "<div>", "</div>",
+    "<p>", "</p>", "<b>", "</b>", "<br>", "</br>", "<script>", "</script>", "<template>",
+    "</template>", "<table>", "</table>", "<object>", "<embed>", "<frame>", "<frameset>",
+    '<meta name="viewport">', "<!-- 2005 -->", "&copy;", "&#50;", "2009", "2018", "2023",
+    "20", "19", " Tous droits réservés ", "bootstrap", "</body>", "<footer/>",
+]
+
+
+class TestStreamingAnalyzerParity(unittest.TestCase):
+    def setUp(self):
+        self.soup = DesignAnalyzer()
+        self.stream = DesignAnalyzer(engine='stream')
+        self.early = DesignAnalyzer(engine='stream', early_exit=True)
+
+    def assertParity(self, html):
+        expected = self.soup.analyze(html)
+        self.assertEqual(self.stream.analyze(html), expected, html)
+        # Early exit may stop before listing every reason, never on a different status
+        self.assertEqual(self.early.analyze(html)[0], expected[0], html)
+
+    def test_known_pages(self):
+        for html in PAGES:
+            self.assertParity(html)
+
+    def test_random_markup(self):
+        rng = random.Random(42)
+        for _ in range(300):
+            self.assertParity(''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 40))))
+
+    def test_chunk_boundaries(self):
+        """Signals split across chunks are still seen."""
+        html = ("<p>" + "x" * 20 + "</p>") * 2000 + "<footer>2015</footer><script src='bootstrap.js'></script>"
+        self.assertParity(html)
+        split = DesignAnalyzer(engine='stream')
+        split._stream.chunk_size = 7
+        self.assertEqual(split.analyze(html), self.soup.analyze(html))
+
+    def test_early_exit_stops_reading(self):
+        analysis = self.early._stream.start()
+        analysis.feed("<frameset><embed src='a.swf'>")
+        self.assertTrue(analysis.settled)
+        self.assertEqual(analysis.close()[0], 'ARCHAIC')
+
+
+class TestAnalyzeMany(unittest.TestCase):
+    def test_results_match_analyze(self):
+        pages = PAGES + ["<p>" + "x" * 300000 + "</p>"]
+        analyzer = DesignAnalyzer(engine='stream')
+        results = dict(analyzer.analyze_many(pages, workers=2, chunk_size=3))
+        self.assertEqual(results, {i: analyzer.analyze(html) for i, html in enumerate(pages)})
+
+    def test_persistent_pool(self):
+        analyzer = DesignAnalyzer(processes=2)
+        try:
+            for _ in range(2):
+                results = dict(analyzer.analyze_many(PAGES[:5]))
+                self.assertEqual(sorted(results), list(range(5)))
+        finally:
+            analyzer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
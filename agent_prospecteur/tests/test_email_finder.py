@@ -0,0 +1,103 @@
+import unittest
+import sys
+import os
+import json
+import threading
+import tempfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.config import Config
+from agent_prospecteur.enrich.email_cache import EmailCache
+from agent_prospecteur.enrich.email_finder import EmailFinder
+
+
+class HunterHandler(BaseHTTPRequestHandler):
+    """Domain Search stub: 'busy.sn' is rate limited once, 'down.sn' always fails, 'empty.sn' has no email."""
+    def do_GET(self):
+        domain = parse_qs(urlparse(self.path).query)['domain'][0]
+        with self.server.lock:
+            self.server.calls.append(domain)
+            first = self.server.calls.count(domain) == 1
+
+        if domain == 'busy.sn' and first:
+            return self._reply(429, {'errors': []}, {'Retry-After': '0'})
+        if domain == 'down.sn':
+            return self._reply(503, {'errors': []})
+        emails = [] if domain == 'empty.sn' else [{'value': f'contact@{domain}'}]
+        self._reply(200, {'data': {'emails': emails}})
+
+    def _reply(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestEmailFinder(unittest.TestCase):
+    def setUp(self):
+        self.flight = Config.ANTIGRAVITY_FLIGHT
+        Config.ANTIGRAVITY_FLIGHT = False
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), HunterHandler)
+        self.server.calls = []
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = EmailCache(os.path.join(self.tmp.name, 'prospects.db'))
+        self.finder = EmailFinder(api_key='test', cache=self.cache, rate_limit=1000, max_retries=2)
+        self.finder.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.finder.backoff = 0
+
+    def tearDown(self):
+        Config.ANTIGRAVITY_FLIGHT = self.flight
+        self.server.shutdown()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_find_many(self):
+        domains = ['a.sn', 'www.b.sn', 'busy.sn', 'empty.sn', 'down.sn', 'a.sn', None]
+        emails = self.finder.find_many(domains, workers=4)
+
+        self.assertEqual(emails, {
+            'a.sn': 'contact@a.sn',
+            'www.b.sn': 'contact@b.sn',
+            'busy.sn': 'contact@busy.sn', # Retried after the 429
+            'empty.sn': None,
+            'down.sn': None, # Given up after max_retries
+            None: None,
+        })
+        self.assertEqual(self.server.calls.count('a.sn'), 1)
+        self.assertEqual(self.server.calls.count('busy.sn'), 2)
+        self.assertEqual(self.server.calls.count('down.sn'), 3)
+
+    def test_cache(self):
+        self.finder.find_many(['a.sn', 'empty.sn', 'down.sn'])
+        self.server.calls.clear()
+
+        # Emails and empty answers are reused; failures are not cached
+        self.assertEqual(self.finder.find_many(['a.sn', 'www.a.sn', 'empty.sn', 'down.sn']),
+                         {'a.sn': 'contact@a.sn', 'www.a.sn': 'contact@a.sn', 'empty.sn': None, 'down.sn': None})
+        self.assertEqual(sorted(set(self.server.calls)), ['down.sn'])
+
+    def test_empty_answers_expire_first(self):
+        self.cache.ttl_empty = 0
+        self.finder.find_many(['a.sn', 'empty.sn'])
+        self.server.calls.clear()
+
+        self.finder.find_many(['a.sn', 'empty.sn'])
+        self.assertEqual(self.server.calls, ['empty.sn'])
+
+
+if __name__ == '__main__':
+    unittest.main()
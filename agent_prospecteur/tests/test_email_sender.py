@@ -0,0 +1,123 @@
+import unittest
+import sys
+import os
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest import mock
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.config import Config
+from agent_prospecteur.sender.email_sender import EmailSender
+
+
+class SendGridHandler(BaseHTTPRequestHandler):
+    """/v3/mail/send stub: answers the statuses queued in server.statuses, then 202 (400 if an address is bad)."""
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests.append(payload)
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+            queued = self.server.statuses.pop(0) if self.server.statuses else 202
+        time.sleep(0.02)
+        with self.server.lock:
+            self.server.active -= 1
+
+        status = 401 if self.headers['Authorization'] != 'Bearer test' else queued
+        if any(p['to'][0]['email'].startswith('bad') for p in payload['personalizations']):
+            status = 400
+        self.send_response(status)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def bodies(payload):
+    """The email each recipient of a request gets."""
+    content = payload['content'][0]['value']
+    result = {}
+    for p in payload['personalizations']:
+        body = content
+        for tag, value in p.get('substitutions', {}).items():
+            body = body.replace(tag, value)
+        result[p['to'][0]['email']] = (p['subject'], body)
+    return result
+
+
+class TestEmailSender(unittest.TestCase):
+    def setUp(self):
+        self.flight = Config.ANTIGRAVITY_FLIGHT
+        Config.ANTIGRAVITY_FLIGHT = False
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SendGridHandler)
+        self.server.requests = []
+        self.server.statuses = []
+        self.server.lock = threading.Lock()
+        self.server.active = self.server.peak = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.sender = EmailSender(api_key='test', api_host=f"http://127.0.0.1:{self.server.server_address[1]}",
+                                  max_concurrency=3)
+
+    def tearDown(self):
+        Config.ANTIGRAVITY_FLIGHT = self.flight
+        self.server.shutdown()
+
+    def test_send_batch(self):
+        messages = [{'to': f'p{i}@x.sn', 'subject': f'Sujet {i}', 'content': f'Offre {i}'} for i in range(20)]
+        messages.append({'to': 'long@x.sn', 'subject': 'Long', 'content': 'x' * 20000})
+        with mock.patch('agent_prospecteur.sender.email_sender.MAX_PERSONALIZATIONS', 5):
+            outcomes = self.sender.send_batch(messages)
+
+        self.assertEqual([o['email'] for o in outcomes], [m['to'] for m in messages])
+        self.assertTrue(all(o['sent'] and o['error'] is None for o in outcomes))
+
+        # 5 personalizations per request, each with its own body; too long for a substitution: alone
+        self.assertEqual(sorted(len(p['personalizations']) for p in self.server.requests), [1, 5, 5, 5, 5])
+        received = {}
+        for payload in self.server.requests:
+            received.update(bodies(payload))
+        self.assertEqual(received, {m['to']: (m['subject'], m['content'] + "\n\nPS: import antigravity")
+                                    for m in messages})
+        self.assertLessEqual(self.server.peak, 3)
+
+    def test_only_rate_limits_are_retried(self):
+        messages = [{'to': f'p{i}@x.sn', 'subject': 'Sujet', 'content': f'Offre {i}'} for i in range(3)]
+        self.server.statuses = [429]
+        self.assertTrue(all(o['sent'] for o in self.sender.send_batch(messages)))
+        self.assertEqual(len(self.server.requests), 2)
+
+        # SendGrid may have sent them: failed rather than sent twice
+        self.server.statuses = [503]
+        outcomes = self.sender.send_batch(messages)
+        self.assertFalse(any(o['sent'] for o in outcomes))
+        self.assertIn('503', outcomes[0]['error'])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_bad_address_only_fails_itself(self):
+        messages = [{'to': f'p{i}@x.sn', 'subject': 'Sujet', 'content': f'Offre {i}'} for i in range(8)]
+        messages[5]['to'] = 'bad@'
+        outcomes = self.sender.send_batch(messages)
+
+        self.assertEqual([o['sent'] for o in outcomes], [i != 5 for i in range(8)])
+        self.assertIn('400', outcomes[5]['error'])
+        # Halves of the refused request, down to the bad address: 8, 4+4, 2+2, 1+1
+        self.assertEqual(len(self.server.requests), 7)
+        # Each good address went out once, in a request SendGrid accepted
+        accepted = [[p['to'][0]['email'] for p in payload['personalizations']] for payload in self.server.requests]
+        accepted = [email for emails in accepted if 'bad@' not in emails for email in emails]
+        self.assertEqual(sorted(accepted), sorted(m['to'] for m in messages if m['to'] != 'bad@'))
+
+    def test_send(self):
+        self.assertTrue(self.sender.send('a@x.sn', 'Sujet', 'Bonjour'))
+        self.sender.api_key = 'wrong'
+        self.assertFalse(self.sender.send('a@x.sn', 'Sujet', 'Bonjour'))
+
+
+if __name__ == '__main__':
+    unittest.main()
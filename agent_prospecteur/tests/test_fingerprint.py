@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.detector.design_analyzer import DesignAnalyzer
+from agent_prospecteur.detector.fingerprint import FingerprintIndex, page_fingerprint, footer_year, distance
+from agent_prospecteur.metrics import registry
+
+ROW = "<section class='row'><div class='col'><h2>{name}</h2><p>Nos produits, depuis toujours.</p></div></section>\n"
+
+
+def template_page(name, year, viewport=True, rows=40, footer="<footer>&copy; {year} {name}</footer>"):
+    head = "<meta name='viewport' content='width=device-width'>" if viewport else ""
+    return (f"<html><head>{head}<title>{name}</title></head><body><nav><a href='/'>Accueil</a></nav>"
+            + ROW.format(name=name) * rows + footer.format(year=year, name=name) + "</body></html>")
+
+
+class TestPageFingerprint(unittest.TestCase):
+    def test_same_template_is_near(self):
+        a, summary_a = page_fingerprint(template_page("Boulangerie Diop", 2012))
+        b, summary_b = page_fingerprint(template_page("Garage Ndiaye", 2023, rows=41))
+        self.assertEqual(summary_a, summary_b)
+        self.assertLessEqual(distance(a, b), 3)
+
+    def test_other_structure_is_far(self):
+        a, _ = page_fingerprint(template_page("Boulangerie Diop", 2012))
+        b, _ = page_fingerprint("<table><tr><td><font face='Arial'>Bienvenue</font></td></tr></table>" * 10)
+        self.assertGreater(distance(a, b), 3)
+
+    def test_summary_tells_structural_signals(self):
+        _, with_viewport = page_fingerprint(template_page("A", 2012))
+        _, without = page_fingerprint(template_page("A", 2012, viewport=False))
+        self.assertNotEqual(with_viewport, without)
+
+    def test_footer_year_matches_soup(self):
+        soup = DesignAnalyzer()
+        for page in [
+            "<footer>&copy; 2012 Boulangerie</footer>",
+            "<footer>Copyright 2008 - 2019</footer><footer>2024</footer>",
+            "<div class='main footer'>2011</div><footer>no year</footer>",
+            "<div class='footer'>2011</div><div id='footer'>2015</div>",
+            "<div class='footers'>2011</div><div id='footer'><div>2015</div> 2016</div>2031",
+            "<footer>20<b>1</b>4<script>2030</script><!-- 2031 --></footer>2032",
+            "<p>2012</p>",
+        ]:
+            self.assertEqual(footer_year(page), soup._soup_signals(page)['copyright_year'], page)
+
+
+class TestFingerprintIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'prospects.db')
+        self.index = FingerprintIndex(self.path)
+        self.analyzer = DesignAnalyzer(fingerprints=self.index)
+        registry.reset()
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_template_reuses_signals_with_its_own_year(self):
+        reference = DesignAnalyzer()
+        first = template_page("Boulangerie Diop", 2023)
+        second = template_page("Garage Ndiaye", 2012, rows=41)
+        self.assertEqual(self.analyzer.analyze(first), reference.analyze(first))
+        self.assertEqual(self.analyzer.analyze(second), reference.analyze(second))
+        self.assertIn("Copyright year is old: 2012", self.analyzer.analyze(second)[1])
+        counters = registry.snapshot()['counters']
+        self.assertEqual(counters['cache_requests_total{cache=fingerprints,result=miss}'], 1)
+        self.assertEqual(counters['cache_requests_total{cache=fingerprints,result=hit}'], 2)
+
+    def test_framework_is_checked_again(self):
+        self.analyzer.analyze(template_page("A", 2023))
+        page = template_page("B", 2023).replace("Accueil", "Accueil (vue)")
+        self.assertIn("Modern framework detected", self.analyzer.analyze(page)[1])
+
+    def test_different_structure_is_analyzed(self):
+        self.analyzer.analyze(template_page("A", 2023))
+        status, reasons = self.analyzer.analyze(template_page("A", 2023, viewport=False))
+        self.assertIn("Missing viewport meta tag (not responsive)", reasons)
+
+    def test_index_persists(self):
+        self.analyzer.analyze(template_page("A", 2023))
+        other = FingerprintIndex(self.path)
+        try:
+            self.assertIsNotNone(other.match(page_fingerprint(template_page("B", 2015))))
+        finally:
+            other.close()
+
+    def test_early_exit_is_not_indexed(self):
+        analyzer = DesignAnalyzer(engine='stream', early_exit=True, fingerprints=self.index)
+        page = "<frameset><frame src='a.html'></frameset><embed src='intro.swf'>" + "<p>texte</p>" * 5000
+        self.assertEqual(analyzer.analyze(page)[0], 'ARCHAIC')
+        self.assertIsNone(self.index.match(page_fingerprint(page)))
+
+
+if __name__ == '__main__':
+    unittest.main()
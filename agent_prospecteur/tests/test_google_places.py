@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import json
+import threading
+import tempfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.search.google_places import GooglePlacesSearch
+from agent_prospecteur.search.places_cache import PlacesCache
+
+
+class PlacesHandler(BaseHTTPRequestHandler):
+    """Nearby Search stub: two pages per location; page 2 shares a place with every tile."""
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        self.server.calls.append(params)
+        if 'pagetoken' in params:
+            data = {'status': 'OK', 'results': [self._place(params['pagetoken'] + '-2'), self._place('shared')]}
+        else:
+            data = {'status': 'OK', 'results': [self._place(params['location'])], 'next_page_token': params['location']}
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _place(self, place_id):
+        return {'name': place_id, 'vicinity': '1 rue, Paris', 'place_id': place_id, 'website': f"http://{place_id}.fr/"}
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSearchArea(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), PlacesHandler)
+        self.server.calls = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.searcher = GooglePlacesSearch(api_key='test', rate_limit=1000)
+        self.searcher.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.searcher.page_token_delay = 0
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_tiles_cover_the_box(self):
+        tiles = list(self.searcher._tiles(None, None, (48.80, 2.25, 48.90, 2.42), 1000))
+        # ~11 km x ~12.5 km box, tiles every ~1.4 km
+        self.assertGreaterEqual(len(tiles), 8 * 9)
+
+    def test_pages_are_followed_and_places_deduplicated(self):
+        places = list(self.searcher.search_area(keyword='bakery', location='48.8566,2.3522', radius=3000, tile_radius=1000))
+        tiles = [c for c in self.server.calls if 'location' in c]
+        ids = [p['place_id'] for p in places]
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(self.server.calls), 2 * len(tiles))
+        self.assertEqual(len(places), 2 * len(tiles) + 1)
+        self.assertEqual(ids.count('shared'), 1)
+
+    def test_limit(self):
+        places = list(self.searcher.search_area(keyword='bakery', radius=3000, limit=5))
+        self.assertEqual(len(places), 5)
+
+    def test_website_is_kept(self):
+        places = self.searcher.search(location='48.8566,2.3522', radius=500, keyword='bakery')
+        self.assertEqual(places[0]['website'], 'http://48.8566,2.3522.fr/')
+
+    def test_search_reads_one_page_unless_asked(self):
+        self.assertEqual(len(self.searcher.search(location='48.8566,2.3522', radius=500, keyword='bakery')), 1)
+        self.assertEqual(len(self.server.calls), 1)
+        self.assertEqual(len(self.searcher.search(location='48.8566,2.3522', radius=500, keyword='bakery', pages=3)), 3)
+        self.assertEqual(len(self.server.calls), 3)
+
+    def test_cache_replays_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PlacesCache(path=os.path.join(tmp, 'places.db'), ttl=3600, precision=3)
+            self.searcher.cache = cache
+
+            first = self.searcher.search(location='48.85661,2.35222', radius=500, keyword='Bakery', pages=3)
+            self.assertEqual(len(self.server.calls), 2)
+
+            # Same query once normalized: both pages come from the cache
+            second = self.searcher.search(location='48.85659,2.35218', radius=500, keyword=' bakery ', pages=3)
+            self.assertEqual(second, first)
+            self.assertEqual(len(self.server.calls), 2)
+
+            self.searcher.refresh = True
+            self.searcher.search(location='48.85661,2.35222', radius=500, keyword='Bakery', pages=3)
+            self.assertEqual(len(self.server.calls), 4)
+            cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.db.database import Database
+from agent_prospecteur.db.known_index import BloomFilter, KnownProspectIndex
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negative_and_few_false_positives(self):
+        bloom = BloomFilter(10000, error_rate=0.01)
+        for i in range(10000):
+            bloom.add(f"in:{i}")
+        self.assertTrue(all(f"in:{i}" in bloom for i in range(10000)))
+        false_positives = sum(f"out:{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 200)
+        self.assertLess(len(bloom.bits), 15000) # ~1.2 bytes per key
+
+
+class TestKnownProspectIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'prospects.db'))
+        self.db.connect()
+        self.db.add_prospects([
+            {'place_id': 'p1', 'name': 'Boulangerie Ndiayé', 'city': 'Dakar'},
+            {'place_id': None, 'name': 'Garage du Port', 'city': 'Thiès'},
+        ])
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_is_known(self):
+        index = KnownProspectIndex(self.db)
+        self.assertTrue(index.is_known('p1', 'Other name', 'Paris'))
+        self.assertTrue(index.is_known('p9', 'boulangerie  ndiaye', 'DAKAR'))
+        self.assertTrue(index.is_known(None, 'Garage du port', 'Thies'))
+        self.assertFalse(index.is_known('p2', 'Garage du Port', 'Dakar'))
+        self.assertFalse(index.is_known(None, 'Pharmacie', 'Dakar'))
+
+    def test_false_positive_is_confirmed_against_the_db(self):
+        index = KnownProspectIndex(self.db)
+        index.filter.bits = bytearray(b'\xff' * len(index.filter.bits)) # Every key matches
+        self.assertFalse(index.is_known('p2', 'Pharmacie', 'Dakar'))
+        self.assertTrue(index.is_known('p1', 'x', 'y'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+import openai
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.config import Config
+from agent_prospecteur.message.generator import MessageGenerator
+from agent_prospecteur.message.template_cache import TemplateCache
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class TestTemplateCache(unittest.TestCase):
+    def setUp(self):
+        self.patch = mock.patch.multiple(Config, ANTIGRAVITY_FLIGHT=False, OPENAI_API_KEY='test')
+        self.patch.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = TemplateCache(os.path.join(self.tmp.name, 'prospects.db'), max_uses=3)
+        self.generator = MessageGenerator(cache=self.cache)
+
+    def tearDown(self):
+        self.patch.stop()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def prospect(self, i, sector='Boulangerie', reasons=("Copyright year is old: 2012",)):
+        return {'name': f'Prospect {i}', 'city': 'Dakar', 'sector': sector,
+                'website_status': 'ARCHAIC', 'valid_reasons': list(reasons)}
+
+    def test_templates_are_reused_up_to_the_cap(self):
+        template = "Bonjour {{name}} à {{city}}, votre site date de {{year}}."
+        with mock.patch('openai.ChatCompletion.create', return_value=completion(template)) as create:
+            messages = [self.generator.generate(self.prospect(i)) for i in range(7)]
+            # Same kind of prospect once normalized (other year, spacing, case)
+            messages.append(self.generator.generate(self.prospect(7, ' boulangerie ', ["Copyright year is old: 2009"])))
+
+        self.assertEqual(create.call_count, 3) # 8 emails, 3 uses per template
+        self.assertEqual(messages[4], "Bonjour Prospect 4 à Dakar, votre site date de 2012.")
+        self.assertEqual(messages[7], "Bonjour Prospect 7 à Dakar, votre site date de 2009.")
+        self.assertEqual(create.call_args.kwargs['request_timeout'], self.generator.request_timeout)
+        prompt = create.call_args.kwargs['messages'][1]['content']
+        self.assertIn("{{name}}", prompt)
+        self.assertNotIn("Prospect 7", prompt)
+        self.assertNotIn("2009", prompt)
+
+    def test_other_reasons_get_another_template(self):
+        with mock.patch('openai.ChatCompletion.create', return_value=completion("Bonjour {{name}}")) as create:
+            self.generator.generate(self.prospect(1))
+            self.generator.generate(self.prospect(2, reasons=["Flash content detected"]))
+            self.generator.generate(self.prospect(3, sector='Garage'))
+        self.assertEqual(create.call_count, 3)
+
+    def test_failures_are_not_cached(self):
+        with mock.patch('openai.ChatCompletion.create', side_effect=RuntimeError("boom")):
+            self.assertIsNone(self.generator.generate(self.prospect(1)))
+        with mock.patch('openai.ChatCompletion.create', return_value=completion("Bonjour {{name}}")) as create:
+            self.assertEqual(self.generator.generate(self.prospect(2)), "Bonjour Prospect 2")
+        self.assertEqual(create.call_count, 1)
+
+
+class TestGenerateMany(unittest.TestCase):
+    def setUp(self):
+        self.patch = mock.patch.multiple(Config, ANTIGRAVITY_FLIGHT=False, OPENAI_API_KEY='test')
+        self.patch.start()
+        self.generator = MessageGenerator(max_in_flight=4, tokens_per_minute=10 ** 9, max_retries=2)
+        self.generator.backoff = 0
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def prospects(self, n):
+        return [{'name': f'P{i}', 'city': 'Dakar', 'sector': 'Boulangerie',
+                 'website_status': 'NO_SITE', 'valid_reasons': []} for i in range(n)]
+
+    def test_concurrency_and_rate_limit_retries(self):
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0, 'calls': 0}
+
+        def create(messages, **kwargs):
+            with lock:
+                state['calls'] += 1
+                call = state['calls']
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+            if call <= 2:
+                raise openai.error.RateLimitError("slow down", headers={'retry-after': '0'})
+            name = messages[1]['content'].split('Prospect Name: ')[1].split()[0]
+            return completion(f"Bonjour {name}")
+
+        with mock.patch('openai.ChatCompletion.create', side_effect=create):
+            results = list(self.generator.generate_many(self.prospects(12), workers=12))
+
+        self.assertEqual(sorted(results), sorted((i, f"Bonjour P{i}") for i in range(12)))
+        self.assertEqual(state['calls'], 14)
+        self.assertLessEqual(state['peak'], 4)
+        # Halved twice by the 429 answers, not yet raised back
+        self.assertLess(self.generator.in_flight.limit, 4)
+
+    def test_failures_yield_none(self):
+        errors = [openai.error.APIError("down")] * 3 + [openai.error.InvalidRequestError("bad", None)]
+        with mock.patch('openai.ChatCompletion.create', side_effect=errors) as create:
+            self.assertEqual(self.generator.generate(self.prospects(1)[0]), None) # Retried twice
+            self.assertEqual(self.generator.generate(self.prospects(1)[0]), None) # Not retried
+        self.assertEqual(create.call_count, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
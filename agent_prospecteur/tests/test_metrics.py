@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import json
+import pstats
+import tempfile
+import threading
+import time
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.metrics import MetricsRegistry, ThreadProfiler, registry
+from agent_prospecteur.pipeline import Pipeline, Stage
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_export(self):
+        metrics = MetricsRegistry()
+        metrics.inc('stage_items_total', 3, stage='check')
+        metrics.gauge_add('stage_in_flight', 2, stage='check')
+        for seconds in (0.003, 0.02, 0.02, 4):
+            metrics.observe('api_seconds', seconds, api='hunter')
+        with self.assertRaises(RuntimeError):
+            with metrics.call('hunter') as call:
+                call.status = 429
+                raise RuntimeError()
+        metrics.cache('pages', 'hit')
+
+        snapshot = json.loads(metrics.to_json())
+        self.assertEqual(snapshot['counters']['stage_items_total{stage=check}'], 3)
+        self.assertEqual(snapshot['counters']['api_requests_total{api=hunter,status=429}'], 1)
+        self.assertEqual(snapshot['counters']['cache_requests_total{cache=pages,result=hit}'], 1)
+        self.assertEqual(snapshot['gauges']['stage_in_flight{stage=check}'], 2)
+        self.assertEqual(snapshot['histograms']['api_seconds{api=hunter}']['count'], 5)
+        self.assertEqual(snapshot['histograms']['api_seconds{api=hunter}']['p50'], 0.025)
+        self.assertIn('check', snapshot['throughput'])
+
+        text = metrics.to_prometheus()
+        self.assertIn('# TYPE prospecteur_api_seconds histogram', text)
+        self.assertIn('prospecteur_api_seconds_bucket{api="hunter",le="0.005"} 2', text) # Incl. the call() above
+        self.assertIn('prospecteur_api_seconds_bucket{api="hunter",le="+Inf"} 5', text)
+        self.assertIn('prospecteur_stage_items_total{stage="check"} 3', text)
+
+    def test_merge(self):
+        worker, parent = MetricsRegistry(), MetricsRegistry()
+        worker.inc('stage_items_total', 3, stage='check')
+        worker.observe('stage_seconds', 0.02, stage='check')
+        parent.inc('stage_items_total', 2, stage='check')
+        parent.observe('stage_seconds', 2, stage='check')
+
+        parent.merge(worker.dump())
+        snapshot = parent.snapshot()
+        self.assertEqual(parent.get('stage_items_total', stage='check'), 5)
+        self.assertEqual(snapshot['histograms']['stage_seconds{stage=check}']['count'], 2)
+        self.assertEqual(snapshot['histograms']['stage_seconds{stage=check}']['p50'], 0.025)
+
+    def test_write(self):
+        metrics = MetricsRegistry()
+        metrics.inc('errors_total')
+        with tempfile.TemporaryDirectory() as tmp:
+            metrics.write(os.path.join(tmp, 'run.json'))
+            metrics.write(os.path.join(tmp, 'run.prom'))
+            with open(os.path.join(tmp, 'run.json')) as f:
+                self.assertEqual(json.load(f)['counters'], {'errors_total': 1})
+            with open(os.path.join(tmp, 'run.prom')) as f:
+                self.assertIn('prospecteur_errors_total 1', f.read())
+
+
+class TestPipelineMetrics(unittest.TestCase):
+    def test_stages_are_measured(self):
+        registry.reset()
+
+        def fragile(n):
+            if n == 3:
+                raise RuntimeError("boom")
+            return n
+
+        Pipeline([Stage('fragile', fragile, workers=2), Stage('batch', lambda b: b, batch_size=4)]).run(range(10))
+        self.assertEqual(registry.get('stage_items_total', stage='fragile'), 9)
+        self.assertEqual(registry.get('stage_errors_total', stage='fragile'), 1)
+        self.assertEqual(registry.get('stage_items_total', stage='batch'), 9)
+        self.assertEqual(registry.get('stage_in_flight', stage='fragile'), 0)
+        self.assertEqual(registry.histograms[('stage_seconds', (('stage', 'fragile'),))].count, 10)
+
+
+def busy_worker_function(n):
+    time.sleep(0.01)
+    return n
+
+
+def other_busy_function(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+class TestThreadProfiler(unittest.TestCase):
+    def test_worker_threads_are_profiled(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with ThreadProfiler(os.path.join(tmp, 'run.prof'), interval=0.001) as profiler:
+                Pipeline([Stage('busy', busy_worker_function, workers=4)]).run(range(20))
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'run.prof')))
+        self.assertIn('busy_worker_function', profiler.summary())
+
+    def test_two_threads(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'run.prof')
+            with ThreadProfiler(path, interval=0.001):
+                threads = [threading.Thread(target=busy_worker_function, args=(0,)),
+                           threading.Thread(target=other_busy_function, args=(0.05,))]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            names = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertLessEqual({'busy_worker_function', 'other_busy_function'}, names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest import mock
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import requests
+from agent_prospecteur.net.http_client import HttpClient
+from agent_prospecteur.net.outbound import OutboundPolicy, CircuitOpenError, AdaptiveTimeout, LatencyWindow, OPEN, HALF_OPEN
+
+
+def policy(**kwargs):
+    settings = dict(adaptive=True, min_timeout=0.05, timeout_factor=3, min_samples=20,
+                    breaker_failures=3, breaker_cooldown=30, breaker_max_cooldown=100)
+    settings.update(kwargs)
+    return OutboundPolicy(**settings)
+
+
+class TestLatencyWindow(unittest.TestCase):
+    def test_keeps_the_last_calls(self):
+        window = LatencyWindow(size=10)
+        for seconds in range(100):
+            window.add(seconds)
+        self.assertEqual(len(window), 10)
+        self.assertEqual(window.quantile(0), 90)
+        self.assertEqual(window.quantile(0.99), 99)
+
+
+class TestAdaptiveTimeouts(unittest.TestCase):
+    def test_default_until_enough_samples(self):
+        outbound = policy()
+        for _ in range(19):
+            outbound.after('api.example', 'api', 0.1)
+        self.assertEqual(outbound.before('api.example', 'api', 10), 10)
+        outbound.after('api.example', 'api', 0.1)
+        self.assertAlmostEqual(outbound.before('api.example', 'api', 10), 0.3)
+
+    def test_new_host_follows_its_endpoint(self):
+        outbound = policy()
+        for i in range(20):
+            outbound.after(f"api{i}.example", 'api', 0.2)
+        self.assertAlmostEqual(outbound.before('new.example', 'api', 10), 0.6)
+        self.assertEqual(outbound.before('new.example', 'other', 10), 10)
+
+    def test_websites_only_follow_themselves(self):
+        outbound = policy()
+        for i in range(20):
+            outbound.after(f"site{i}.example", 'website', 0.2)
+            outbound.after('site0.example', 'website', 0.2)
+        self.assertEqual(outbound.before('new.example', 'website', 10), 10)
+        self.assertAlmostEqual(outbound.before('site0.example', 'website', 10), 0.6)
+
+    def test_bounds(self):
+        outbound = policy(min_timeout=1)
+        for _ in range(20):
+            outbound.after('fast.example', 'api', 0.01)
+            outbound.after('slow.example', 'api2', 8)
+        self.assertEqual(outbound.before('fast.example', 'api', 10), 1)
+        self.assertEqual(outbound.before('slow.example', 'api2', 10), 10)
+
+    def test_disabled(self):
+        outbound = policy(adaptive=False)
+        for _ in range(20):
+            outbound.after('api.example', 'api', 0.1)
+        self.assertEqual(outbound.before('api.example', 'api', 10), 10)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('agent_prospecteur.net.outbound.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.outbound = policy()
+
+    def fail(self, times=1):
+        for _ in range(times):
+            self.outbound.after('down.example', 'website', failed=True)
+
+    def state(self):
+        return self.outbound.snapshot()['circuits']['down.example']['state']
+
+    def test_opens_after_failures_in_a_row(self):
+        self.fail(2)
+        self.outbound.before('down.example', 'website', 10)
+        self.fail()
+        self.assertEqual(self.state(), OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.outbound.before('down.example', 'website', 10)
+        # Other hosts are not affected
+        self.assertEqual(self.outbound.before('up.example', 'website', 10), 10)
+
+    def test_success_resets_the_count(self):
+        self.fail(2)
+        self.outbound.after('down.example', 'website', 0.1)
+        self.fail(2)
+        self.assertEqual(self.outbound.before('down.example', 'website', 10), 10)
+
+    def test_half_open_probe(self):
+        self.fail(3)
+        self.now += 30
+        self.outbound.before('down.example', 'website', 10) # The probe
+        self.assertEqual(self.state(), HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.outbound.before('down.example', 'website', 10)
+
+        # A failed probe opens the circuit for twice as long
+        self.fail()
+        self.assertEqual(self.outbound.snapshot()['circuits']['down.example']['cooldown'], 60)
+        self.now += 30
+        with self.assertRaises(CircuitOpenError):
+            self.outbound.before('down.example', 'website', 10)
+
+        # A successful one closes it
+        self.now += 30
+        self.outbound.before('down.example', 'website', 10)
+        self.outbound.after('down.example', 'website', 0.1)
+        self.assertNotIn('down.example', self.outbound.snapshot()['circuits'])
+        self.outbound.before('down.example', 'website', 10)
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.hits += 1
+        if self.path == '/slow':
+            time.sleep(0.3)
+        if self.path == '/loop':
+            self.send_response(302)
+            self.send_header('Location', '/loop')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(503 if self.server.down else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+        for down in (True, False):
+            server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+            server.down, server.hits = down, 0
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        self.client = HttpClient(policy=policy())
+
+    def tearDown(self):
+        self.client.close()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def url(self, server):
+        return f"http://127.0.0.1:{server.server_address[1]}/"
+
+    def test_failing_host_fails_fast(self):
+        down, up = self.servers
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url(down), endpoint='website').status_code, 503)
+        with self.assertRaises(requests.RequestException):
+            self.client.get(self.url(down), endpoint='website')
+        self.assertEqual(down.hits, 3)
+        self.assertEqual(self.client.get(self.url(up), endpoint='website').status_code, 200)
+
+        health = self.client.snapshot()
+        self.assertEqual(health['circuits'][f"127.0.0.1:{down.server_address[1]}"]['state'], OPEN)
+        self.assertEqual(health['endpoints']['website']['samples'], 4)
+
+    def test_other_errors_are_not_failures(self):
+        down, up = self.servers
+        for _ in range(3):
+            with self.assertRaises(requests.TooManyRedirects):
+                self.client.get(self.url(up) + 'loop', endpoint='website')
+        self.assertEqual(self.client.get(self.url(up), endpoint='website').status_code, 200)
+        self.assertEqual(self.client.snapshot()['circuits'], {})
+
+    def test_adaptive_timeout_is_told_apart(self):
+        down, up = self.servers
+        for _ in range(21):
+            response = self.client.get(self.url(up), endpoint='api')
+        self.assertTrue(response.adaptive_timeout)
+        with self.assertRaises(AdaptiveTimeout):
+            self.client.get(self.url(up) + 'slow', endpoint='api')
+        with self.assertRaises(requests.Timeout) as caught:
+            self.client.get(self.url(up) + 'slow', endpoint='other', timeout=0.05)
+        self.assertNotIsInstance(caught.exception, AdaptiveTimeout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.pipeline import Pipeline, Stage
+
+
+class TestPipeline(unittest.TestCase):
+    def test_items_flow_through_stages(self):
+        """Every item goes through each stage; None drops it, fan_out expands it."""
+        pipeline = Pipeline([
+            Stage('expand', lambda n: [n, n + 100], workers=2, fan_out=True),
+            Stage('drop_odd', lambda n: n if n % 2 == 0 else None, workers=3),
+            Stage('double', lambda n: n * 2, workers=2),
+        ], queue_size=2)
+
+        results = pipeline.run(range(6))
+        self.assertEqual(sorted(results), [0, 4, 8, 200, 204, 208])
+
+    def test_stage_runs_concurrently(self):
+        """A slow stage with N workers processes N items at the same time."""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def slow(item):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+            return item
+
+        start = time.monotonic()
+        results = Pipeline([Stage('slow', slow, workers=8)]).run(range(16))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(sorted(results), list(range(16)))
+        self.assertEqual(state['peak'], 8)
+        self.assertLess(elapsed, 16 * 0.05 / 2)
+
+    def test_failing_item_is_dropped(self):
+        """An exception in a stage drops the item without stopping the run."""
+        def fragile(n):
+            if n == 3:
+                raise RuntimeError("boom")
+            return n
+
+        results = Pipeline([Stage('fragile', fragile, workers=2)]).run(range(5))
+        self.assertEqual(sorted(results), [0, 1, 2, 4])
+
+    def test_fan_out_iterator_is_streamed(self):
+        """A generator returned by a fan_out stage feeds the next stage lazily."""
+        def produce(n):
+            for i in range(n):
+                yield i
+
+        results = Pipeline([
+            Stage('produce', produce, fan_out=True),
+            Stage('square', lambda n: n * n, workers=2),
+        ], queue_size=1).run([5, 3])
+        self.assertEqual(sorted(results), [0, 0, 1, 1, 4, 4, 9, 16])
+
+    def test_batch_stage(self):
+        """A batch stage gets lists of queued items and may drop some of them."""
+        batches = []
+
+        def keep_even(batch):
+            batches.append(len(batch))
+            return [n if n % 2 == 0 else None for n in batch]
+
+        results = Pipeline([
+            Stage('identity', lambda n: n, workers=1),
+            Stage('keep_even', keep_even, workers=2, batch_size=4),
+        ]).run(range(20))
+
+        self.assertEqual(sorted(results), list(range(0, 20, 2)))
+        self.assertEqual(sum(batches), 20)
+        self.assertTrue(all(size <= 4 for size in batches))
+
+
+if __name__ == '__main__':
+    unittest.main()
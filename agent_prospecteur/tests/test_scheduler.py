@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.net.scheduler import FetchScheduler
+
+IPS = {'a.example': '10.0.0.1', 'b.example': '10.0.0.2', 'c.example': '10.0.0.2', 'd.example': '10.0.0.2'}
+
+
+def scheduler(**kwargs):
+    settings = dict(max_concurrency=100, per_host=100, per_ip=100, host_interval=0, ip_interval=0,
+                    rate=10000, resolve=IPS.get)
+    settings.update(kwargs)
+    return FetchScheduler(**settings)
+
+
+class TestFetchScheduler(unittest.TestCase):
+    def crawl(self, fetches, urls, hold=0.05):
+        """Run one thread per url; returns the max number of requests seen in flight at once."""
+        lock = threading.Lock()
+        state = {'now': 0, 'max': 0}
+
+        def fetch(url):
+            with fetches.slot(url):
+                with lock:
+                    state['now'] += 1
+                    state['max'] = max(state['max'], state['now'])
+                time.sleep(hold)
+                with lock:
+                    state['now'] -= 1
+
+        threads = [threading.Thread(target=fetch, args=(url,)) for url in urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return state['max']
+
+    def test_per_host_cap(self):
+        self.assertEqual(self.crawl(scheduler(per_host=2), ['http://a.example/'] * 6), 2)
+
+    def test_per_ip_cap(self):
+        urls = ['http://b.example/', 'http://c.example/', 'http://d.example/'] * 2
+        self.assertEqual(self.crawl(scheduler(per_ip=2), urls), 2)
+
+    def test_global_cap(self):
+        urls = ['http://a.example/', 'http://b.example/', 'http://e.example/', 'http://f.example/']
+        self.assertEqual(self.crawl(scheduler(max_concurrency=3), urls), 3)
+
+    def test_host_spacing(self):
+        fetches = scheduler(host_interval=0.05)
+        starts = []
+        for _ in range(3):
+            with fetches.slot('http://a.example/'):
+                starts.append(time.monotonic())
+        self.assertGreaterEqual(starts[1] - starts[0], 0.045)
+        self.assertGreaterEqual(starts[2] - starts[1], 0.045)
+
+    def test_global_rate(self):
+        fetches = scheduler(rate=20, burst=1)
+        start = time.monotonic()
+        self.crawl(fetches, [f"http://host{i}.example/" for i in range(5)], hold=0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_hosts_are_interleaved(self):
+        fetches = scheduler(max_concurrency=1)
+        order = []
+        blocker = fetches.slot('http://x.example/')
+        blocker.__enter__()
+
+        def fetch(url, priority=0):
+            with fetches.slot(url, priority):
+                order.append(url)
+
+        threads = []
+        for url, priority in [('http://c.example/', 1), ('http://a.example/', 0), ('http://a.example/', 0),
+                              ('http://a.example/', 0), ('http://b.example/', 0)]:
+            thread = threading.Thread(target=fetch, args=(url, priority))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02) # Queued in this order
+        blocker.__exit__(None, None, None)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ['http://a.example/', 'http://b.example/', 'http://a.example/',
+                                 'http://a.example/', 'http://c.example/'])
+
+
+if __name__ == '__main__':
+    unittest.main()
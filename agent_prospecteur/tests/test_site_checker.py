@@ -0,0 +1,304 @@
+import unittest
+import sys
+import os
+import time
+import threading
+import tempfile
+import requests
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add repository root to path to import the package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_prospecteur.detector.site_checker import SiteChecker
+from agent_prospecteur.detector.design_analyzer import DesignAnalyzer
+from agent_prospecteur.detector.page_cache import PageCache
+from agent_prospecteur.detector.negative_cache import NegativeCache
+from agent_prospecteur.metrics import registry
+from agent_prospecteur.net.scheduler import FetchScheduler
+
+
+class FakeSiteChecker(SiteChecker):
+    """SiteChecker with canned DNS answers and probe latencies instead of network calls."""
+    def __init__(self, existing, up, delays=None):
+        super().__init__(parallel_guess=True)
+        self.existing = existing
+        self.up = up
+        self.delays = delays or {}
+        self.probed = []
+
+    def _resolves(self, host):
+        return host in self.existing
+
+    def is_reachable(self, url):
+        self.probed.append(url)
+        time.sleep(self.delays.get(url, 0))
+        if url in self.up:
+            return True, f"http://{url}/"
+        return False, None
+
+
+class TestParallelGuess(unittest.TestCase):
+    def test_nxdomain_candidates_are_not_probed(self):
+        checker = FakeSiteChecker(existing={'slug.com'}, up={'slug.com'})
+        self.assertEqual(checker.guess_domain("Slug"), "http://slug.com/")
+        self.assertEqual(checker.probed, ['slug.com'])
+
+    def test_preference_order_is_kept(self):
+        """A slower but preferred candidate wins over a faster one."""
+        checker = FakeSiteChecker(
+            existing={'www.slug.fr', 'slug.com'},
+            up={'www.slug.fr', 'slug.com'},
+            delays={'www.slug.fr': 0.05}
+        )
+        self.assertEqual(checker.guess_domain("Slug"), "http://www.slug.fr/")
+
+    def test_probes_run_concurrently(self):
+        candidates = {'www.slug.fr', 'www.slug.com', 'slug.fr', 'slug.com'}
+        checker = FakeSiteChecker(existing=candidates, up=set(), delays={c: 0.1 for c in candidates})
+
+        start = time.monotonic()
+        self.assertIsNone(checker.guess_domain("Slug"))
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_sequential_mode_is_unchanged(self):
+        checker = FakeSiteChecker(existing=set(), up={'slug.fr'})
+        self.assertEqual(checker.guess_domain("Slug", parallel=False), "http://slug.fr/")
+        self.assertEqual(checker.probed, ['www.slug.fr', 'www.slug.com', 'slug.fr'])
+
+
+ROWS = b"<section class='row'><p>Nos produits et services, faits maison chaque jour.</p></section>\n" * 4000
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    Serves a large page on / and refuses HEAD on /no-head.
+    /archaic and /modern are large pages, /modern served by byte ranges.
+    """
+    protocol_version = 'HTTP/1.1'
+    page = b'<html>' + b'x' * 100000 + b'</html>'
+    archaic = b"<html><head><title>A</title></head><frameset><frame src='m.html'></frameset><embed src='a.swf'>" + ROWS
+    modern = (b"<html><head><meta name='viewport' content='width=device-width'><title>M</title></head><body>" + ROWS
+              + b"<footer>&copy; 2016 Garage</footer></body></html>")
+
+    def do_HEAD(self):
+        if self.path == '/no-head':
+            self.send_response(405)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.gets.append(self.headers.get('Range'))
+        if self.path == '/missing':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', '11')
+            self.end_headers()
+            self.wfile.write(b'<p>page</p>')
+            return
+        page = {'/archaic': self.archaic, '/modern': self.modern}.get(self.path, self.page)
+        ranged = self.headers.get('Range', '')
+        if self.path == '/modern' and ranged.startswith('bytes=-'):
+            tail = page[-int(ranged[len('bytes=-'):]):]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {len(page) - len(tail)}-{len(page) - 1}/{len(page)}")
+            self.send_header('Content-Length', str(len(tail)))
+            self.end_headers()
+            self.wfile.write(tail)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(page)))
+        if self.path == '/modern':
+            self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        try:
+            self.wfile.write(page)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The client stopped reading
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSiteCheckerHttp(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+        cls.server.gets = []
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.server.gets.clear()
+
+    def test_body_is_capped(self):
+        is_up, final_url, html = SiteChecker(max_bytes=1000).check(self.base + '/')
+        self.assertTrue(is_up)
+        self.assertEqual(final_url, self.base + '/')
+        self.assertEqual(len(html), 1000)
+
+    def test_requests_go_through_the_scheduler(self):
+        scheduler = FetchScheduler(per_host=1, host_interval=0.05, rate=1000)
+        checker = SiteChecker(scheduler=scheduler)
+        start = time.monotonic()
+        self.assertTrue(checker.check(self.base + '/etag')[0])
+        self.assertTrue(checker.is_reachable(self.base + '/')[0])
+        self.assertGreaterEqual(time.monotonic() - start, 0.045)
+        self.assertEqual(registry.get('fetch_in_flight'), 0)
+
+    def test_reachability_falls_back_to_ranged_get(self):
+        checker = SiteChecker()
+        self.assertEqual(checker.is_reachable(self.base + '/'), (True, self.base + '/'))
+        self.assertEqual(self.server.gets, [])
+
+        self.assertEqual(checker.is_reachable(self.base + '/no-head'), (True, self.base + '/no-head'))
+        self.assertEqual(self.server.gets, ['bytes=0-0'])
+
+    def test_page_cache_revalidates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = self.base + '/etag'
+            cache = PageCache(path=os.path.join(tmp, 'pages.db'), ttl=3600)
+            checker = SiteChecker(page_cache=cache)
+
+            self.assertEqual(checker.check(url), (True, url, '<p>page</p>'))
+            cache.set_verdict(url, 'MODERN', [])
+            # Fresh: served without any request
+            self.assertEqual(checker.check(url), (True, url, '<p>page</p>'))
+            self.assertEqual(len(self.server.gets), 1)
+
+            # Stale: a conditional GET gets a 304 and the verdict survives
+            cache.ttl = 0
+            cache.revalidated({'final_url': url})
+            self.assertEqual(checker.check(url), (True, url, '<p>page</p>'))
+            self.assertEqual(len(self.server.gets), 2)
+            self.assertEqual(cache.get_verdict(url), ('MODERN', []))
+            cache.close()
+
+    def test_negative_cache_short_circuits(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = NegativeCache(os.path.join(tmp, 'prospects.db'))
+            checker = SiteChecker(negative_cache=cache)
+
+            # Nothing listens on port 1: the whole host is remembered as refusing
+            self.assertEqual(checker.check('http://localhost:1/'), (False, None, None))
+            self.assertEqual(cache.get('http://localhost:1/other'), 'refused')
+
+            # A non-200 answer is remembered for that URL only
+            self.assertEqual(checker.check(self.base + '/missing'), (False, None, None))
+            self.assertEqual(checker.check(self.base + '/missing'), (False, None, None))
+            self.assertEqual(len(self.server.gets), 1)
+            self.assertEqual(cache.get(self.base + '/missing'), 'http_error')
+            self.assertIsNone(cache.get(self.base + '/'))
+            cache.close()
+
+    def test_negative_cache_is_capped_and_read_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = NegativeCache(os.path.join(tmp, 'prospects.db'), max_entries=2)
+            cache.record('http://soon.example/', 'timeout')
+            cache.record('http://late.example/', 'nxdomain')
+            changes = cache.store.conn.total_changes
+            self.assertEqual(cache.get('http://soon.example/'), 'timeout')
+            self.assertEqual(cache.store.conn.total_changes, changes)
+
+            # The failure closest to expiry makes room
+            cache.record('http://new.example/', 'refused')
+            self.assertIsNone(cache.get('http://soon.example/'))
+            self.assertEqual(cache.get('http://late.example/'), 'nxdomain')
+            self.assertEqual(cache.get('http://new.example/'), 'refused')
+            cache.close()
+
+
+class TestProgressiveCheck(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+        cls.server.gets = []
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.server.gets.clear()
+        registry.reset()
+        self.checker = SiteChecker(progressive=True, head_bytes=32 * 1024, tail_bytes=4096)
+
+    def test_settled_page_stops_early(self):
+        is_up, final_url, html, verdict = self.checker.check_progressive(self.base + '/archaic')
+        self.assertTrue(is_up)
+        self.assertIsNone(html)
+        self.assertEqual(verdict[0], 'ARCHAIC')
+        self.assertLess(registry.get('website_bytes_total'), len(PageHandler.archaic) / 4)
+        self.assertEqual(registry.get('progressive_verdicts_total', read='head'), 1)
+
+    def test_ambiguous_page_reads_its_tail(self):
+        is_up, final_url, html, verdict = self.checker.check_progressive(self.base + '/modern')
+        self.assertEqual(verdict, DesignAnalyzer().analyze(PageHandler.modern.decode()))
+        self.assertIn("Copyright year is old: 2016", verdict[1])
+        self.assertEqual(self.server.gets, [None, 'bytes=-4096'])
+        self.assertLess(registry.get('website_bytes_total'), len(PageHandler.modern) / 4)
+
+    def test_tail_read_with_one_request_per_host(self):
+        """The ranged request waits for the slot of the head, not for itself."""
+        checker = SiteChecker(progressive=True, head_bytes=32 * 1024, tail_bytes=4096,
+                              scheduler=FetchScheduler(per_host=1, host_interval=0, rate=1000))
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(checker.check_progressive(self.base + '/modern')), daemon=True)
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        self.assertEqual(len(results), 2)
+        expected = DesignAnalyzer().analyze(PageHandler.modern.decode())
+        self.assertEqual([verdict for *_, verdict in results], [expected, expected])
+        self.assertEqual(sorted(self.server.gets, key=str), [None, None, 'bytes=-4096', 'bytes=-4096'])
+
+    def test_page_without_ranges_is_read_in_full(self):
+        is_up, final_url, html, verdict = self.checker.check_progressive(self.base + '/')
+        self.assertEqual(verdict, DesignAnalyzer().analyze(PageHandler.page.decode()))
+        self.assertEqual(self.server.gets, [None])
+        self.assertEqual(registry.get('progressive_verdicts_total', read='full'), 1)
+
+    def test_failure(self):
+        self.assertEqual(self.checker.check_progressive(self.base + '/missing'), (False, None, None, None))
+
+    def test_failed_full_read_keeps_the_head_verdict(self):
+        """Ranges announced but not served, then the full read fails: the head still gives a verdict."""
+        get = self.checker.client.get
+        calls = []
+
+        def flaky_get(url, **kwargs):
+            calls.append(kwargs['headers'].get('Range'))
+            if len(calls) > 1:
+                raise requests.ConnectionError('connection reset')
+            return get(url, **kwargs)
+
+        with mock.patch.object(self.checker.client, 'get', side_effect=flaky_get):
+            is_up, final_url, html, verdict = self.checker.check_progressive(self.base + '/modern')
+        self.assertTrue(is_up)
+        self.assertIsNotNone(verdict)
+        self.assertEqual(calls, [None, 'bytes=-4096', None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import sys
+import os
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(APP_DIR, 'main.py')
+
+# Third-party clients and side effects that must wait until a stage needs them
+HEAVY_MODULES = ('openai', 'bs4', 'requests', 'dotenv', 'antigravity', 'webbrowser')
+
+
+def loaded_modules(code):
+    """Run code in a fresh interpreter. Returns: the heavy modules it imported"""
+    probe = code + f"\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, cwd=APP_DIR, check=True).stdout
+    return [m for m in output.strip().splitlines()[-1].split(',') if m] if output.strip() else []
+
+
+class TestStartup(unittest.TestCase):
+    def test_help_loads_no_heavy_module(self):
+        loaded = loaded_modules(f"""
+import contextlib, io, runpy, sys
+sys.argv = [{MAIN!r}, '--help']
+try:
+    with contextlib.redirect_stdout(io.StringIO()):
+        runpy.run_path({MAIN!r}, run_name='__main__')
+except SystemExit:
+    pass
+""")
+        self.assertEqual(loaded, [])
+
+    def test_config_does_not_read_dotenv_on_import(self):
+        self.assertEqual(loaded_modules("import sys, config"), [])
+        self.assertIn('dotenv', loaded_modules("import sys, config; config.Config.load()"))
+
+
+if __name__ == '__main__':
+    unittest.main()